@@ -1,7 +1,12 @@
 """Simplified Map Cog for Discord Bot with modular structure and improved caching."""
 
+import os
 import asyncio
+import functools
+import contextlib
 import geopandas as gpd
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Tuple, List
 from datetime import datetime, timedelta
@@ -16,13 +21,19 @@ from shapely.geometry import box
 # Import our modular components
 from core.map_gen import MapGenerator
 from core.map_storage import MapStorage
-from core.map_views import MapPinButtonView, LocationModal, UserPinOptionsView
-from core.map_views_admin import AdminToolsView
+from core.map_views import MapPinButtonView, LocationModal, UserPinOptionsView, ContinentSelectionView
 from core.map_config import MapConfig
+from core.map_progress_handler import create_server_map_progress_callback, finish_progress
 
 
 # Constants
 IMAGE_WIDTH = 1500
+# zlib level for map PNGs, level 9 is several times slower for only slightly smaller files
+PNG_COMPRESS_LEVEL = 3
+# Close-ups are sent as lossy WebP, encoding is faster and the files are a fraction of the PNG size
+CLOSEUP_WEBP_QUALITY = 85
+# Map info entries kept, older guild generations fall out first
+MAP_INFO_CACHE_SIZE = 64
 # BOT_OWNER_ID and PIN_COOLDOWN_MINUTES will be loaded from config in __init__
 
 
@@ -41,9 +52,12 @@ class MapV2Cog(commands.Cog):
         self.data_dir = Path(__file__).parent.parent / "config"
         self.cache_dir = Path(__file__).parent.parent / "data/map_cache"
         
+        # Dedicated threads for synchronous shapefile and PIL work, so renders never stall the event loop
+        self._render_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="map-render")
+        
         # Initialize modular components
         self.storage = MapStorage(self.data_dir, self.cache_dir, self.log)
-        self.map_generator = MapGenerator(self.data_dir, self.cache_dir, self.log)
+        self.map_generator = MapGenerator(self.data_dir, self.cache_dir, self.log, self._render_executor)
         
         # Load data and configs
         self.global_config = self.storage.load_global_config()
@@ -51,6 +65,84 @@ class MapV2Cog(commands.Cog):
         
         # Cooldown tracking for pin updates
         self.pin_cooldowns = {}  # user_id -> last_update_timestamp
+        
+        # Bound concurrent renders, each one holds several full-size images in memory
+        self._render_concurrency = max(1, self.config.map_render_concurrency)
+        self._render_sem = asyncio.Semaphore(self._render_concurrency)
+        self._renders_waiting = 0
+        
+        # Close-up renders in progress, keyed by guild and closeup cache key, so concurrent clicks share one render
+        self._inflight: Dict[Tuple[int, str], asyncio.Task] = {}
+        
+        # One persistent continent picker for all guilds, registered with the bot in cog_load, handles every
+        # picker click. Messages are sent the stopped copy, which only supplies the components: discord.py
+        # stores no view for a finished one, so picker messages never add entries to its view store
+        self.continent_view = ContinentSelectionView(self)
+        self.continent_picker = ContinentSelectionView(self)
+        self.continent_picker.stop()
+        
+        # Guild-wide part of the map info embed, keyed by guild and data generation. Every save bumps
+        # the generation, so entries of changed maps are never looked up again and age out of the LRU
+        self._map_generations: Dict[str, int] = {}
+        self._map_info_cache: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+        
+        # German state geometries, loaded on first use
+        self._german_states = None
+        
+        # State selection buttons as full_name -> (short, emoji), the states config never changes at runtime
+        self._german_state_buttons = {
+            full_name: (state_data['short'],
+                        f"<:coat_{state_data['short'].lower()}:{state_data['emoji_id']}>" if state_data.get('emoji_id') else None)
+            for full_name, state_data in self.map_generator.map_config.GERMAN_STATES.items()
+        }
+        self._prerender_task = None
+    
+    @contextlib.asynccontextmanager
+    async def _render_slot(self, progress_callback=None):
+        """Hold one of the bounded render slots, telling the user when the render has to queue."""
+        if self._render_sem.locked() and progress_callback:
+            ahead = self._renders_waiting + self._render_concurrency
+            await progress_callback(f"Queued, {ahead} render(s) ahead of yours", 0)
+        self._renders_waiting += 1
+        try:
+            await self._render_sem.acquire()
+        finally:
+            self._renders_waiting -= 1
+        try:
+            yield
+        finally:
+            self._render_sem.release()
+    
+    async def _coalesced_render(self, key: Tuple[int, str], render) -> Optional[BytesIO]:
+        """Await render() unless the same close-up is already rendering, then share that result."""
+        task = self._inflight.get(key)
+        if task is None:
+            # The render runs in its own task, so cancelling any caller (the first one included)
+            # cannot cancel the render other users are waiting for
+            task = asyncio.ensure_future(self._render_bytes(render))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._finish_inflight, key))
+        image_data = await asyncio.shield(task)
+        return BytesIO(image_data) if image_data else None
+    
+    @staticmethod
+    async def _render_bytes(render) -> Optional[bytes]:
+        """Await render() and return the image bytes, so every caller gets its own buffer."""
+        image = await render()
+        return image.getvalue() if image else None
+    
+    def _finish_inflight(self, key: Tuple[int, str], task: asyncio.Task):
+        """Forget a finished close-up render."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved, every caller may have been cancelled
+            task.exception()
+    
+    async def _run_render(self, func, *args):
+        """Run a synchronous rendering step on the render executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._render_executor, functools.partial(func, *args))
     
     def _is_user_on_cooldown(self, user_id: str) -> Tuple[bool, Optional[datetime]]:
         """Check if user is on cooldown for pin updates."""
@@ -77,6 +169,9 @@ class MapV2Cog(commands.Cog):
             # Clear base map cache on restart for fresh start
             self.storage.cache.memory_cache.clear()
             self.log.info("Cleared all base map cache on restart")
+            
+            # Continent picker buttons keep working on messages sent before a restart
+            self.bot.add_view(self.continent_view)
         
             # Register all persistent views for existing maps
             for guild_id, map_data in self.maps.items():
@@ -115,6 +210,49 @@ class MapV2Cog(commands.Cog):
                 self.log.info(f"Re-registered persistent view for guild {guild_id}")
         except Exception as e:
             self.log.error(f"Error re-registering views: {e}")
+        
+        # Warm the state close-up base maps in the background, the first click then only draws pins
+        self._prerender_task = asyncio.create_task(self._prerender_state_base_maps())
+
+    async def _prerender_state_base_maps(self):
+        """Render the default-style state close-up base maps that are missing from the disk cache."""
+        rendered = 0
+        for state_name in self.map_generator.map_config.GERMAN_STATES:
+            try:
+                state_geom = await self._run_render(self._find_state_geometry, state_name)
+                if state_geom is None:
+                    continue
+                minx, miny, maxx, maxy, width, height = self._state_closeup_layout(state_geom)
+                
+                # No maps entry means default settings, so the result lands in the shared cache every default guild reads
+                if await self.storage.get_cached_closeup_base_map(0, {}, "state", state_name, width, height, lazy=True):
+                    continue
+                
+                # Renders one state at a time on the render executor without taking a user render slot,
+                # so the warmup occupies at most one worker thread and never queues user renders.
+                # Partial renders of a failed shapefile load come back as None and stay out of the shared cache.
+                base_map, _ = await self.map_generator.render_base_map(
+                    minx, miny, maxx, maxy, width, height,
+                    map_type="state_closeup",
+                    guild_id="0",
+                    maps={},
+                    zoom_level="state_closeup",
+                    require_complete=True
+                )
+                if base_map:
+                    await self.storage.cache_closeup_base_map(0, {}, "state", state_name, width, height, base_map)
+                    rendered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log.warning(f"Could not pre-render state base map for {state_name}: {e}")
+        
+        if rendered:
+            self.log.info(f"Pre-rendered {rendered} state close-up base maps")
+
+    async def _refresh_maps(self, guild_id: int, channel_id: int, interaction=None):
+        """Update a guild's map and the global overview concurrently, they post to different channels."""
+        await asyncio.gather(self._update_map(guild_id, channel_id, interaction), self._update_global_overview())
 
     async def _update_map(self, guild_id: int, channel_id: int, interaction=None):
         """Update the map in the specified channel."""
@@ -134,12 +272,14 @@ class MapV2Cog(commands.Cog):
                 )
                 progress_message = await interaction.followup.send(embed=progress_embed, ephemeral=True)
 
-            # Use centralized progress handler
-            from core.map_progress_handler import create_server_map_progress_callback
             progress_callback = await create_server_map_progress_callback(interaction, self.log, progress_message, hide_final_image=True) if progress_message else None
 
             # Generate map image (uses caching internally and respects custom settings)
-            map_file = await self._generate_map_image(guild_id, progress_callback)
+            try:
+                map_file = await self._generate_map_image(guild_id, progress_callback)
+            finally:
+                # Every edit of the progress message below is final, a trailing progress edit must not overwrite it
+                await finish_progress(progress_callback)
             if not map_file:
                 self.log.error("Failed to generate map image")
                 if progress_message:
@@ -203,11 +343,48 @@ class MapV2Cog(commands.Cog):
         # Save all guild data
         for guild_id in self.maps.keys():
             asyncio.create_task(self._save_data(guild_id))
+        asyncio.create_task(self.map_generator.flush_geocode_cache())
+        if self._prerender_task:
+            self._prerender_task.cancel()
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._render_executor.shutdown(wait=False)
 
     async def _save_data(self, guild_id: str):
         """Save map data for specific guild."""
+        # Every pin, region or channel change is saved, so this is where derived info goes stale
+        guild_id = str(guild_id)
+        self._map_generations[guild_id] = self._map_generations.get(guild_id, 0) + 1
         await self.storage.save_data(guild_id, self.maps)
 
+    def _get_map_info(self, guild_id: str) -> Dict:
+        """Pin count, region, channel and creation date of a guild's map, cached until its next save."""
+        key = (guild_id, self._map_generations.get(guild_id, 0))
+        info = self._map_info_cache.get(key)
+        if info is not None:
+            self._map_info_cache.move_to_end(key)
+        else:
+            map_data = self.maps[guild_id]
+            created_date = map_data.get('created_date_display')
+            created_at = map_data.get('created_at')
+            if created_date is None and created_at:
+                # Maps created before the display date was stored, parse once and keep it with the map
+                try:
+                    created_date = datetime.fromisoformat(created_at).strftime('%Y-%m-%d')
+                    map_data['created_date_display'] = created_date
+                except (TypeError, ValueError):
+                    pass
+            info = {
+                'pin_count': len(map_data.get('pins', {})),
+                'region': map_data['region'].title(),
+                'channel': f"<#{map_data['channel_id']}>",
+                'created_date': created_date,
+            }
+            self._map_info_cache[key] = info
+            while len(self._map_info_cache) > MAP_INFO_CACHE_SIZE:
+                self._map_info_cache.popitem(last=False)
+        return info
+
     async def _invalidate_map_cache(self, guild_id: int):
         """Invalidate cached maps for a guild."""
         await self.storage.invalidate_map_cache(guild_id)
@@ -228,7 +405,8 @@ class MapV2Cog(commands.Cog):
             width, height = self.map_generator.calculate_image_dimensions('germany')
             
             # Try to get cached base map first
-            base_map = await self.storage.get_cached_base_map(region, width, height, str(guild_id), self.maps)
+            base_map_key = self.storage.base_map_cache_key(region, width, height, str(guild_id), self.maps)
+            base_map = await self.storage.get_cached_base_map(region, width, height, str(guild_id), self.maps, cache_key=base_map_key)
             projection_func = None
             
             if not base_map:
@@ -245,14 +423,14 @@ class MapV2Cog(commands.Cog):
                 
                 if base_map:
                     # Cache the new base map
-                    await self.storage.cache_base_map(region, width, height, base_map, str(guild_id), self.maps)
+                    await self.storage.cache_base_map(region, width, height, base_map, str(guild_id), self.maps, cache_key=base_map_key)
                 else:
                     # Fallback to simple background
                     land_color, water_color = self.map_generator.get_map_colors(str(guild_id), self.maps)
                     base_map = Image.new('RGB', (width, height), color=water_color)
             else:
                 # For cached maps, recreate the projection function
-                projection_func = self._create_projection_function('germany', width, height)
+                projection_func = await self._create_projection_function('germany', width, height)
             
             # Calculate pin size based on image height and custom settings
             pin_color, custom_pin_size = self.map_generator.get_pin_settings(str(guild_id), self.maps)
@@ -261,12 +439,13 @@ class MapV2Cog(commands.Cog):
             # Group overlapping pins
             pin_groups = self.map_generator.group_overlapping_pins(pins, projection_func, base_pin_size)
             
-            # Draw pins on the map with custom settings
+            # Draw pins on the map with custom settings, on a copy since the base map is shared with the cache
+            base_map = base_map.copy()
             self.map_generator.draw_pins_on_map(base_map, pin_groups, width, height, base_pin_size, str(guild_id), self.maps)
             
             # Convert PIL image to Discord file
             img_buffer = BytesIO()
-            base_map.save(img_buffer, format='PNG', optimize=True)
+            base_map.save(img_buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
             
             # Cache the final image
             await self.storage.cache_map(guild_id, self.maps, img_buffer)
@@ -279,34 +458,181 @@ class MapV2Cog(commands.Cog):
             self.log.error(f"Failed to generate map image: {e}")
             return None
 
-    def _create_projection_function(self, region: str, width: int, height: int):
+    async def _create_projection_function(self, region: str, width: int, height: int):
         """Create projection function for Germany maps."""
-        data_path = Path(__file__).parent.parent / "data"
-        bounds = self.map_generator.map_config.get_region_bounds('germany', data_path)
-        (lat0, lon0), (lat1, lon1) = bounds
-        minx, miny, maxx, maxy = lon0, lat0, lon1, lat1
+        minx, miny, maxx, maxy = await self._run_render(self.map_generator.get_region_render_bounds, 'germany')
+        return self.map_generator.create_projection_function(minx, miny, maxx, maxy, width, height)
+
+
+
+    def _find_state_geometry(self, state_name: str):
+        """Look up the geometry of a German state in the states shapefile, None if unknown."""
+        # The states shapefile is large, read it once and keep only the German rows
+        if self._german_states is None:
+            base = Path(__file__).parent.parent / "data"
+            states = gpd.read_file(base / "ne_10m_admin_1_states_provinces.shp")
+            self._german_states = states[states["admin"] == "Germany"]
+        german_states = self._german_states
+        
+        # Find the state
+        state_row = german_states[german_states["name"] == state_name]
         
-        # Try to get better bounds from Germany shapefile
+        if state_row.empty:
+            state_row = german_states[german_states["name"].str.contains(state_name, case=False, na=False)]
+        
+        if state_row.empty:
+            name_alternatives = {
+                "Bayern": "Bavaria",
+                "Nordrhein-Westfalen": "North Rhine-Westphalia",
+                "Baden-Württemberg": "Baden-Wurttemberg",
+                "Thüringen": "Thuringia"
+            }
+            alt_name = name_alternatives.get(state_name, state_name)
+            state_row = german_states[german_states["name"].str.contains(alt_name, case=False, na=False)]
+        
+        if state_row.empty:
+            return None
+        return state_row.geometry.iloc[0]
+
+    def _finish_state_closeup(self, base_map: Image.Image, state_geom, state_name: str, projection_func,
+                              pins: Dict, pin_settings: Tuple[str, int], width: int, height: int) -> BytesIO:
+        """Highlight the state, draw the pins and encode the state close-up as WebP.
+        Runs on the render executor, so it only gets snapshots of the guild's pins and pin settings."""
+        # Highlight the selected state with a subtle border, on a copy since the base map is shared with the cache
+        base_map = base_map.copy()
+        draw = ImageDraw.Draw(base_map)
         try:
-            base_path = Path(__file__).parent.parent / "data"
-            world = gpd.read_file(base_path / "ne_10m_admin_0_countries.shp")
-            de = world[world["ADMIN"] == "Germany"].geometry.unary_union
-            if de is not None:
-                de_buf = de.buffer(0.1)  # Smaller buffer
-                bounds = de_buf.bounds
-                if all(map(lambda v: v is not None and v == v, bounds)) and bounds[2] > bounds[0] and bounds[3] > bounds[1]:  # Check for finite values
-                    minx, miny, maxx, maxy = bounds
+            if hasattr(state_geom, 'exterior'):
+                coords_list = [state_geom.exterior.coords]
+            else:
+                coords_list = [ring.exterior.coords for ring in state_geom.geoms]
+        
+            for coords in coords_list:
+                pts = [projection_func(y, x) for x, y in coords]
+                if len(pts) >= 2:
+                    # Thicker red border for selected state
+                    draw.line(pts, fill=(200, 0, 0), width=max(2, 3))
         except Exception as e:
-            self.log.warning(f"Could not recreate Germany bounds: {e}")
+            self.log.warning(f"Could not highlight state {state_name}: {e}")
         
-        def to_px(lat, lon):
-            x = (lon - minx) / (maxx - minx) * width
-            y = (maxy - lat) / (maxy - miny) * height
-            return (int(x), int(y))
+        return self._draw_closeup_pins(base_map, projection_func, pins, pin_settings, width, height)
+
+    def _finish_region_closeup(self, base_map: Image.Image, projection_func, pins: Dict,
+                               pin_settings: Tuple[str, int], width: int, height: int) -> BytesIO:
+        """Draw the pins on a copy of a continent or country base map and encode it as WebP."""
+        return self._draw_closeup_pins(base_map.copy(), projection_func, pins, pin_settings, width, height)
+
+    def _draw_closeup_pins(self, image: Image.Image, projection_func, pins: Dict,
+                           pin_settings: Tuple[str, int], width: int, height: int) -> BytesIO:
+        """Draw the pins into image, which the caller owns, and encode the close-up as WebP."""
+        # Draw pins for this guild with custom settings
+        base_pin_size = int(height * pin_settings[1] / 2400)
+        pin_groups = self.map_generator.group_overlapping_pins(pins, projection_func, base_pin_size)
         
-        return to_px
-
-
+        self.map_generator.draw_pins_on_map(image, pin_groups, width, height, base_pin_size, pin_settings=pin_settings)
+        
+        # Convert to BytesIO
+        img_buffer = BytesIO()
+        image.save(img_buffer, format='WEBP', quality=CLOSEUP_WEBP_QUALITY, method=4)
+        return img_buffer
+
+    def _region_closeup_layout(self, region: str) -> Tuple[float, float, float, float, int, int]:
+        """Render bounds and pixel size of a continent or country close-up, may read the countries shapefile."""
+        minx, miny, maxx, maxy = self.map_generator.get_region_render_bounds(region)
+        width, height = self.map_generator.calculate_image_dimensions(region)
+        return minx, miny, maxx, maxy, width, height
+
+    def _state_closeup_layout(self, state_geom) -> Tuple[float, float, float, float, int, int]:
+        """Padded bounds and pixel size of a state close-up."""
+        # Get bounds and add padding
+        minx, miny, maxx, maxy = state_geom.bounds
+        
+        width_range = maxx - minx
+        height_range = maxy - miny
+        padding_x = width_range * 0.05
+        padding_y = height_range * 0.05
+        
+        minx -= padding_x
+        maxx += padding_x
+        miny -= padding_y
+        maxy += padding_y
+        
+        # Calculate dimensions using Web Mercator
+        def lat_to_mercator_y(lat):
+            return math.log(math.tan((90 + lat) * math.pi / 360))
+        
+        y0 = lat_to_mercator_y(miny)
+        y1 = lat_to_mercator_y(maxy)
+        mercator_y_range = y1 - y0
+        
+        lon_range_radians = (maxx - minx) * math.pi / 180
+        aspect_ratio = mercator_y_range / lon_range_radians
+        
+        width = 1400
+        height = int(width * aspect_ratio)
+        height = max(600, min(height, 2000))
+        
+        return minx, miny, maxx, maxy, width, height
+
+    async def _render_state_closeup(self, guild_id: int, state_name: str, progress_callback=None) -> Optional[BytesIO]:
+        """Render, cache and return a state close-up that is not in the cache yet."""
+        # Load shapefiles to find state bounds
+        state_geom = await self._run_render(self._find_state_geometry, state_name)
+        if state_geom is None:
+            self.log.warning(f"State {state_name} not found")
+            return None
+        
+        minx, miny, maxx, maxy, width, height = self._state_closeup_layout(state_geom)
+        
+        # Try to get cached base map first
+        base_map = await self.storage.get_cached_closeup_base_map(guild_id, self.maps, "state", state_name, width, height)
+        projection_func = None
+        
+        if not base_map:
+            # Generate new base map
+            self.log.info(f"No base map in cache for {state_name} state closeup, rendering new one (will take some time)")
+            
+            # Notify user about base map rendering if callback provided
+            if progress_callback:
+                await progress_callback(f"No base map in cache, rendering new one (will take some time)", 5)
+            
+            # Define progress callback for rendering updates
+            async def render_progress_callback(message, percentage, image_buffer=None):
+                self.log.info(f"State closeup rendering progress: {message} ({percentage}%)")
+                # Also update the user via the existing progress callback if provided
+                if progress_callback:
+                    await progress_callback(f"Rendering base map: {message}", percentage, image_buffer)
+            
+            base_map, projection_func = await self.map_generator.render_base_map(
+                minx, miny, maxx, maxy, width, height, 
+                map_type="state_closeup", 
+                guild_id=str(guild_id), 
+                maps=self.maps,
+                zoom_level="state_closeup",
+                progress_callback=render_progress_callback
+            )
+            
+            if base_map:
+                # Cache the new base map
+                await self.storage.cache_closeup_base_map(guild_id, self.maps, "state", state_name, width, height, base_map)
+            else:
+                return None
+        else:
+            # For cached maps, recreate the projection function
+            projection_func = self.map_generator.create_projection_function(minx, miny, maxx, maxy, width, height)
+        
+        # Highlight the state, draw the pins and encode off the event loop, from snapshots of the guild's data
+        pins = {user_id: dict(pin) for user_id, pin in self.maps.get(str(guild_id), {}).get('pins', {}).items()}
+        pin_settings = self.map_generator.get_pin_settings(str(guild_id), self.maps)
+        img_buffer = await self._run_render(
+            self._finish_state_closeup, base_map, state_geom, state_name, projection_func, pins, pin_settings, width, height
+        )
+        
+        # Cache the closeup map
+        await self.storage.cache_closeup(guild_id, self.maps, "state", state_name, img_buffer)
+        
+        img_buffer.seek(0)
+        return img_buffer
 
     async def _generate_state_closeup(self, guild_id: int, state_name: str, progress_callback=None) -> Optional[BytesIO]:
         """Generate a close-up map of a German state using unified renderer."""
@@ -316,138 +642,57 @@ class MapV2Cog(commands.Cog):
             if cached_closeup:
                 return cached_closeup
             
-            # Load shapefiles to find state bounds
-            base = Path(__file__).parent.parent / "data"
-            states = gpd.read_file(base / "ne_10m_admin_1_states_provinces.shp")
-            
-            # Find the state
-            german_states = states[states["admin"] == "Germany"]
-            state_row = german_states[german_states["name"] == state_name]
-            
-            if state_row.empty:
-                state_row = german_states[german_states["name"].str.contains(state_name, case=False, na=False)]
-            
-            if state_row.empty:
-                name_alternatives = {
-                    "Bayern": "Bavaria",
-                    "Nordrhein-Westfalen": "North Rhine-Westphalia",
-                    "Baden-Württemberg": "Baden-Wurttemberg",
-                    "Thüringen": "Thuringia"
-                }
-                alt_name = name_alternatives.get(state_name, state_name)
-                state_row = german_states[german_states["name"].str.contains(alt_name, case=False, na=False)]
-            
-            if state_row.empty:
-                self.log.warning(f"State {state_name} not found")
-                return None
-            
-            # Get bounds and add padding
-            state_geom = state_row.geometry.iloc[0]
-            bounds = state_geom.bounds
-            minx, miny, maxx, maxy = bounds
-            
-            width_range = maxx - minx
-            height_range = maxy - miny
-            padding_x = width_range * 0.05
-            padding_y = height_range * 0.05
-            
-            minx -= padding_x
-            maxx += padding_x
-            miny -= padding_y
-            maxy += padding_y
-            
-            # Calculate dimensions using Web Mercator
-            def lat_to_mercator_y(lat):
-                return math.log(math.tan((90 + lat) * math.pi / 360))
-            
-            y0 = lat_to_mercator_y(miny)
-            y1 = lat_to_mercator_y(maxy)
-            mercator_y_range = y1 - y0
-            
-            lon_range_radians = (maxx - minx) * math.pi / 180
-            aspect_ratio = mercator_y_range / lon_range_radians
-            
-            width = 1400
-            height = int(width * aspect_ratio)
-            height = max(600, min(height, 2000))
-            
-            # Try to get cached base map first
-            base_map = await self.storage.get_cached_closeup_base_map(guild_id, self.maps, "state", state_name, width, height)
-            projection_func = None
-            
-            if not base_map:
-                # Generate new base map
-                self.log.info(f"No base map in cache for {state_name} state closeup, rendering new one (will take some time)")
-                
-                # Notify user about base map rendering if callback provided
-                if progress_callback:
-                    await progress_callback(f"No base map in cache, rendering new one (will take some time)", 5)
-                
-                # Define progress callback for rendering updates
-                async def render_progress_callback(message, percentage, image_buffer=None):
-                    self.log.info(f"State closeup rendering progress: {message} ({percentage}%)")
-                    # Also update the user via the existing progress callback if provided
-                    if progress_callback:
-                        await progress_callback(f"Rendering base map: {message}", percentage, image_buffer)
-                
-                base_map, projection_func = await self.map_generator.render_base_map(
-                    minx, miny, maxx, maxy, width, height, 
-                    map_type="state_closeup", 
-                    guild_id=str(guild_id), 
-                    maps=self.maps,
-                    zoom_level="state_closeup",
-                    progress_callback=render_progress_callback
-                )
-                
-                if base_map:
-                    # Cache the new base map
-                    await self.storage.cache_closeup_base_map(guild_id, self.maps, "state", state_name, width, height, base_map)
-                else:
-                    return None
-            else:
-                # For cached maps, recreate the projection function
-                projection_func = self.map_generator.create_projection_function(minx, miny, maxx, maxy, width, height)
-            
-            # Highlight the selected state with a subtle border
-            draw = ImageDraw.Draw(base_map)
-            try:
-                if hasattr(state_geom, 'exterior'):
-                    coords_list = [state_geom.exterior.coords]
-                else:
-                    coords_list = [ring.exterior.coords for ring in state_geom.geoms]
-                
-                for coords in coords_list:
-                    pts = [projection_func(y, x) for x, y in coords]
-                    if len(pts) >= 2:
-                        # Thicker red border for selected state
-                        draw.line(pts, fill=(200, 0, 0), width=max(2, 3))
-            except Exception as e:
-                self.log.warning(f"Could not highlight state {state_name}: {e}")
-
-            # Draw pins for this guild with custom settings
-            map_data = self.maps.get(str(guild_id), {})
-            pins = map_data.get('pins', {})
+            # Only the render itself needs a slot, cache hits above never queue
+            async def render():
+                async with self._render_slot(progress_callback):
+                    return await self._render_state_closeup(guild_id, state_name, progress_callback)
             
-            pin_color, custom_pin_size = self.map_generator.get_pin_settings(str(guild_id), self.maps)
-            base_pin_size = int(height * custom_pin_size / 2400)
-            pin_groups = self.map_generator.group_overlapping_pins(pins, projection_func, base_pin_size)
-            
-            self.map_generator.draw_pins_on_map(base_map, pin_groups, width, height, base_pin_size, str(guild_id), self.maps)
-
-            # Convert to BytesIO
-            img_buffer = BytesIO()
-            base_map.save(img_buffer, format='PNG', optimize=True)
-            
-            # Cache the closeup map
-            await self.storage.cache_closeup(guild_id, self.maps, "state", state_name, img_buffer)
-            
-            img_buffer.seek(0)
-            return img_buffer
+            key = (guild_id, self.storage.closeup_cache_key(guild_id, self.maps, "state", state_name))
+            return await self._coalesced_render(key, render)
             
         except Exception as e:
             self.log.error(f"Failed to generate state closeup for {state_name}: {e}")
             return None
 
+    async def _generate_continent_closeup(self, guild_id: int, region: str, progress_callback=None) -> Optional[BytesIO]:
+        """Render a continent or country close-up with the guild's pins.
+        
+        The closeup cache, render slot and coalescing are handled by the caller.
+        """
+        if region not in self.map_generator.map_config.MAP_REGIONS:
+            self.log.warning(f"No map region configured for a close-up of {region}")
+            return None
+        
+        minx, miny, maxx, maxy, width, height = await self._run_render(self._region_closeup_layout, region)
+        
+        base_map = await self.storage.get_cached_closeup_base_map(guild_id, self.maps, "region", region, width, height)
+        if base_map:
+            projection_func = self.map_generator.create_projection_function(minx, miny, maxx, maxy, width, height)
+        else:
+            self.log.info(f"No base map in cache for {region} closeup, rendering new one (will take some time)")
+            
+            async def render_progress_callback(message, percentage, image_buffer=None):
+                if progress_callback:
+                    await progress_callback(f"Rendering base map: {message}", percentage, image_buffer)
+            
+            # Same map type choice as render_geopandas_map, which would recompute the bounds on the event loop
+            map_type = "world" if region == "world" else "europe" if region == "europe" else "default"
+            base_map, projection_func = await self.map_generator.render_base_map(
+                minx, miny, maxx, maxy, width, height, map_type,
+                guild_id=str(guild_id),
+                maps=self.maps,
+                region=region,
+                progress_callback=render_progress_callback
+            )
+            if not base_map:
+                return None
+            await self.storage.cache_closeup_base_map(guild_id, self.maps, "region", region, width, height, base_map)
+        
+        # Draw the pins and encode off the event loop, from snapshots of the guild's data
+        pins = {user_id: dict(pin) for user_id, pin in self.maps.get(str(guild_id), {}).get('pins', {}).items()}
+        pin_settings = self.map_generator.get_pin_settings(str(guild_id), self.maps)
+        return await self._run_render(self._finish_region_closeup, base_map, projection_func, pins, pin_settings, width, height)
+
     async def _update_global_overview(self):
         """Update global overview of all maps."""
         try:
@@ -614,8 +859,7 @@ class MapV2Cog(commands.Cog):
     
         # Update the map and global overview
         channel_id = self.maps[guild_id]['channel_id']
-        await self._update_map(interaction.guild.id, channel_id)
-        await self._update_global_overview()
+        await self._refresh_maps(interaction.guild.id, channel_id)
 
         # Create success embed
         if is_update:
@@ -712,8 +956,7 @@ class MapV2Cog(commands.Cog):
         
         # Update the map and global overview
         channel_id = self.maps[guild_id]['channel_id']
-        await self._update_map(interaction.guild.id, channel_id)
-        await self._update_global_overview()
+        await self._refresh_maps(interaction.guild.id, channel_id)
         
         # Create embed for update confirmation
         embed = discord.Embed(
@@ -737,9 +980,9 @@ class MapV2Cog(commands.Cog):
             # If editing fails, send new message
             await interaction.followup.send(embed=embed, ephemeral=True)
 
-    async def _generate_preview_map(self, guild_id: int, preview_settings: Dict, progress_callback=None) -> Optional[Tuple[BytesIO, Image.Image]]:
+    async def _generate_preview_map(self, guild_id: int, preview_settings: Dict, progress_callback=None, img_buffer: Optional[BytesIO] = None) -> Optional[Tuple[BytesIO, Image.Image]]:
         """Generate a preview map with temporary settings - OPTIMIZED with intelligent caching.
-        Returns tuple of (final_preview_image, base_map_for_caching)."""
+        Returns tuple of (final_preview_image, base_map_for_caching), written into img_buffer when given."""
         try:
             guild_id_str = str(guild_id)
             map_data = self.maps.get(guild_id_str, {})
@@ -775,7 +1018,7 @@ class MapV2Cog(commands.Cog):
                 self.log.info(f"Preview optimization: Reusing base map for guild {guild_id} (only pins changed)")
                 base_map = await self.storage.get_cached_base_map(region, width, height, guild_id_str, self.maps)
                 if base_map:
-                    projection_func = self._create_projection_function('germany', width, height)
+                    projection_func = await self._create_projection_function('germany', width, height)
             
             if not base_map:
                 # GENERATE: Colors/borders changed, need new base map
@@ -799,14 +1042,15 @@ class MapV2Cog(commands.Cog):
                 temp_maps[guild_id_str]['settings'] = preview_settings
                 land_color, water_color = self.map_generator.get_map_colors(guild_id_str, temp_maps)
                 base_map = Image.new('RGB', (width, height), color=water_color)
-                projection_func = self._create_projection_function('germany', width, height)
+                projection_func = await self._create_projection_function('germany', width, height)
             
             # Create temporary maps for pin rendering
             temp_maps = {guild_id_str: map_data.copy()}
             temp_maps[guild_id_str]['settings'] = preview_settings
             
-            # Store a copy of the base map before adding pins (for caching when approved)
-            base_map_for_caching = base_map.copy()
+            # Keep the clean base map for caching when approved and draw pins on a copy
+            base_map_for_caching = base_map
+            base_map = base_map.copy()
             
             # Calculate pin size based on preview settings
             pin_color, custom_pin_size = self.map_generator.get_pin_settings(guild_id_str, temp_maps)
@@ -818,9 +1062,11 @@ class MapV2Cog(commands.Cog):
             # Draw pins on the map with preview settings
             self.map_generator.draw_pins_on_map(base_map, pin_groups, width, height, base_pin_size, guild_id_str, temp_maps)
             
-            # Convert PIL image to BytesIO
-            img_buffer = BytesIO()
-            base_map.save(img_buffer, format='PNG', optimize=True)
+            # Convert PIL image to BytesIO, a reused buffer may hold a longer previous preview
+            if img_buffer is None:
+                img_buffer = BytesIO()
+            base_map.save(img_buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+            img_buffer.truncate()
             img_buffer.seek(0)
             
             return img_buffer, base_map_for_caching
@@ -883,8 +1129,9 @@ class MapV2Cog(commands.Cog):
             self.log.error(f"Failed to apply cached preview as map: {e}")
             return False
 
-    async def _generate_fast_pin_preview(self, guild_id: int, preview_settings: Dict) -> Optional[BytesIO]:
-        """Generate fast pin preview by reusing cached base map - ALWAYS use cache for pin-only changes."""
+    async def _generate_fast_pin_preview(self, guild_id: int, preview_settings: Dict, img_buffer: Optional[BytesIO] = None) -> Optional[BytesIO]:
+        """Generate fast pin preview by reusing cached base map - ALWAYS use cache for pin-only changes.
+        The preview is written into img_buffer when given."""
         try:
             guild_id_str = str(guild_id)
             map_data = self.maps.get(guild_id_str, {})
@@ -895,13 +1142,14 @@ class MapV2Cog(commands.Cog):
             width, height = self.map_generator.calculate_image_dimensions('germany')
             
             # ALWAYS TRY CACHE FIRST for pin previews
-            base_map = await self.storage.get_cached_base_map(region, width, height, guild_id_str, self.maps)
+            base_map_key = self.storage.base_map_cache_key(region, width, height, guild_id_str, self.maps)
+            base_map = await self.storage.get_cached_base_map(region, width, height, guild_id_str, self.maps, cache_key=base_map_key)
             projection_func = None
             
             if base_map:
                 # CACHE HIT: Use cached base map
                 self.log.info(f"Fast pin preview: Using cached base map for guild {guild_id}")
-                projection_func = self._create_projection_function('germany', width, height)
+                projection_func = await self._create_projection_function('germany', width, height)
             else:
                 # CACHE MISS: Generate base map and cache it
                 self.log.info(f"Fast pin preview: Generating and caching base map for guild {guild_id}")
@@ -909,13 +1157,13 @@ class MapV2Cog(commands.Cog):
                     region, width, height, guild_id_str, self.maps
                 )
                 if base_map:
-                    await self.storage.cache_base_map(region, width, height, base_map, guild_id_str, self.maps)
+                    await self.storage.cache_base_map(region, width, height, base_map, guild_id_str, self.maps, cache_key=base_map_key)
             
             if not base_map or not projection_func:
                 # Fallback: Generate simple background
                 land_color, water_color = self.map_generator.get_map_colors(guild_id_str, self.maps)
                 base_map = Image.new('RGB', (width, height), color=water_color)
-                projection_func = self._create_projection_function('germany', width, height)
+                projection_func = await self._create_projection_function('germany', width, height)
             
             # Create temporary maps with preview pin settings
             temp_maps = {guild_id_str: map_data.copy()}
@@ -928,12 +1176,15 @@ class MapV2Cog(commands.Cog):
             # Group overlapping pins
             pin_groups = self.map_generator.group_overlapping_pins(pins, projection_func, base_pin_size)
             
-            # Draw pins on the map with preview settings
+            # Draw pins on the map with preview settings, on a copy since the base map is shared with the cache
+            base_map = base_map.copy()
             self.map_generator.draw_pins_on_map(base_map, pin_groups, width, height, base_pin_size, guild_id_str, temp_maps)
             
-            # Convert PIL image to BytesIO
-            img_buffer = BytesIO()
-            base_map.save(img_buffer, format='PNG', optimize=True)
+            # Convert PIL image to BytesIO, a reused buffer may hold a longer previous preview
+            if img_buffer is None:
+                img_buffer = BytesIO()
+            base_map.save(img_buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+            img_buffer.truncate()
             img_buffer.seek(0)
             
             return img_buffer
@@ -963,8 +1214,7 @@ class MapV2Cog(commands.Cog):
                 # Invalidate Cache and update map
                 await self._invalidate_map_cache(int(guild_id))
                 channel_id = self.maps[guild_id]['channel_id']
-                await self._update_map(int(guild_id), channel_id)
-                await self._update_global_overview()
+                await self._refresh_maps(int(guild_id), channel_id)
 
                 self.log.info(f"Removed pin for user {member.display_name} ({user_id}) who left guild {guild_id}")
 
@@ -990,17 +1240,18 @@ class MapV2Cog(commands.Cog):
             await interaction.followup.send("⛔ A map already exists for this server. Use the Admin Tools to remove it first.", ephemeral=True)
             return
 
+        created_at = datetime.now()
         self.maps[guild_id] = {
             'channel_id': channel.id,
             'region': 'germany',
             'pins': {},
-            'created_at': datetime.now().isoformat(),
+            'created_at': created_at.isoformat(),
+            'created_date_display': created_at.strftime('%Y-%m-%d'),
             'created_by': interaction.user.id
         }
 
         await self._save_data(guild_id)
-        await self._update_map(interaction.guild.id, channel.id, interaction)
-        await self._update_global_overview()
+        await self._refresh_maps(interaction.guild.id, channel.id, interaction)
 
     @app_commands.command(name="map_pin", description="Pin your location on the Germany map")
     async def pin_on_map_v2(self, interaction: discord.Interaction):
@@ -10,12 +10,22 @@ from core.config import config
 
 log = logging.getLogger("tausendsassa.cache")
 
+def _estimate_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value; only images are counted"""
+    getbands = getattr(value, "getbands", None)
+    if getbands is None:
+        return 0
+    return value.width * value.height * len(getbands())
+
 class LRUCache:
-    """LRU Cache with size limits and automatic cleanup"""
+    """LRU Cache with item and byte limits and automatic cleanup"""
     
-    def __init__(self, max_items: int):
+    def __init__(self, max_items: int, max_bytes: Optional[int] = None):
         self.max_items = max_items
+        self.max_bytes = max_bytes
         self.cache: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
         self._lock = asyncio.Lock()
     
     async def get(self, key: str) -> Optional[Any]:
@@ -33,6 +43,10 @@ class LRUCache:
     async def set(self, key: str, value: Any):
         """Set item in cache, evicting oldest if necessary"""
         async with self._lock:
+            nbytes = _estimate_nbytes(value)
+            self.total_bytes += nbytes - self._sizes.get(key, 0)
+            self._sizes[key] = nbytes
+            
             if key in self.cache:
                 # Update existing item
                 self.cache[key] = (value, time.time())
@@ -40,25 +54,29 @@ class LRUCache:
             else:
                 # Add new item
                 self.cache[key] = (value, time.time())
+            
+            # Evict oldest while over either limit, always keeping the newest item
+            while len(self.cache) > self.max_items or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self.cache) > 1
+            ):
+                oldest_key = next(iter(self.cache))
+                evicted_value, _ = self.cache.pop(oldest_key)
+                self.total_bytes -= self._sizes.pop(oldest_key, 0)
+                log.debug(f"Evicted cache item: {oldest_key}")
                 
-                # Evict oldest if over limit
-                while len(self.cache) > self.max_items:
-                    oldest_key = next(iter(self.cache))
-                    evicted_value, _ = self.cache.pop(oldest_key)
-                    log.debug(f"Evicted cache item: {oldest_key}")
-                    
-                    # Clean up if it's a file path
-                    if isinstance(evicted_value, (str, Path)) and os.path.exists(evicted_value):
-                        try:
-                            os.unlink(evicted_value)
-                        except Exception as e:
-                            log.warning(f"Failed to cleanup evicted cache file {evicted_value}: {e}")
+                # Clean up if it's a file path
+                if isinstance(evicted_value, (str, Path)) and os.path.exists(evicted_value):
+                    try:
+                        os.unlink(evicted_value)
+                    except Exception as e:
+                        log.warning(f"Failed to cleanup evicted cache file {evicted_value}: {e}")
     
     async def remove(self, key: str) -> bool:
         """Remove item from cache"""
         async with self._lock:
             if key in self.cache:
                 value, _ = self.cache.pop(key)
+                self.total_bytes -= self._sizes.pop(key, 0)
                 
                 # Clean up if it's a file path
                 if isinstance(value, (str, Path)) and os.path.exists(value):
@@ -79,6 +97,8 @@ class LRUCache:
                     except Exception as e:
                         log.warning(f"Failed to cleanup cache file {value}: {e}")
             self.cache.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
     
     def size(self) -> int:
         """Get current cache size"""
@@ -216,7 +236,10 @@ class CacheManager:
     """Centralized cache management for the bot"""
     
     def __init__(self):
-        self.memory_cache = LRUCache(config.max_memory_cache_items)
+        self.memory_cache = LRUCache(
+            config.max_memory_cache_items,
+            config.max_memory_cache_mb * 1024 * 1024
+        )
         self.file_cache = ManagedFileCache(
             Path("data/cache"), 
             config.max_cache_size_mb
@@ -250,7 +273,7 @@ class CacheManager:
                 # Log cache statistics
                 memory_size = self.memory_cache.size()
                 file_size = await self.file_cache.get_cache_size()
-                log.info(f"Cache stats - Memory: {memory_size} items, File: {file_size / 1024 / 1024:.1f}MB")
+                log.info(f"Cache stats - Memory: {memory_size} items ({self.memory_cache.total_bytes / 1024 / 1024:.1f}MB), File: {file_size / 1024 / 1024:.1f}MB")
                 
             except Exception as e:
                 log.error(f"Error in cache cleanup task: {e}")
@@ -48,6 +48,15 @@ class BotConfig:
     def max_memory_cache_items(self) -> int:
         return int(os.getenv("MAX_MEMORY_CACHE_ITEMS", "50"))
     
+    @property
+    def max_memory_cache_mb(self) -> int:
+        return int(os.getenv("MAX_MEMORY_CACHE_MB", "512"))
+    
+    # Map Rendering Configuration
+    @property
+    def map_render_concurrency(self) -> int:
+        return int(os.getenv("MAP_RENDER_CONCURRENCY", "2"))
+    
     # HTTP Configuration
     @property
     def http_timeout(self) -> int:
@@ -145,6 +154,7 @@ class BotConfig:
         log.info(f"  Log Level: {self.log_level}")
         log.info(f"  Pin Cooldown: {self.pin_cooldown_minutes} minutes")
         log.info(f"  Max Cache Size: {self.max_cache_size_mb} MB")
+        log.info(f"  Max Memory Cache Size: {self.max_memory_cache_mb} MB")
         log.info(f"  HTTP Timeout: {self.http_timeout} seconds")
         log.info(f"  Webhook Logging: {'Enabled' if self.log_webhook_url else 'Disabled'}")
         log.info(f"  E-Sports Monitoring: {'Enabled' if self.esports_enabled else 'Disabled'}")
@@ -1,45 +1,151 @@
 """Map generation utilities for the Discord Map Bot."""
 
+import os
 import math
+import json
+import time
 import asyncio
+import threading
+import contextlib
+import numpy as np
+from collections import namedtuple
+from functools import lru_cache, partial
 from pathlib import Path
+from concurrent.futures import Executor
 from typing import Optional, Dict, Tuple, List, Callable, Union
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, ImagePath
 import geopandas as gpd
 from shapely.geometry import box
-import aiohttp
+from shapely import wkb
 
 from core.map_config import MapConfig
+from core.http_client import http_client
+
+try:
+    # Optional: GDAL scanline rasterizer for polygon layers, PIL drawing is used without it
+    from rasterio import features as rio_features
+    from affine import Affine
+except ImportError:
+    rio_features = None
+
+
+def encode_progress_frame(image: Image.Image) -> BytesIO:
+    """Encode a short-lived progress frame as a small 64-color PNG at a fast zlib level."""
+    img_buffer = BytesIO()
+    image.quantize(colors=64, method=Image.Quantize.FASTOCTREE).save(img_buffer, format='PNG', compress_level=1)
+    img_buffer.seek(0)
+    return img_buffer
+
+
+# All validated colors and pin settings for one guild's map settings
+ColorPack = namedtuple('ColorPack', 'land water country state river pin_color pin_size')
+
+
+def _freeze(value):
+    """Turn nested settings values into a hashable cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class Projection:
+    """Linear lat/lng to pixel projection for a bounding box.
+    
+    Calling it projects a single point; project_coords projects a whole
+    shapely coordinate sequence into one float32 buffer.
+    """
+    
+    def __init__(self, minx: float, miny: float, maxx: float, maxy: float, width: int, height: int):
+        # Affine coefficients computed once: x = lon * sx + ox, y = lat * sy + oy
+        self.sx = width / (maxx - minx)
+        self.ox = -minx * self.sx
+        self.sy = -height / (maxy - miny)
+        self.oy = -maxy * self.sy
+    
+    def __call__(self, lat, lon):
+        # PIL accepts float coordinates and rounds them in C
+        return (lon * self.sx + self.ox, lat * self.sy + self.oy)
+    
+    def project_coords(self, coords) -> np.ndarray:
+        """Project (lon, lat) coordinates into an (N, 2) float32 pixel array."""
+        arr = np.asarray(coords, dtype=np.float64)[:, :2]
+        xy = np.empty((len(arr), 2), dtype=np.float32)
+        xy[:, 0] = arr[:, 0] * self.sx + self.ox
+        xy[:, 1] = arr[:, 1] * self.sy + self.oy
+        return xy
+    
+    def project_points(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Project arrays of latitudes and longitudes into (xs, ys) pixel arrays."""
+        xs = np.asarray(lngs, dtype=np.float64) * self.sx + self.ox
+        ys = np.asarray(lats, dtype=np.float64) * self.sy + self.oy
+        return xs, ys
 
 
 class ShapefileRenderer:
     """Helper class for rendering shapefiles."""
     
+    SHAPEFILE_NAMES = {
+        'land': 'ne_10m_land.shp',
+        'lakes': 'ne_10m_lakes.shp', 
+        'rivers': 'ne_10m_rivers_lake_centerlines.shp',
+        'world': 'ne_10m_admin_0_countries.shp',
+        'states': 'ne_10m_admin_1_states_provinces.shp'
+    }
+    
     def __init__(self, logger):
         self.log = logger
     
-    def load_shapefiles(self, base_path: Path, required_files: List[str] = None) -> Dict:
-        """Load required shapefiles."""
+    # Margin (degrees) added to bbox reads so borders just outside the view still get drawn
+    BBOX_READ_MARGIN = 2.0
+    
+    def _flatgeobuf_path(self, filepath: Path) -> Optional[Path]:
+        """Get an up-to-date FlatGeobuf copy of a shapefile, converting it on first use."""
+        fgb_path = filepath.with_suffix('.fgb')
+        try:
+            if fgb_path.exists() and fgb_path.stat().st_mtime >= filepath.stat().st_mtime:
+                return fgb_path
+            
+            # Convert under a name unique to this thread, so a crash or a concurrent conversion
+            # never leaves a truncated copy at the path that is reused
+            tmp_path = fgb_path.with_name(f"{fgb_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.fgb")
+            try:
+                gpd.read_file(filepath).to_file(tmp_path, driver="FlatGeobuf")
+                os.replace(tmp_path, fgb_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            self.log.info(f"Converted {filepath.name} to {fgb_path.name}")
+            return fgb_path
+        except Exception as e:
+            self.log.warning(f"Could not use FlatGeobuf copy of {filepath.name}: {e}")
+            return None
+    
+    def load_shapefiles(self, base_path: Path, required_files: List[str] = None,
+                        bounds: Tuple[float, float, float, float] = None) -> Dict:
+        """Load required shapefiles, optionally only the features inside bounds."""
         if required_files is None:
             required_files = ['land', 'lakes', 'rivers', 'world', 'states']
         
+        read_bbox = None
+        if bounds is not None:
+            minx, miny, maxx, maxy = bounds
+            margin = self.BBOX_READ_MARGIN
+            read_bbox = (minx - margin, miny - margin, maxx + margin, maxy + margin)
+        
         shapefiles = {}
-        file_mapping = {
-            'land': 'ne_10m_land.shp',
-            'lakes': 'ne_10m_lakes.shp', 
-            'rivers': 'ne_10m_rivers_lake_centerlines.shp',
-            'world': 'ne_10m_admin_0_countries.shp',
-            'states': 'ne_10m_admin_1_states_provinces.shp'
-        }
+        file_mapping = self.SHAPEFILE_NAMES
         
         for key in required_files:
             if key in file_mapping:
                 filepath = base_path / file_mapping[key]
                 try:
                     if filepath.exists():
-                        shapefiles[key] = gpd.read_file(filepath)
-                        self.log.debug(f"Loaded {key}: {len(shapefiles[key])} features")
+                        # FlatGeobuf has a packed spatial index, so bbox reads skip features in the reader
+                        source = self._flatgeobuf_path(filepath) or filepath
+                        shapefiles[key] = gpd.read_file(source, bbox=read_bbox)
+                        self.log.debug(f"Loaded {key} from {source.name}: {len(shapefiles[key])} features")
                     else:
                         self.log.warning(f"Shapefile not found: {filepath}")
                         shapefiles[key] = None
@@ -49,6 +155,50 @@ class ShapefileRenderer:
         
         return shapefiles
     
+    def candidate_geometries(self, geometries, query_geom):
+        """Narrow geometries down to those whose envelope hits query_geom, using the spatial index if present."""
+        try:
+            idx = np.sort(geometries.sindex.query(query_geom))
+            return geometries.iloc[idx]
+        except Exception:
+            return geometries
+    
+    def rasterize_polygons(self, geometries, bbox, width: int, height: int) -> Optional[np.ndarray]:
+        """Rasterize polygon geometries into a uint8 mask (255 = inside), or None if rasterio is unavailable."""
+        if rio_features is None or geometries is None:
+            return None
+        
+        minx, miny, maxx, maxy = bbox.bounds
+        transform = Affine((maxx - minx) / width, 0, minx, 0, -(maxy - miny) / height, maxy)
+        shapes = [(poly, 255) for poly in self.candidate_geometries(geometries, bbox)
+                  if poly is not None and poly.intersects(bbox)]
+        if not shapes:
+            return np.zeros((height, width), dtype=np.uint8)
+        
+        return rio_features.rasterize(shapes, out_shape=(height, width), transform=transform,
+                                      fill=0, dtype='uint8')
+    
+    def composite_polygons(self, canvas: np.ndarray, geometries, bbox, fill_color: tuple) -> bool:
+        """Rasterize a polygon layer into an (H, W, 3) canvas; returns False if the PIL path must be used."""
+        try:
+            height, width = canvas.shape[:2]
+            mask = self.rasterize_polygons(geometries, bbox, width, height)
+        except Exception as e:
+            self.log.debug(f"Rasterizing polygons failed, falling back to PIL: {e}")
+            return False
+        if mask is None:
+            return False
+        canvas[mask.astype(bool)] = fill_color
+        self.log.debug("Rasterized polygon layer")
+        return True
+    
+    def _project_path(self, coords, projection_func: Callable):
+        """Project a coordinate sequence into something PIL can draw."""
+        if hasattr(projection_func, 'project_coords'):
+            # PIL reads the contiguous float32 buffer directly, no per-vertex tuples
+            return ImagePath.Path(projection_func.project_coords(coords))
+        return [projection_func(y, x) for x, y in coords]
+    
     def draw_polygons(self, draw: ImageDraw.Draw, geometries, projection_func: Callable, 
                      bbox, fill_color: tuple, outline_color: tuple = None, width: int = 0):
         """Draw polygon geometries."""
@@ -56,13 +206,13 @@ class ShapefileRenderer:
             return
             
         drawn_count = 0
-        for poly in geometries:
+        for poly in self.candidate_geometries(geometries, bbox):
             if poly is None or not poly.intersects(bbox):
                 continue
             for ring in getattr(poly, "geoms", [poly]):
                 try:
                     if hasattr(ring, 'exterior'):
-                        pts = [projection_func(y, x) for x, y in ring.exterior.coords]
+                        pts = self._project_path(ring.exterior.coords, projection_func)
                         if len(pts) >= 3:
                             draw.polygon(pts, fill=fill_color, outline=outline_color, width=width)
                             drawn_count += 1
@@ -72,6 +222,31 @@ class ShapefileRenderer:
         
         self.log.debug(f"Drew {drawn_count} polygons")
     
+    def _collect_line_paths(self, line, projection_func: Callable, feature_name: str) -> list:
+        """Project a line or polygon-boundary geometry into pixel paths."""
+        paths = []
+        if feature_name in ["countries", "states"]:
+            if hasattr(line, 'exterior'):
+                paths.append(self._project_path(line.exterior.coords, projection_func))
+            elif hasattr(line, 'geoms'):
+                for poly in line.geoms:
+                    if hasattr(poly, 'exterior'):
+                        paths.append(self._project_path(poly.exterior.coords, projection_func))
+            elif hasattr(line, 'coords'):
+                paths.append(self._project_path(line.coords, projection_func))
+            return [pts for pts in paths if len(pts) >= 2]
+        
+        for seg in getattr(line, "geoms", [line]):
+            try:
+                if hasattr(seg, 'coords'):
+                    paths.append(self._project_path(seg.coords, projection_func))
+                elif hasattr(seg, 'exterior'):
+                    paths.append(self._project_path(seg.exterior.coords, projection_func))
+            except Exception as e:
+                self.log.debug(f"Error projecting {feature_name} segment: {e}")
+                continue
+        return [pts for pts in paths if len(pts) >= 2]
+    
     def draw_lines(self, draw: ImageDraw.Draw, geometries, projection_func: Callable,
                   bbox, color: tuple, width: int, feature_name: str = ""):
         """Draw line geometries."""
@@ -82,17 +257,16 @@ class ShapefileRenderer:
         intersect_count = 0
         total_count = len(geometries)
         
-        for line in geometries:
+        # Buffer the bbox once per layer, not once per feature
+        buffer_size = 2.0 if feature_name in ["countries", "states"] else 0.1
+        query_bbox = bbox.buffer(buffer_size)
+        
+        for line in self.candidate_geometries(geometries, query_bbox):
             if line is None:
                 continue
                 
             try:
-                if feature_name in ["countries", "states"]:
-                    buffer_size = 2.0
-                else:
-                    buffer_size = 0.1
-                
-                intersects = line.intersects(bbox.buffer(buffer_size))
+                intersects = line.intersects(query_bbox)
                 if not intersects:
                     continue
                 else:
@@ -104,45 +278,13 @@ class ShapefileRenderer:
                     intersect_count += 1
                 else:
                     continue
-                
-            if feature_name in ["countries", "states"]:
-                try:
-                    if hasattr(line, 'exterior'):
-                        pts = [projection_func(y, x) for x, y in line.exterior.coords]
-                        if len(pts) >= 2:
-                            draw.line(pts, fill=color, width=width)
-                            drawn_count += 1
-                    elif hasattr(line, 'geoms'):
-                        for poly in line.geoms:
-                            if hasattr(poly, 'exterior'):
-                                pts = [projection_func(y, x) for x, y in poly.exterior.coords]
-                                if len(pts) >= 2:
-                                    draw.line(pts, fill=color, width=width)
-                                    drawn_count += 1
-                    elif hasattr(line, 'coords'):
-                        pts = [projection_func(y, x) for x, y in line.coords]
-                        if len(pts) >= 2:
-                            draw.line(pts, fill=color, width=width)
-                            drawn_count += 1
-                except Exception as e:
-                    self.log.debug(f"Error drawing {feature_name}: {e}")
-                continue
             
-            for seg in getattr(line, "geoms", [line]):
-                try:
-                    if hasattr(seg, 'coords'):
-                        pts = [projection_func(y, x) for x, y in seg.coords]
-                        if len(pts) >= 2:
-                            draw.line(pts, fill=color, width=width)
-                            drawn_count += 1
-                    elif hasattr(seg, 'exterior'):
-                        pts = [projection_func(y, x) for x, y in seg.exterior.coords]
-                        if len(pts) >= 2:
-                            draw.line(pts, fill=color, width=width)
-                            drawn_count += 1
-                except Exception as e:
-                    self.log.debug(f"Error drawing {feature_name} segment: {e}")
-                    continue
+            try:
+                for pts in self._collect_line_paths(line, projection_func, feature_name):
+                    draw.line(pts, fill=color, width=width)
+                    drawn_count += 1
+            except Exception as e:
+                self.log.debug(f"Error drawing {feature_name}: {e}")
         
         self.log.info(f"Drew {drawn_count} {feature_name} from {total_count} total")
 
@@ -150,14 +292,96 @@ class ShapefileRenderer:
 class MapGenerator:
     """Handles map generation and rendering."""
     
-    def __init__(self, data_dir: Path, cache_dir: Path, logger):
+    # Regions rendered to the (buffered) outline of a single country instead of config bounds
+    REGION_OUTLINE_COUNTRIES = {"germany": "Germany"}
+    
+    # Seconds a render thread waits for a progress update to be handled on the event loop
+    PROGRESS_REPORT_TIMEOUT = 30
+    
+    # Persistent geocoding cache limits
+    GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 3600
+    GEOCODE_CACHE_MAX_ENTRIES = 2000
+    GEOCODE_CACHE_SAVE_DELAY = 5.0
+    
+    def __init__(self, data_dir: Path, cache_dir: Path, logger, render_executor: Optional[Executor] = None):
         self.data_dir = data_dir
         self.cache_dir = cache_dir
         self.log = logger
+        # Runs the synchronous part of base map renders, the loop's default executor without one
+        self.render_executor = render_executor
         self.map_config = MapConfig()
         self.renderer = ShapefileRenderer(logger)
         self.base_image_width = 1500
         self.map_configs = self.map_config.MAP_REGIONS
+        # Buffered region outlines, persisted as WKB so the countries shapefile is read only once
+        self._region_geom_cache: Dict[str, object] = {}
+        # Geocoding results keyed by normalized query, loaded lazily from disk
+        self._geocode_cache_file = self.cache_dir / "geocode_cache.json"
+        self._geocode_cache: Optional[Dict[str, Dict]] = None
+        self._geocode_load_lock = asyncio.Lock()
+        # Saves are debounced through one writer task, the event makes it write immediately
+        self._geocode_save_task: Optional[asyncio.Task] = None
+        self._geocode_flush = asyncio.Event()
+        self._geocode_dirty = False
+        # Parsed colors keyed by the settings content, so changed settings simply miss the cache
+        self._color_pack = lru_cache(maxsize=512)(self._build_color_pack)
+
+    def get_region_geometry(self, region: str):
+        """Get the buffered country outline for a region, computing it at most once.
+        May read the countries shapefile, so call it from the render executor."""
+        if region in self._region_geom_cache:
+            return self._region_geom_cache[region]
+        
+        country_name = self.REGION_OUTLINE_COUNTRIES.get(region)
+        if country_name is None:
+            return None
+        
+        geom = None
+        wkb_file = self.cache_dir / f"{region}_bounds.wkb"
+        try:
+            if wkb_file.exists():
+                geom = wkb.loads(wkb_file.read_bytes())
+                self.log.debug(f"Loaded {region} geometry from {wkb_file.name}")
+        except Exception as e:
+            self.log.warning(f"Could not read cached {region} geometry: {e}")
+        
+        if geom is None:
+            try:
+                base_path = self.data_dir.parent / "data"
+                world = gpd.read_file(base_path / "ne_10m_admin_0_countries.shp")
+                country = world[world["ADMIN"] == country_name].geometry.unary_union
+                if country is not None:
+                    geom = country.buffer(0.1)
+                    self.cache_dir.mkdir(parents=True, exist_ok=True)
+                    # Written under a name unique to this thread, then swapped in, so a crash or a
+                    # concurrent computation never leaves a truncated file that is loaded next start
+                    tmp_file = wkb_file.with_name(f"{wkb_file.stem}.{os.getpid()}.{threading.get_ident()}.tmp.wkb")
+                    try:
+                        tmp_file.write_bytes(wkb.dumps(geom))
+                        os.replace(tmp_file, wkb_file)
+                    finally:
+                        tmp_file.unlink(missing_ok=True)
+                    self.log.info(f"Cached {region} geometry in {wkb_file.name}")
+            except Exception as e:
+                self.log.warning(f"Could not compute {region} geometry: {e}")
+        
+        if geom is not None:
+            self._region_geom_cache[region] = geom
+        return geom
+
+    def get_region_render_bounds(self, region: str) -> Tuple[float, float, float, float]:
+        """Get (minx, miny, maxx, maxy) used to render a predefined region."""
+        data_path = self.data_dir.parent / "data"
+        (lat0, lon0), (lat1, lon1) = self.map_config.get_region_bounds(region, data_path)
+        minx, miny, maxx, maxy = lon0, lat0, lon1, lat1
+        
+        geom = self.get_region_geometry(region)
+        if geom is not None:
+            bounds = geom.bounds
+            if all(math.isfinite(v) for v in bounds) and bounds[2] > bounds[0] and bounds[3] > bounds[1]:
+                minx, miny, maxx, maxy = bounds
+        
+        return minx, miny, maxx, maxy
 
     def _ensure_color_tuple(self, color_value, default_tuple: tuple) -> tuple:
         """Ensure color value is a valid RGB tuple."""
@@ -194,56 +418,53 @@ class MapGenerator:
         
         return default_string
     
-    def get_map_colors(self, guild_id: str, maps: Dict) -> Tuple[tuple, tuple]:
-        """Get custom colors for land and water."""
-        map_data = maps.get(guild_id, {})
-        settings = map_data.get('settings', {})
-        colors = settings.get('colors', {})
-    
-        land_color_raw = colors.get('land', self.map_config.DEFAULT_LAND_COLOR)
-        water_color_raw = colors.get('water', self.map_config.DEFAULT_WATER_COLOR)
+    def _build_color_pack(self, settings_key: Optional[tuple]) -> ColorPack:
+        """Validate all colors and pin settings for a frozen (colors, borders, pins) key."""
+        cfg = self.map_config
+        colors, borders, pins = (dict(part) for part in settings_key or ((), (), ()))
         
-        land_color = self._ensure_color_tuple(land_color_raw, self.map_config.DEFAULT_LAND_COLOR)
-        water_color = self._ensure_color_tuple(water_color_raw, self.map_config.DEFAULT_WATER_COLOR)
+        land_color = self._ensure_color_tuple(colors.get('land', cfg.DEFAULT_LAND_COLOR), cfg.DEFAULT_LAND_COLOR)
+        water_color = self._ensure_color_tuple(colors.get('water', cfg.DEFAULT_WATER_COLOR), cfg.DEFAULT_WATER_COLOR)
+        border_color = self._ensure_color_tuple(borders.get('country', cfg.DEFAULT_COUNTRY_BORDER_COLOR), cfg.DEFAULT_COUNTRY_BORDER_COLOR)
+        
+        # Guild maps draw rivers in the water color, renders without guild settings use the default river color
+        river_color = water_color if settings_key is not None else cfg.DEFAULT_RIVER_COLOR
+        
+        pin_color = self._ensure_color_string(pins.get('color', cfg.DEFAULT_PIN_COLOR), cfg.DEFAULT_PIN_COLOR)
+        try:
+            pin_size = int(pins.get('size', cfg.DEFAULT_PIN_SIZE))
+            pin_size = max(8, min(32, pin_size))
+        except (ValueError, TypeError):
+            pin_size = cfg.DEFAULT_PIN_SIZE
         
-        return land_color, water_color
+        return ColorPack(land_color, water_color, border_color, border_color, river_color, pin_color, pin_size)
+
+    def _guild_color_pack(self, guild_id: str, maps: Dict) -> ColorPack:
+        """Get the color pack for a guild's stored settings."""
+        settings = (maps or {}).get(guild_id, {}).get('settings', {})
+        settings_key = tuple(_freeze(settings.get(part, {})) for part in ('colors', 'borders', 'pins'))
+        return self._color_pack(settings_key)
+
+    def get_color_pack(self, guild_id: str = None, maps: Dict = None) -> ColorPack:
+        """Get validated colors and pin settings for a guild, or the defaults without one."""
+        if not guild_id or not maps:
+            return self._color_pack(None)
+        return self._guild_color_pack(guild_id, maps)
+
+    def get_map_colors(self, guild_id: str, maps: Dict) -> Tuple[tuple, tuple]:
+        """Get custom colors for land and water."""
+        pack = self._guild_color_pack(guild_id, maps)
+        return pack.land, pack.water
 
     def get_border_colors(self, guild_id: str, maps: Dict) -> Tuple[tuple, tuple, tuple]:
         """Get custom colors for borders."""
-        map_data = maps.get(guild_id, {})
-        settings = map_data.get('settings', {})
-        borders = settings.get('borders', {})
-        
-        border_color_raw = borders.get('country', self.map_config.DEFAULT_COUNTRY_BORDER_COLOR)
-        border_color = self._ensure_color_tuple(border_color_raw, self.map_config.DEFAULT_COUNTRY_BORDER_COLOR)
-        
-        country_color = border_color
-        state_color = border_color
-        
-        colors = settings.get('colors', {})
-        water_color_raw = colors.get('water', self.map_config.DEFAULT_WATER_COLOR)
-        river_color = self._ensure_color_tuple(water_color_raw, self.map_config.DEFAULT_WATER_COLOR)
-        
-        return country_color, state_color, river_color
+        pack = self._guild_color_pack(guild_id, maps)
+        return pack.country, pack.state, pack.river
 
     def get_pin_settings(self, guild_id: str, maps: Dict) -> Tuple[str, int]:
         """Get custom pin color and size."""
-        map_data = maps.get(guild_id, {})
-        settings = map_data.get('settings', {})
-        pins = settings.get('pins', {})
-        
-        pin_color_raw = pins.get('color', self.map_config.DEFAULT_PIN_COLOR)
-        pin_size_raw = pins.get('size', self.map_config.DEFAULT_PIN_SIZE)
-        
-        pin_color = self._ensure_color_string(pin_color_raw, self.map_config.DEFAULT_PIN_COLOR)
-        
-        try:
-            pin_size = int(pin_size_raw)
-            pin_size = max(8, min(32, pin_size))
-        except (ValueError, TypeError):
-            pin_size = self.map_config.DEFAULT_PIN_SIZE
-    
-        return pin_color, pin_size
+        pack = self._guild_color_pack(guild_id, maps)
+        return pack.pin_color, pack.pin_size
 
     def calculate_image_dimensions(self, region: str) -> Tuple[int, int]:
         """Calculate image dimensions based on region bounds."""
@@ -267,11 +488,7 @@ class MapGenerator:
     def create_projection_function(self, minx: float, miny: float, maxx: float, maxy: float, 
                                  width: int, height: int) -> Callable:
         """Create projection function for converting lat/lng to pixel coordinates."""
-        def to_px(lat, lon):
-            x = (lon - minx) / (maxx - minx) * width
-            y = (maxy - lat) / (maxy - miny) * height
-            return (int(x), int(y))
-        return to_px
+        return Projection(minx, miny, maxx, maxy, width, height)
 
     def get_line_widths_for_zoom(self, width: int, map_type: str, zoom_level: str = "normal", 
                                 region: str = None, custom_bounds: Tuple[float, float, float, float] = None) -> Tuple[int, int, int]:
@@ -306,10 +523,12 @@ class MapGenerator:
     async def render_base_map(self, minx: float, miny: float, maxx: float, maxy: float,
                             width: int, height: int, map_type: str = "default",
                             guild_id: str = None, maps: Dict = None, zoom_level: str = "normal", 
-                            region: str = None, progress_callback=None) -> Tuple[Image.Image, Callable]:
+                            region: str = None, progress_callback=None,
+                            require_complete: bool = False) -> Tuple[Optional[Image.Image], Callable]:
         """Render base map with land, water, rivers, and borders.
         
-        Updated to use geographic scale-aware line width calculation.
+        The shapefile and PIL work runs on the render executor. With require_complete, a render
+        missing layers because a shapefile failed to load returns None instead of the image.
         """
         self.log.info(f"Rendering base map: {map_type} ({width}x{height}) with geographic scaling")
         
@@ -317,144 +536,159 @@ class MapGenerator:
         if progress_callback:
             await progress_callback("Initializing map rendering...", 5)
         
+        loop = asyncio.get_running_loop()
+        
+        def _report(message, percentage, image_buffer=None):
+            # Called from the worker thread, waiting keeps progress updates in order
+            future = asyncio.run_coroutine_threadsafe(progress_callback(message, percentage, image_buffer), loop)
+            try:
+                future.result(timeout=self.PROGRESS_REPORT_TIMEOUT)
+            except Exception as e:
+                self.log.debug(f"Progress update failed: {e}")
+        
+        report = _report if progress_callback else None
+        
         try:
-            if guild_id and maps:
-                land_color, water_color = self.get_map_colors(guild_id, maps)
-                country_color, state_color, river_color = self.get_border_colors(guild_id, maps)
-            else:
-                land_color = self.map_config.DEFAULT_LAND_COLOR
-                water_color = self.map_config.DEFAULT_WATER_COLOR
-                country_color = self.map_config.DEFAULT_COUNTRY_BORDER_COLOR
-                state_color = self.map_config.DEFAULT_COUNTRY_BORDER_COLOR
-                river_color = self.map_config.DEFAULT_RIVER_COLOR
-            
-            land_color = self._ensure_color_tuple(land_color, self.map_config.DEFAULT_LAND_COLOR)
-            water_color = self._ensure_color_tuple(water_color, self.map_config.DEFAULT_WATER_COLOR)
-            country_color = self._ensure_color_tuple(country_color, self.map_config.DEFAULT_COUNTRY_BORDER_COLOR)
-            state_color = self._ensure_color_tuple(state_color, self.map_config.DEFAULT_COUNTRY_BORDER_COLOR)
-            river_color = self._ensure_color_tuple(river_color, self.map_config.DEFAULT_RIVER_COLOR)
-            
-            required_files = ['land', 'lakes', 'rivers', 'world', 'states']
-            
-            if progress_callback:
-                await progress_callback("Loading geographic data...", 15)
-            
-            base_path = self.data_dir.parent / "data"
-            shapefiles = self.renderer.load_shapefiles(base_path, required_files)
-            
-            bbox = box(minx, miny, maxx, maxy)
+            # Colors are resolved here, so the worker thread never reads the shared maps dict
+            colors = self.get_color_pack(guild_id, maps)
             projection_func = self.create_projection_function(minx, miny, maxx, maxy, width, height)
             
-            if progress_callback:
-                await progress_callback("Creating base canvas...", 25)
+            img, complete = await loop.run_in_executor(self.render_executor, partial(
+                self._render_base_map_sync, minx, miny, maxx, maxy, width, height,
+                map_type, zoom_level, region, colors, projection_func, report
+            ))
             
+        except Exception as e:
+            self.log.error(f"Failed to render base map: {e}")
+            fallback_water = colors.water if 'colors' in locals() else self.map_config.DEFAULT_WATER_COLOR
+            img = Image.new("RGB", (width, height), fallback_water)
+            projection_func = self.create_projection_function(minx, miny, maxx, maxy, width, height)
+            complete = False
+        
+        if require_complete and not complete:
+            return None, projection_func
+        
+        if progress_callback:
+            await progress_callback("Finalizing map rendering...", 100)
+        
+        return img, projection_func
+
+    def _render_base_map_sync(self, minx: float, miny: float, maxx: float, maxy: float,
+                              width: int, height: int, map_type: str, zoom_level: str, region: Optional[str],
+                              colors: ColorPack, projection_func: Callable, report=None) -> Tuple[Image.Image, bool]:
+        """Draw all base map layers; returns the image and whether every shapefile was available."""
+        land_color, water_color = colors.land, colors.water
+        country_color, state_color, river_color = colors.country, colors.state, colors.river
+        
+        required_files = ['land', 'lakes', 'rivers', 'world', 'states']
+        
+        if report:
+            report("Loading geographic data...", 15)
+        
+        base_path = self.data_dir.parent / "data"
+        shapefiles = self.renderer.load_shapefiles(base_path, required_files, (minx, miny, maxx, maxy))
+        
+        bbox = box(minx, miny, maxx, maxy)
+        
+        if report:
+            report("Creating base canvas...", 25)
+        
+        # Polygon layers are composited in one NumPy canvas when rasterio is available;
+        # the PIL image is built from it afterwards and line layers are drawn on top.
+        use_canvas = rio_features is not None
+        if use_canvas:
+            canvas = np.empty((height, width, 3), dtype=np.uint8)
+            canvas[:] = water_color
+            img = Image.fromarray(canvas, 'RGB')
+        else:
             img = Image.new("RGB", (width, height), water_color)
-            draw = ImageDraw.Draw(img)
-            
-            if shapefiles['land'] is not None:
-                if progress_callback:
-                    await progress_callback("Drawing land masses...", 40)
+        draw = ImageDraw.Draw(img)
+        
+        if shapefiles['land'] is not None:
+            if report:
+                report("Drawing land masses...", 40)
+            if use_canvas:
+                use_canvas = self.renderer.composite_polygons(canvas, shapefiles['land'].geometry, bbox, land_color)
+                img = Image.fromarray(canvas, 'RGB')
+                draw = ImageDraw.Draw(img)
+            if not use_canvas:
                 self.renderer.draw_polygons(draw, shapefiles['land'].geometry, projection_func, bbox, land_color)
-                
-                # Send intermediate image after land drawing
-                if progress_callback:
-                    try:
-                        intermediate_img = img.copy()
-                        img_buffer = BytesIO()
-                        intermediate_img.save(img_buffer, format='PNG', optimize=True)
-                        await progress_callback("Land masses drawn, adding water bodies...", 45, img_buffer)
-                    except Exception as e:
-                        await progress_callback("Land masses drawn, adding water bodies...", 45)
             
-            if shapefiles['lakes'] is not None:
-                if progress_callback:
-                    await progress_callback("Drawing lakes and water bodies...", 55)
+            # Send intermediate image after land drawing. Snapshots are encoded synchronously
+            # before anything else is drawn, so the image is saved without copying it first.
+            if report:
+                try:
+                    img_buffer = encode_progress_frame(img)
+                    report("Land masses drawn, adding water bodies...", 45, img_buffer)
+                except Exception as e:
+                    report("Land masses drawn, adding water bodies...", 45)
+        
+        if shapefiles['lakes'] is not None:
+            if report:
+                report("Drawing lakes and water bodies...", 55)
+            if use_canvas:
+                use_canvas = self.renderer.composite_polygons(canvas, shapefiles['lakes'].geometry, bbox, water_color)
+                img = Image.fromarray(canvas, 'RGB')
+                draw = ImageDraw.Draw(img)
+            if not use_canvas:
                 self.renderer.draw_polygons(draw, shapefiles['lakes'].geometry, projection_func, bbox, water_color)
-                
-                # Send intermediate image after lakes drawing
-                if progress_callback:
-                    try:
-                        intermediate_img = img.copy()
-                        img_buffer = BytesIO()
-                        intermediate_img.save(img_buffer, format='PNG', optimize=True)
-                        await progress_callback("Water bodies drawn, adding borders...", 60, img_buffer)
-                    except Exception as e:
-                        await progress_callback("Water bodies drawn, adding borders...", 60)
-            
-            # Calculate line widths with geographic scaling
-            custom_bounds = (minx, miny, maxx, maxy) if not region else None
-            river_width, country_width, state_width = self.get_line_widths_for_zoom(
-                width, map_type, zoom_level, region, custom_bounds
-            )
             
-            # Debug logging for line width calculation
-            if region:
-                geo_scale = self.map_config.calculate_geographic_scale_factor(region)
-                self.log.info(f"Geographic scaling for {region}: factor={geo_scale:.3f}, country_width={country_width}, river_width={river_width}")
-            else:
-                self.log.info(f"No region specified, using custom bounds for line width calculation")
-            
-            if map_type != "world" and shapefiles.get('rivers') is not None:
-                if progress_callback:
-                    await progress_callback("Drawing rivers and waterways...", 70)
-                self.renderer.draw_lines(draw, shapefiles['rivers'].geometry, projection_func, bbox, river_color, river_width, "rivers")
-            
-            # Draw state/province borders only for detailed maps (not continents or world)
-            continent_map_types = ["world", "europe", "asia", "africa", "northamerica", "southamerica", "australia"]
-            if map_type not in continent_map_types and shapefiles.get('states') is not None:
-                if progress_callback:
-                    await progress_callback("Drawing state/province borders...", 85)
-                self.renderer.draw_lines(draw, shapefiles['states'].geometry, projection_func, bbox, state_color, state_width, "states")
-            
-            # Draw country borders (admin_0 = international boundaries)
-            if shapefiles.get('world') is not None:
-                if progress_callback:
-                    await progress_callback("Drawing country borders...", 95)
-                self.renderer.draw_lines(draw, shapefiles['world'].geometry, projection_func, bbox, country_color, country_width, "countries")
-                
-                # Send final base map image before completion
-                if progress_callback:
-                    try:
-                        intermediate_img = img.copy()
-                        img_buffer = BytesIO()
-                        intermediate_img.save(img_buffer, format='PNG', optimize=True)
-                        await progress_callback("Base map complete, finalizing...", 98, img_buffer)
-                    except Exception as e:
-                        await progress_callback("Base map complete, finalizing...", 98)
-            
-            if progress_callback:
-                await progress_callback("Finalizing map rendering...", 100)
-            
-            return img, projection_func
-            
-        except Exception as e:
-            self.log.error(f"Failed to render base map: {e}")
-            fallback_water = water_color if 'water_color' in locals() else self.map_config.DEFAULT_WATER_COLOR
-            img = Image.new("RGB", (width, height), fallback_water)
-            projection_func = self.create_projection_function(minx, miny, maxx, maxy, width, height)
-            return img, projection_func
+            # Send intermediate image after lakes drawing
+            if report:
+                try:
+                    img_buffer = encode_progress_frame(img)
+                    report("Water bodies drawn, adding borders...", 60, img_buffer)
+                except Exception as e:
+                    report("Water bodies drawn, adding borders...", 60)
+        
+        # Calculate line widths with geographic scaling
+        custom_bounds = (minx, miny, maxx, maxy) if not region else None
+        river_width, country_width, state_width = self.get_line_widths_for_zoom(
+            width, map_type, zoom_level, region, custom_bounds
+        )
+        
+        # Debug logging for line width calculation
+        if region:
+            geo_scale = self.map_config.calculate_geographic_scale_factor(region)
+            self.log.info(f"Geographic scaling for {region}: factor={geo_scale:.3f}, country_width={country_width}, river_width={river_width}")
+        else:
+            self.log.info(f"No region specified, using custom bounds for line width calculation")
+        
+        if map_type != "world" and shapefiles.get('rivers') is not None:
+            if report:
+                report("Drawing rivers and waterways...", 70)
+            self.renderer.draw_lines(draw, shapefiles['rivers'].geometry, projection_func, bbox, river_color, river_width, "rivers")
+        
+        # Draw state/province borders only for detailed maps (not continents or world)
+        continent_map_types = ["world", "europe", "asia", "africa", "northamerica", "southamerica", "australia"]
+        if map_type not in continent_map_types and shapefiles.get('states') is not None:
+            if report:
+                report("Drawing state/province borders...", 85)
+            self.renderer.draw_lines(draw, shapefiles['states'].geometry, projection_func, bbox, state_color, state_width, "states")
+        
+        # Draw country borders (admin_0 = international boundaries)
+        if shapefiles.get('world') is not None:
+            if report:
+                report("Drawing country borders...", 95)
+            self.renderer.draw_lines(draw, shapefiles['world'].geometry, projection_func, bbox, country_color, country_width, "countries")
+            
+            # Send final base map image before completion
+            if report:
+                try:
+                    img_buffer = encode_progress_frame(img)
+                    report("Base map complete, finalizing...", 98, img_buffer)
+                except Exception as e:
+                    report("Base map complete, finalizing...", 98)
+        
+        complete = all(shapefiles.get(key) is not None for key in required_files)
+        return img, complete
 
     async def render_geopandas_map(self, region: str, width: int, height: int, guild_id: str = None, maps: Dict = None, progress_callback=None) -> Tuple[Image.Image, Callable]:
         """Render map for predefined regions with geographic scaling."""
         try:
-            # Use the new method that checks shapefile bounds first
-            data_path = self.data_dir.parent / "data"
-            bounds = self.map_config.get_region_bounds(region, data_path)
-            (lat0, lon0), (lat1, lon1) = bounds
-            minx, miny, maxx, maxy = lon0, lat0, lon1, lat1
-            
-            if region == "germany":
-                try:
-                    base_path = self.data_dir.parent / "data"
-                    world = gpd.read_file(base_path / "ne_10m_admin_0_countries.shp")
-                    de = world[world["ADMIN"] == "Germany"].geometry.unary_union
-                    if de is not None:
-                        de_buf = de.buffer(0.1)
-                        bounds = de_buf.bounds
-                        if all(math.isfinite(v) for v in bounds) and bounds[2] > bounds[0] and bounds[3] > bounds[1]:
-                            minx, miny, maxx, maxy = bounds
-                except Exception as e:
-                    self.log.warning(f"Could not get Germany bounds: {e}")
+            # The first call for a region may read the countries shapefile
+            loop = asyncio.get_running_loop()
+            minx, miny, maxx, maxy = await loop.run_in_executor(self.render_executor, self.get_region_render_bounds, region)
             
             map_type = "world" if region == "world" else "europe" if region == "europe" else "default"
             
@@ -476,43 +710,44 @@ class MapGenerator:
         if not pins:
             return []
         
-        pin_positions = []
-        for user_id, pin_data in pins.items():
-            lat, lng = pin_data['lat'], pin_data['lng']
-            x, y = projection_func(lat, lng)
-            pin_positions.append({
-                'user_id': user_id,
-                'position': (x, y),
-                'data': pin_data
-            })
+        # Project all pins at once with the projection's cached coefficients
+        pin_items = list(pins.items())
+        lats = np.fromiter((pin_data['lat'] for _, pin_data in pin_items), dtype=np.float64, count=len(pin_items))
+        lngs = np.fromiter((pin_data['lng'] for _, pin_data in pin_items), dtype=np.float64, count=len(pin_items))
+        if hasattr(projection_func, 'project_points'):
+            xs, ys = projection_func.project_points(lats, lngs)
+        else:
+            projected = [projection_func(lat, lng) for lat, lng in zip(lats.tolist(), lngs.tolist())]
+            xs = np.array([p[0] for p in projected], dtype=np.float64)
+            ys = np.array([p[1] for p in projected], dtype=np.float64)
+        
+        pin_positions = [
+            {'user_id': user_id, 'position': (x, y), 'data': pin_data}
+            for (user_id, pin_data), x, y in zip(pin_items, xs.tolist(), ys.tolist())
+        ]
         
         groups = []
-        used_pins = set()
         overlap_threshold = base_pin_size * 2
         
+        # Greedy grouping: each unused pin absorbs every unused pin within the threshold.
+        # Distances to all pins are computed per group leader in one vectorized pass.
+        used = np.zeros(len(pin_positions), dtype=bool)
+        threshold_sq = overlap_threshold * overlap_threshold
+        
         for i, pin in enumerate(pin_positions):
-            if i in used_pins:
+            if used[i]:
                 continue
-                
+            
+            within = (xs - xs[i]) ** 2 + (ys - ys[i]) ** 2 < threshold_sq
+            within[i] = True
+            members = np.flatnonzero(~used & within)
+            used[members] = True
+            
             group = {
                 'position': pin['position'],
-                'count': 1,
-                'pins': [pin]
+                'count': len(members),
+                'pins': [pin_positions[j] for j in members]
             }
-            used_pins.add(i)
-            
-            for j, other_pin in enumerate(pin_positions):
-                if j in used_pins or j == i:
-                    continue
-                
-                dx = pin['position'][0] - other_pin['position'][0]
-                dy = pin['position'][1] - other_pin['position'][1]
-                distance = math.sqrt(dx*dx + dy*dy)
-                
-                if distance < overlap_threshold:
-                    group['pins'].append(other_pin)
-                    group['count'] += 1
-                    used_pins.add(j)
             
             if group['count'] > 1:
                 center_x = sum(p['position'][0] for p in group['pins']) // group['count']
@@ -523,12 +758,15 @@ class MapGenerator:
         
         return groups
 
-    def draw_pins_on_map(self, image: Image.Image, pin_groups: List[Dict], width: int, height: int, base_pin_size: int, guild_id: str = None, maps: Dict = None):
-        """Draw pin groups on the map."""
+    def draw_pins_on_map(self, image: Image.Image, pin_groups: List[Dict], width: int, height: int, base_pin_size: int, guild_id: str = None, maps: Dict = None,
+                         pin_settings: Optional[Tuple[str, int]] = None):
+        """Draw pin groups on the map. pin_settings from get_pin_settings replaces the lookup in maps."""
         draw = ImageDraw.Draw(image)
         
-        if guild_id and maps:
-            pin_color, custom_pin_size = self.get_pin_settings(guild_id, maps)
+        if pin_settings is None and guild_id and maps:
+            pin_settings = self.get_pin_settings(guild_id, maps)
+        if pin_settings is not None:
+            pin_color, custom_pin_size = pin_settings
             base_pin_size = int(height * custom_pin_size / 2400)
         else:
             pin_color = self.map_config.DEFAULT_PIN_COLOR
@@ -570,8 +808,100 @@ class MapGenerator:
                 except:
                     draw.text((x-5, y-5), str(count), fill='white')
 
+    def _read_geocode_cache(self) -> Dict[str, Dict]:
+        """Read the persistent geocoding cache, empty when missing or unreadable."""
+        try:
+            if self._geocode_cache_file.exists():
+                with self._geocode_cache_file.open('r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.log.warning(f"Could not load geocode cache: {e}")
+        return {}
+
+    async def _load_geocode_cache(self) -> Dict[str, Dict]:
+        """Load the persistent geocoding cache on first use, reading the file in a thread."""
+        if self._geocode_cache is None:
+            async with self._geocode_load_lock:
+                if self._geocode_cache is None:
+                    self._geocode_cache = await asyncio.to_thread(self._read_geocode_cache)
+        return self._geocode_cache
+
+    def _schedule_geocode_save(self):
+        """Save the geocoding cache shortly, so a burst of lookups shares one write."""
+        self._geocode_dirty = True
+        if self._geocode_save_task is None or self._geocode_save_task.done():
+            self._geocode_save_task = asyncio.create_task(self._save_geocode_cache_later())
+
+    async def _save_geocode_cache_later(self):
+        """Single writer of the geocoding cache, saves until no new results came in during a write."""
+        try:
+            while self._geocode_dirty:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._geocode_flush.wait(), self.GEOCODE_CACHE_SAVE_DELAY)
+                self._geocode_dirty = False
+                await self._save_geocode_cache()
+        finally:
+            self._geocode_flush.clear()
+
+    async def flush_geocode_cache(self):
+        """Write pending geocoding results now, instead of after the save delay."""
+        task = self._geocode_save_task
+        if task is None or task.done():
+            return
+        self._geocode_flush.set()
+        await task
+
+    async def _save_geocode_cache(self):
+        """Persist the geocoding cache, dropping the least recently used entries over the limit."""
+        cache = await self._load_geocode_cache()
+        while len(cache) > self.GEOCODE_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        try:
+            # Entries are never modified once stored, so a shallow snapshot is safe to write from a thread
+            await asyncio.to_thread(self._write_geocode_cache, dict(cache))
+        except Exception as e:
+            self.log.warning(f"Could not save geocode cache: {e}")
+
+    def _write_geocode_cache(self, cache: Dict[str, Dict]):
+        """Write the geocoding cache to a temporary file and swap it in atomically."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self._geocode_cache_file.with_name(f"{self._geocode_cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_file.open('w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_file, self._geocode_cache_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+    async def _get_cached_geocode(self, key: str) -> Optional[Tuple[float, float, str]]:
+        """Get a non-expired cached geocoding result."""
+        cache = await self._load_geocode_cache()
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.get('timestamp', 0) > self.GEOCODE_CACHE_TTL_SECONDS:
+            del cache[key]
+            return None
+        # Move to end (most recently used)
+        cache[key] = cache.pop(key)
+        return (entry['lat'], entry['lng'], entry['display_name'])
+
+    async def _cache_geocode(self, key: str, result: Tuple[float, float, str]):
+        """Store a geocoding result in the persistent cache."""
+        lat, lng, display_name = result
+        cache = await self._load_geocode_cache()
+        cache.pop(key, None)
+        cache[key] = {'lat': lat, 'lng': lng, 'display_name': display_name, 'timestamp': time.time()}
+        self._schedule_geocode_save()
+
     async def geocode_location(self, location: str) -> Optional[Tuple[float, float, str]]:
         """Geocode a location string to coordinates."""
+        cache_key = " ".join(location.lower().split())
+        cached = await self._get_cached_geocode(cache_key)
+        if cached:
+            self.log.debug(f"Using cached geocoding result for '{location}'")
+            return cached
+        
         try:
             url = "https://nominatim.openstreetmap.org/search"
             params = {
@@ -584,15 +914,17 @@ class MapGenerator:
                 'User-Agent': 'DiscordBot-MapPins/2.0'
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data:
-                            lat = float(data[0]['lat'])
-                            lng = float(data[0]['lon'])
-                            display_name = data[0].get('display_name', location)
-                            return (lat, lng, display_name)
+            # Use shared pooled HTTP session instead of opening a new one per lookup
+            session = await http_client.get_session()
+            async with session.get(url, params=params, headers=headers) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data:
+                        lat = float(data[0]['lat'])
+                        lng = float(data[0]['lon'])
+                        display_name = data[0].get('display_name', location)
+                        await self._cache_geocode(cache_key, (lat, lng, display_name))
+                        return (lat, lng, display_name)
             
             return None
             
@@ -600,17 +932,26 @@ class MapGenerator:
             self.log.error(f"Geocoding failed for '{location}': {e}")
             return None
 
-    def calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calculate distance between two points using Haversine formula."""
+    @staticmethod
+    def haversine_batch(lat1: float, lng1: float, lats: np.ndarray, lngs: np.ndarray,
+                        cos_lats: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calculate distances (km) from one point to many points using the Haversine formula.
+        cos_lats, the cosines of the points' latitudes, may be passed in when the caller has them cached."""
         R = 6371
         
         lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
+        lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+        if cos_lats is None:
+            cos_lats = np.cos(lats_rad)
+        delta_lat = lats_rad - lat1_rad
+        delta_lng = np.radians(np.asarray(lngs, dtype=np.float64) - lng1)
         
-        a = (math.sin(delta_lat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        a = (np.sin(delta_lat / 2) ** 2 +
+             math.cos(lat1_rad) * cos_lats * np.sin(delta_lng / 2) ** 2)
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
         
-        return R * c
\ No newline at end of file
+        return R * c
+
+    def calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        """Calculate distance between two points using Haversine formula."""
+        return float(self.haversine_batch(lat1, lng1, np.array([lat2]), np.array([lng2]))[0])
\ No newline at end of file
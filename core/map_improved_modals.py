@@ -1,14 +1,94 @@
 """Improved modals for Discord Map Bot with loading states."""
 
+import math
 import discord
 from datetime import datetime
 from typing import TYPE_CHECKING
 from io import BytesIO
 
+from .map_progress_handler import create_proximity_progress_callback, finish_progress
+
 if TYPE_CHECKING:
     from cogs.map import MapV2Cog
 
 
+class NearbyUsersPaginator(discord.ui.View):
+    """Pages through the members found by a proximity search."""
+    
+    PAGE_SIZE = 25
+    
+    def __init__(self, nearby_users: list, distance_km: int, filename: str):
+        super().__init__(timeout=300)
+        self.nearby_users = nearby_users
+        self.distance_km = distance_km
+        self.filename = filename
+        self.timestamp = datetime.now()
+        self.page = 0
+        self.page_count = max(1, math.ceil(len(nearby_users) / self.PAGE_SIZE))
+        self._update_buttons()
+    
+    def render_page(self) -> discord.Embed:
+        """Build the embed for the current page."""
+        embed = discord.Embed(
+            title=f"🔍 Nearby Members ({self.distance_km}km radius)",
+            color=0x7289da,
+            timestamp=self.timestamp
+        )
+        
+        start = self.page * self.PAGE_SIZE
+        page_users = self.nearby_users[start:start + self.PAGE_SIZE]
+        if page_users:
+            # USE ORIGINAL INPUT AND USER MENTIONS
+            user_list = []
+            for user_data in page_users:
+                user_id_str = user_data.get('user_id', '')
+                location_input = user_data.get('location', 'Unknown')  # Use original user input
+                distance = user_data.get('distance', 0)
+                
+                # Create user mention instead of username
+                user_mention = f"<@{user_id_str}>" if user_id_str else "Unknown User"
+                user_list.append(f"{user_mention} - {location_input[:100]} ({distance:.1f}km)")
+            
+            # The description holds up to 4096 characters, enough for a full page
+            embed.description = "\n".join(user_list)
+        else:
+            embed.description = "No members found within the specified radius."
+        
+        embed.add_field(
+            name="📊 Summary",
+            value=f"**{len(self.nearby_users)}** members within **{self.distance_km}km**",
+            inline=False
+        )
+        if self.page_count > 1:
+            embed.set_footer(text=f"Page {self.page + 1}/{self.page_count}")
+        
+        # The map stays attached to the message, page turns only swap the embed
+        embed.set_image(url=f"attachment://{self.filename}")
+        return embed
+    
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+    
+    async def _show_page(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.page_count - 1))
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.render_page(), view=self)
+    
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
+    
+    async def on_timeout(self):
+        """Disable all buttons when the view times out."""
+        for item in self.children:
+            item.disabled = True
+
+
 class ProximityModal(discord.ui.Modal, title='Find Nearby Members'):
     def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
         super().__init__()
@@ -54,13 +134,15 @@ class ProximityModal(discord.ui.Modal, title='Find Nearby Members'):
                 await self.original_interaction.edit_original_response(embed=error_embed, view=None)
                 return
 
-            # Use centralized progress handler
-            from core.map_progress_handler import create_proximity_progress_callback
             progress_callback = await create_proximity_progress_callback(interaction, self.cog.log)
             
             # Generate proximity map
             user_id = interaction.user.id
-            result = await self.cog._generate_proximity_map(user_id, self.guild_id, distance_km, progress_callback)
+            try:
+                result = await self.cog._generate_proximity_map(user_id, self.guild_id, distance_km, progress_callback)
+            finally:
+                # Every edit below is final, a trailing progress edit must not overwrite it
+                await finish_progress(progress_callback)
             
             if not result:
                 error_embed = discord.Embed(
@@ -73,55 +155,13 @@ class ProximityModal(discord.ui.Modal, title='Find Nearby Members'):
             
             proximity_image, nearby_users = result
             
-            # Create result embed
-            embed = discord.Embed(
-                title=f"🔍 Nearby Members ({distance_km}km radius)",
-                color=0x7289da,
-                timestamp=datetime.now()
-            )
-            
-            if nearby_users:
-                # Add nearby users to embed - USE ORIGINAL INPUT AND USER MENTIONS
-                user_list = []
-                for user_data in nearby_users:
-                    user_id_str = user_data.get('user_id', '')
-                    location_input = user_data.get('location', 'Unknown')  # Use original user input
-                    distance = user_data.get('distance', 0)
-                    
-                    # Create user mention instead of username
-                    user_mention = f"<@{user_id_str}>" if user_id_str else "Unknown User"
-                    user_list.append(f"{user_mention} - {location_input} ({distance:.1f}km)")
-                
-                # Split into multiple fields if too many users
-                max_per_field = 10
-                for i in range(0, len(user_list), max_per_field):
-                    field_users = user_list[i:i+max_per_field]
-                    field_name = f"👥 Found Members" if i == 0 else f"👥 Found Members (cont.)"
-                    embed.add_field(
-                        name=field_name,
-                        value="\n".join(field_users),
-                        inline=False
-                    )
-            else:
-                embed.add_field(
-                    name="👥 Found Members",
-                    value="No members found within the specified radius.",
-                    inline=False
-                )
-            
-            embed.add_field(
-                name="📊 Summary",
-                value=f"**{len(nearby_users)}** members within **{distance_km}km**",
-                inline=False
-            )
-            
-            # Replace loading message with results and embed the map within the embed
+            # Replace loading message with the first page of results and embed the map within the embed
             filename = f"proximity_{distance_km}km_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            embed.set_image(url=f"attachment://{filename}")
+            paginator = NearbyUsersPaginator(nearby_users, distance_km, filename)
             await self.original_interaction.edit_original_response(
-                embed=embed,
+                embed=paginator.render_page(),
                 attachments=[discord.File(proximity_image, filename=filename)],
-                view=None
+                view=paginator if paginator.page_count > 1 else None
             )
             
         except Exception as e:
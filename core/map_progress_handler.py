@@ -11,9 +11,33 @@ from datetime import datetime
 import asyncio
 
 
+_map_config = None
+
+
+def _get_map_config():
+    """Shared MapConfig instance, created on first use."""
+    global _map_config
+    if _map_config is None:
+        from core.map_config import MapConfig
+        _map_config = MapConfig()
+    return _map_config
+
+
+# Every possible progress bar, 20 blocks for 0-100%
+_PROGRESS_BARS = tuple(f"{'█' * (p // 5)}{'░' * (20 - p // 5)} {p}%" for p in range(101))
+
+
 class MapProgressHandler:
     """Centralized handler for map rendering progress updates."""
     
+    # Minimum time (seconds) between two progress edits
+    UPDATE_INTERVAL = 0.5
+    
+    # One handler lives for every render in flight, keep them small
+    __slots__ = ("interaction", "map_type", "logger", "message", "region", "hide_final_image",
+                 "_last_update", "_update_lock", "_current_image", "_current_percentage", "_pending",
+                 "_flush_task", "_last_sent", "_uploaded_image", "_region_emoji", "_finished")
+    
     def __init__(self, interaction: discord.Interaction, map_type: str, logger, message=None, region: str = None, hide_final_image: bool = False):
         """
         Initialize the progress handler.
@@ -36,29 +60,99 @@ class MapProgressHandler:
         self._update_lock = asyncio.Lock()
         self._current_image = None  # Store current image to retain until replaced
         self._current_percentage = 0
+        self._pending: Optional[tuple] = None  # Latest (message, percentage) not yet sent
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_sent: Optional[tuple] = None
+        self._uploaded_image = None  # Image buffer currently attached to the message
+        self._region_emoji: Optional[str] = None
+        self._finished = False  # Set once the caller is about to show its final result
     
     async def update_progress(self, message: str, percentage: int, image_buffer: Optional = None) -> None:
         """
         Update the ephemeral response with progress information.
         
+        Updates arriving within UPDATE_INTERVAL of the last edit are coalesced:
+        only the latest one is sent once the interval has passed. The final
+        (100%) update is always sent immediately.
+        
         Args:
             message: Progress message to display
             percentage: Progress percentage (0-100)
             image_buffer: Optional image buffer to display as attachment
         """
+        # The final result or error may already be shown, a late update must not replace it
+        if self._finished:
+            return
+        
+        # Update stored image if a new one is provided. Replaced buffers belong to the caller,
+        # so they are only dropped here, never closed
+        if image_buffer is not None:
+            self._current_image = image_buffer
+            self._current_percentage = percentage
+        
+        # Nothing to do if this is exactly what the message already shows
+        if self._signature(message, percentage) == self._last_sent:
+            self._pending = None
+            return
+        
+        self._pending = (message, percentage)
+        
+        if percentage >= 100:
+            if self._flush_task and not self._flush_task.done():
+                self._flush_task.cancel()
+            self._flush_task = None
+            await self._flush()
+            return
+        
+        if self._flush_task and not self._flush_task.done():
+            return  # A trailing edit is already scheduled and will pick up this update
+        
+        delay = self._last_update + self.UPDATE_INTERVAL - asyncio.get_event_loop().time()
+        if delay <= 0:
+            await self._flush()
+        else:
+            self._flush_task = asyncio.create_task(self._flush_after(delay))
+    
+    async def finish(self) -> None:
+        """Stop progress updates before the caller's final edit.
+        
+        Cancels a scheduled trailing edit and waits for one already being sent,
+        so no progress embed can land on top of the result or error.
+        """
+        self._finished = True
+        self._pending = None
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        async with self._update_lock:
+            pass
+    
+    def _signature(self, message: str, percentage: int) -> tuple:
+        """Everything that determines the rendered progress message."""
+        show_image = self._current_image is not None and not (self.hide_final_image and percentage == 100)
+        return (message, percentage, self._current_image if show_image else None)
+    
+    async def _flush_after(self, delay: float) -> None:
+        """Send the latest pending update after delay."""
+        await asyncio.sleep(delay)
+        await self._flush()
+    
+    async def _flush(self) -> None:
+        """Send the latest pending update, unless it matches what is already displayed."""
         async with self._update_lock:
+            if self._pending is None:
+                return
+            message, percentage = self._pending
+            self._pending = None
+            
+            state = self._signature(message, percentage)
+            if state == self._last_sent:
+                return
+            show_image = state[2] is not None
+            
+            self._last_update = asyncio.get_event_loop().time()
+            
             try:
-                # Rate limit updates to avoid Discord API limits
-                current_time = asyncio.get_event_loop().time()
-                if current_time - self._last_update < 0.5 and percentage < 100:  # 500ms throttle, except for final update
-                    return
-                self._last_update = current_time
-                
-                # Update stored image if a new one is provided
-                if image_buffer is not None:
-                    self._current_image = image_buffer
-                    self._current_percentage = percentage
-                
                 # Determine emoji based on region
                 emoji = self._get_region_emoji()
                 
@@ -78,7 +172,14 @@ class MapProgressHandler:
                 
                 # Use the most recent image if available, including at 100% completion
                 # Show the final image at 100% to display the completed map (unless hide_final_image is True)
-                if self._current_image and not (self.hide_final_image and percentage == 100):
+                if show_image and self._current_image is self._uploaded_image:
+                    # Same image as the existing attachment: leave attachments untouched, no re-upload
+                    progress_embed.set_image(url=f"attachment://progress_{self._current_percentage}.png")
+                    if self.message:
+                        await self.message.edit(content=None, embed=progress_embed)
+                    else:
+                        await self.interaction.edit_original_response(content=None, embed=progress_embed)
+                elif show_image:
                     self._current_image.seek(0)
                     file = discord.File(self._current_image, filename=f"progress_{self._current_percentage}.png")
                     progress_embed.set_image(url=f"attachment://progress_{self._current_percentage}.png")
@@ -92,6 +193,7 @@ class MapProgressHandler:
                             embed=progress_embed, 
                             attachments=[file]
                         )
+                    self._uploaded_image = self._current_image
                 else:
                     # No image or completion reached - clear attachments
                     # Use message.edit for followup messages, interaction.edit_original_response for ephemeral responses
@@ -103,19 +205,27 @@ class MapProgressHandler:
                             embed=progress_embed, 
                             attachments=[]
                         )
+                    self._uploaded_image = None
+                
+                self._last_sent = state
                     
             except Exception as e:
                 self.logger.warning(f"Failed to update progress message: {e}")
     
     def _get_region_emoji(self) -> str:
         """Get appropriate emoji for the region being rendered."""
+        if self._region_emoji is None:
+            self._region_emoji = self._resolve_region_emoji()
+        return self._region_emoji
+    
+    def _resolve_region_emoji(self) -> str:
+        """Look up the emoji for the region in the map config."""
         if not self.region:
             return "🌍"  # Default world emoji
         
         # Import here to avoid circular imports
         try:
-            from core.map_config import MapConfig
-            config = MapConfig()
+            config = _get_map_config()
             
             # Check if it's a German state first
             if self.region in config.GERMAN_STATES:
@@ -132,9 +242,7 @@ class MapProgressHandler:
     
     def _create_progress_bar(self, percentage: int) -> str:
         """Create a visual progress bar using Unicode blocks."""
-        filled = int(percentage / 5)  # 20 blocks total (100/5)
-        empty = 20 - filled
-        return f"{'█' * filled}{'░' * empty} {percentage}%"
+        return _PROGRESS_BARS[max(0, min(100, int(percentage)))]
     
     def create_callback(self) -> Callable:
         """
@@ -146,6 +254,8 @@ class MapProgressHandler:
         async def progress_callback(message: str, percentage: int, image_buffer: Optional = None) -> None:
             await self.update_progress(message, percentage, image_buffer)
         
+        # Exposed so callers can stop the updates before their final edit, see finish_progress
+        progress_callback.finish = self.finish
         return progress_callback
 
 
@@ -174,6 +284,13 @@ class MapProgressHandlerFactory:
 
 
 # Convenience functions for backward compatibility and easy usage
+async def finish_progress(progress_callback: Optional[Callable]) -> None:
+    """Stop a progress callback's updates before the final edit, a no-op for None."""
+    finish = getattr(progress_callback, "finish", None)
+    if finish is not None:
+        await finish()
+
+
 async def create_server_map_progress_callback(interaction: discord.Interaction, logger, message=None, hide_final_image: bool = False) -> Callable:
     """Create a progress callback for server map generation."""
     handler = MapProgressHandlerFactory.create_server_map_handler(interaction, logger, message, hide_final_image)
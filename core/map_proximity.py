@@ -1,56 +1,261 @@
 """Proximity calculation utilities for the Discord Map Bot - Updated for improved renderer."""
 
 import math
+import asyncio
+import numpy as np
+from collections import namedtuple
 from typing import Dict, List, Tuple, Optional
 from io import BytesIO
 from PIL import Image, ImageDraw
+from shapely import STRtree, points
+from shapely.geometry import box
+
+from core.map_gen import encode_progress_frame
+
+try:
+    # Optional: JIT-compiled Haversine kernel, the NumPy expressions are used without it
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Pin coordinates of one pins dict, with the trig inputs of the distance formula precomputed
+PinArrays = namedtuple('PinArrays', 'user_ids pins lats lngs lats_rad lngs_rad cos_lats tree')
+
+
+class GuildPinIndex:
+    """Coordinate arrays for one guild's pins, updated in place as pins are added, moved or removed."""
+    
+    # Buffers grow in chunks of this many pins to amortize reallocation
+    CHUNK_SIZE = 256
+    
+    def __init__(self):
+        self.user_ids: List[str] = []
+        self.pins: List[Dict] = []
+        self._slots: Dict[str, int] = {}
+        # Columns: lat, lng, lat_rad, lng_rad, cos(lat_rad)
+        self._coords = np.empty((self.CHUNK_SIZE, 5), dtype=np.float64)
+        self._snapshot: tuple = ()
+        self._arrays: Optional[PinArrays] = None
+    
+    def __len__(self) -> int:
+        return len(self.user_ids)
+    
+    def _write(self, slot: int, pin: Dict):
+        lat, lng = float(pin['lat']), float(pin['lng'])
+        lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+        self._coords[slot] = (lat, lng, lat_rad, lng_rad, math.cos(lat_rad))
+        self.pins[slot] = pin
+        self._arrays = None
+    
+    def add(self, user_id: str, pin: Dict):
+        """Add a pin, or update it if the user already has one."""
+        if user_id in self._slots:
+            self.update(user_id, pin)
+            return
+        slot = len(self.user_ids)
+        if slot == len(self._coords):
+            self._coords = np.concatenate([self._coords, np.empty((self.CHUNK_SIZE, 5), dtype=np.float64)])
+        self.user_ids.append(user_id)
+        self.pins.append(pin)
+        self._slots[user_id] = slot
+        self._write(slot, pin)
+    
+    def update(self, user_id: str, pin: Dict):
+        """Replace the pin of a user that is already indexed."""
+        self._write(self._slots[user_id], pin)
+    
+    def remove(self, user_id: str):
+        """Remove a user's pin by moving the last pin into its slot."""
+        slot = self._slots.pop(user_id, None)
+        if slot is None:
+            return
+        last = len(self.user_ids) - 1
+        if slot != last:
+            moved_user = self.user_ids[last]
+            self.user_ids[slot] = moved_user
+            self.pins[slot] = self.pins[last]
+            self._coords[slot] = self._coords[last]
+            self._slots[moved_user] = slot
+        self.user_ids.pop()
+        self.pins.pop()
+        self._arrays = None
+    
+    def sync(self, pins: Dict):
+        """Bring the index in line with a pins dict, touching only the pins that changed."""
+        # Pin writes replace the pin dict, so comparing the items snapshot is enough to
+        # detect changes; unchanged entries compare by identity and cost next to nothing.
+        snapshot = tuple(pins.items())
+        if snapshot == self._snapshot:
+            return
+        
+        for user_id in [u for u in self._slots if u not in pins]:
+            self.remove(user_id)
+        for user_id, pin in snapshot:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                self.add(user_id, pin)
+            elif self.pins[slot] is not pin:
+                self.update(user_id, pin)
+        self._snapshot = snapshot
+    
+    def arrays(self, min_tree_pins: int) -> PinArrays:
+        """Get an immutable snapshot of the indexed pins, safe to hand to a worker thread."""
+        if self._arrays is None:
+            coords = self._coords[:len(self.user_ids)].copy()
+            lats, lngs = coords[:, 0], coords[:, 1]
+            tree = STRtree(points(lngs, lats)) if len(self.user_ids) >= min_tree_pins else None
+            self._arrays = PinArrays(list(self.user_ids), list(self.pins), lats, lngs,
+                                     coords[:, 2], coords[:, 3], coords[:, 4], tree)
+        return self._arrays
+
+
+def _encode_png(image: Image.Image, **save_params) -> BytesIO:
+    """Encode an image as PNG into a new buffer."""
+    img_buffer = BytesIO()
+    image.save(img_buffer, format='PNG', **save_params)
+    img_buffer.seek(0)
+    return img_buffer
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _haversine_within(lats_rad, lngs_rad, cos_lats, user_lat_rad, user_lng_rad, radius_rad):
+        """Return (indices, angular distances) of the points within radius_rad, in one fused loop."""
+        n = lats_rad.shape[0]
+        idx = np.empty(n, dtype=np.int64)
+        dist = np.empty(n, dtype=np.float64)
+        cos_user_lat = math.cos(user_lat_rad)
+        # Compare the haversine term itself so rejected points skip sqrt/asin
+        limit = math.sin(radius_rad / 2) ** 2 if radius_rad < math.pi else 1.0
+        count = 0
+        for i in range(n):
+            s_lat = math.sin((lats_rad[i] - user_lat_rad) / 2)
+            s_lng = math.sin((lngs_rad[i] - user_lng_rad) / 2)
+            a = s_lat * s_lat + cos_user_lat * cos_lats[i] * s_lng * s_lng
+            if a <= limit:
+                idx[count] = i
+                dist[count] = 2 * math.asin(math.sqrt(min(a, 1.0)))
+                count += 1
+        return idx[:count], dist[:count]
+else:
+    _haversine_within = None
 
 
 class ProximityCalculator:
     """Handles proximity calculations and map generation."""
     
+    # Number of pins dicts whose pin index is kept between queries
+    PIN_ARRAY_CACHE_SIZE = 64
+    
+    # Radius (km) up to which nearby users are found with the equirectangular approximation
+    EQUIRECTANGULAR_MAX_KM = 500
+    
+    # Pin count from which an R-tree is built; smaller guilds are filtered with array masks
+    PIN_INDEX_MIN_PINS = 256
+    
     def __init__(self, map_generator, logger):
         self.map_generator = map_generator
         self.log = logger
+        self._pin_indexes: Dict[int, GuildPinIndex] = {}
 
     def calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate distance between two points using Haversine formula (in km)."""
-        R = 6371  # Earth's radius in km
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        return self.map_generator.calculate_distance(lat1, lng1, lat2, lng2)
+
+    def _pins_to_arrays(self, pins: Dict) -> PinArrays:
+        """Get the coordinate arrays for a pins dict from its persistent index."""
+        index = self._pin_indexes.pop(id(pins), None)
+        if index is None:
+            index = GuildPinIndex()
+        self._pin_indexes[id(pins)] = index
+        while len(self._pin_indexes) > self.PIN_ARRAY_CACHE_SIZE:
+            self._pin_indexes.pop(next(iter(self._pin_indexes)))
         
-        return R * c
+        index.sync(pins)
+        return index.arrays(self.PIN_INDEX_MIN_PINS)
 
     def find_nearby_users(self, user_lat: float, user_lng: float, pins: Dict, distance_km: int, exclude_user_id: str) -> List[Dict]:
         """Find users within specified distance from given coordinates."""
-        nearby_users = []
+        return self._find_nearby_in_arrays(self._pins_to_arrays(pins), user_lat, user_lng, distance_km, exclude_user_id)
+
+    def _find_nearby_in_arrays(self, arrays: PinArrays, user_lat: float, user_lng: float,
+                               distance_km: int, exclude_user_id: str) -> List[Dict]:
+        """Find users within distance_km using only the pin snapshot, so it is safe to run in a thread."""
+        user_ids = arrays.user_ids
+        if not user_ids:
+            return []
+        
+        R = 6371
+        user_lat_rad = math.radians(user_lat)
+        user_lng_rad = math.radians(user_lng)
+        cos_user_lat = math.cos(user_lat_rad)
+        
+        # Cheap lat/lng bounding-box reject before any trig. A point within angular radius r
+        # lies within r in latitude and within asin(sin(r) / cos(lat)) in longitude; the
+        # longitude band is widened to r / cos(lat) to also cover the equirectangular formula.
+        radius_rad = distance_km / R
+        lat_delta = math.degrees(radius_rad)
+        lng_delta = None
+        if cos_user_lat > 1e-6 and math.sin(radius_rad) < cos_user_lat:
+            lng_delta_rad = max(math.asin(math.sin(radius_rad) / cos_user_lat), radius_rad / cos_user_lat)
+            if lng_delta_rad < math.pi:
+                lng_delta = math.degrees(lng_delta_rad)
+        
+        if arrays.tree is not None and lng_delta is not None and -180 <= user_lng - lng_delta and user_lng + lng_delta <= 180:
+            # Large guilds: the R-tree returns only the pins inside the box
+            query_box = box(user_lng - lng_delta, user_lat - lat_delta, user_lng + lng_delta, user_lat + lat_delta)
+            candidates = np.sort(arrays.tree.query(query_box))
+        else:
+            in_box = np.abs(arrays.lats - user_lat) <= lat_delta
+            if lng_delta is not None:
+                in_box &= np.abs((arrays.lngs - user_lng + 180) % 360 - 180) <= lng_delta
+            candidates = np.flatnonzero(in_box)
         
-        for other_user_id, other_pin in pins.items():
+        lats_rad = arrays.lats_rad[candidates]
+        delta_lng = (arrays.lngs_rad[candidates] - user_lng_rad + math.pi) % (2 * math.pi) - math.pi
+        
+        if distance_km <= self.EQUIRECTANGULAR_MAX_KM:
+            # Equirectangular approximation using the mean latitude of each pair, sub-1% error at
+            # these radii. Pins are rejected on the squared angular distance, so the square root is
+            # only taken for matches.
+            x = delta_lng * np.cos((user_lat_rad + lats_rad) / 2)
+            y = lats_rad - user_lat_rad
+            dist_sq = x * x + y * y
+            within = np.flatnonzero(dist_sq <= (distance_km / R) ** 2)
+            match_distances = R * np.sqrt(dist_sq[within])
+        elif _haversine_within is not None:
+            within, angles = _haversine_within(lats_rad, arrays.lngs_rad[candidates], arrays.cos_lats[candidates],
+                                               user_lat_rad, user_lng_rad, radius_rad)
+            match_distances = R * angles
+        else:
+            # Haversine for large radii, reusing the cached cos(lat) of the pins
+            distances = self.map_generator.haversine_batch(user_lat, user_lng, arrays.lats[candidates],
+                                                           arrays.lngs[candidates], arrays.cos_lats[candidates])
+            within = np.flatnonzero(distances <= distance_km)
+            match_distances = distances[within]
+        matches = candidates[within]
+        
+        # Sort by distance
+        order = np.argsort(match_distances, kind='stable')
+        matches = matches[order]
+        match_distances = match_distances[order]
+        
+        nearby_users = []
+        for i, distance in zip(matches, match_distances):
+            other_user_id = user_ids[i]
             if other_user_id == exclude_user_id:
                 continue
             
-            other_lat, other_lng = other_pin['lat'], other_pin['lng']
-            distance = self.calculate_distance(user_lat, user_lng, other_lat, other_lng)
-            
-            if distance <= distance_km:
-                nearby_users.append({
-                    'user_id': other_user_id,
-                    'username': other_pin.get('username', 'Unknown'),
-                    'location': other_pin.get('location', 'Unknown'),  # Use original input
-                    'lat': other_lat,
-                    'lng': other_lng,
-                    'distance': distance
-                })
+            other_pin = arrays.pins[i]
+            nearby_users.append({
+                'user_id': other_user_id,
+                'username': other_pin.get('username', 'Unknown'),
+                'location': other_pin.get('location', 'Unknown'),  # Use original input
+                'lat': other_pin['lat'],
+                'lng': other_pin['lng'],
+                'distance': float(distance)
+            })
         
-        # Sort by distance
-        nearby_users.sort(key=lambda x: x['distance'])
         return nearby_users
 
     def calculate_map_bounds(self, user_lat: float, user_lng: float, distance_km: int) -> Tuple[float, float, float, float]:
@@ -95,9 +300,6 @@ class ProximityCalculator:
             user_pin = pins[user_id_str]
             user_lat, user_lng = user_pin['lat'], user_pin['lng']
             
-            # Find nearby users
-            nearby_users = self.find_nearby_users(user_lat, user_lng, pins, distance_km, user_id_str)
-            
             # Calculate map bounds
             minx, miny, maxx, maxy = self.calculate_map_bounds(user_lat, user_lng, distance_km)
             
@@ -117,13 +319,19 @@ class ProximityCalculator:
                     scaled_percentage = 10 + int(percentage * 0.7)
                     await progress_callback(f"Rendering map: {message}", scaled_percentage, image_buffer)
             
-            base_map, projection_func = await self.map_generator.render_base_map(
-                minx, miny, maxx, maxy, width, height, 
-                map_type="proximity", 
-                guild_id=guild_id_str, 
-                maps=maps,
-                zoom_level="proximity",
-                progress_callback=internal_progress_callback
+            # The nearby-user lookup only needs the pin snapshot, so it runs in a worker thread
+            # while the base map renders on the event loop
+            pin_arrays = self._pins_to_arrays(pins)
+            (base_map, projection_func), nearby_users = await asyncio.gather(
+                self.map_generator.render_base_map(
+                    minx, miny, maxx, maxy, width, height, 
+                    map_type="proximity", 
+                    guild_id=guild_id_str, 
+                    maps=maps,
+                    zoom_level="proximity",
+                    progress_callback=internal_progress_callback
+                ),
+                asyncio.to_thread(self._find_nearby_in_arrays, pin_arrays, user_lat, user_lng, distance_km, user_id_str)
             )
             
             if not base_map:
@@ -136,13 +344,13 @@ class ProximityCalculator:
                 await progress_callback("Adding pins and proximity circle...", 85)
                 
             draw = ImageDraw.Draw(base_map)
+            ellipse = draw.ellipse  # Bound once, used for every circle and pin below
             
-            # Share intermediate image with just the base map
+            # Share intermediate image with just the base map. Progress frames are encoded straight
+            # from base_map as palettized PNGs in a worker thread; only the final image is optimized.
             if progress_callback:
                 try:
-                    intermediate_img = base_map.copy()
-                    img_buffer = BytesIO()
-                    intermediate_img.save(img_buffer, format='PNG', optimize=True)
+                    img_buffer = await asyncio.to_thread(encode_progress_frame, base_map)
                     await progress_callback("Base map complete, adding proximity elements...", 85, img_buffer)
                 except Exception as e:
                     # Fallback to regular progress without image
@@ -157,14 +365,14 @@ class ProximityCalculator:
             circle_color = country_color  # Use country border color for consistency
             
             # Draw circle outline with custom color
-            draw.ellipse([
+            ellipse([
                 center_x - radius_pixels, center_y - radius_pixels,
                 center_x + radius_pixels, center_y + radius_pixels
             ], outline=circle_color, width=3)
         
             # Draw user pin (larger, different color) - use a distinctive green
             user_pin_size = 12
-            draw.ellipse([
+            ellipse([
                 center_x - user_pin_size, center_y - user_pin_size,
                 center_x + user_pin_size, center_y + user_pin_size
             ], fill='#00FF00', outline='white', width=3)
@@ -172,9 +380,7 @@ class ProximityCalculator:
             # Share intermediate image with circle and user pin
             if progress_callback:
                 try:
-                    intermediate_img = base_map.copy()
-                    img_buffer = BytesIO()
-                    intermediate_img.save(img_buffer, format='PNG', optimize=True)
+                    img_buffer = await asyncio.to_thread(encode_progress_frame, base_map)
                     await progress_callback("Proximity circle and your pin added, adding nearby users...", 92, img_buffer)
                 except Exception as e:
                     await progress_callback("Adding nearby user pins...", 92)
@@ -182,23 +388,24 @@ class ProximityCalculator:
             # Draw nearby user pins with custom pin color
             pin_color, _ = self.map_generator.get_pin_settings(guild_id_str, maps)
             
-            for user_data in nearby_users:
-                pin_lat, pin_lng = user_data['lat'], user_data['lng']
+            if nearby_users:
+                pin_lats = np.fromiter((u['lat'] for u in nearby_users), dtype=np.float64, count=len(nearby_users))
+                pin_lngs = np.fromiter((u['lng'] for u in nearby_users), dtype=np.float64, count=len(nearby_users))
+                
+                # Only pins within map bounds (visible area), projected in one pass
+                visible = (minx <= pin_lngs) & (pin_lngs <= maxx) & (miny <= pin_lats) & (pin_lats <= maxy)
+                xs, ys = projection_func.project_points(pin_lats[visible], pin_lngs[visible])
                 
-                # Check if pin is within map bounds (visible area)
-                if minx <= pin_lng <= maxx and miny <= pin_lat <= maxy:
-                    x, y = projection_func(pin_lat, pin_lng)
-                    pin_size = 8
-                    draw.ellipse([x - pin_size, y - pin_size, x + pin_size, y + pin_size],
+                pin_size = 8
+                for x, y in zip(xs.tolist(), ys.tolist()):
+                    ellipse([x - pin_size, y - pin_size, x + pin_size, y + pin_size],
                                  fill=pin_color, outline='white', width=2)
         
             if progress_callback:
                 await progress_callback("Finalizing proximity map...", 100)
                 
-            # Convert to BytesIO
-            img_buffer = BytesIO()
-            base_map.save(img_buffer, format='PNG', optimize=True)
-            img_buffer.seek(0)
+            # Convert to BytesIO, encoding off the event loop
+            img_buffer = await asyncio.to_thread(_encode_png, base_map, optimize=True)
         
             return img_buffer, nearby_users
         
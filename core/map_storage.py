@@ -1,19 +1,149 @@
 """Map storage and caching utilities for the Discord Map Bot - Improved Cache System."""
 
+import os
 import json
+import shutil
+import asyncio
+import struct
+import contextlib
 import hashlib
+import itertools
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, Tuple, Literal, Union
 from datetime import datetime
 from io import BytesIO
+import numpy as np
 from PIL import Image
 import discord
 from core.cache_manager import cache_manager
 
+try:
+    # Optional: C-accelerated JSON for guild map files, the json module is used without it
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _hash8(data: bytes) -> str:
+    """Short non-cryptographic digest used in cache keys (8 hex chars)."""
+    return hashlib.blake2b(data, digest_size=4).hexdigest()
+
+
+def _canonical(value):
+    """Nested settings as sorted tuples, so equal settings always give the same repr."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _canonical(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(v) for v in value)
+    return value
+
+
+def _load_png(path: Path) -> Image.Image:
+    """Fully decode a cached PNG into an image detached from its file, meant to run off the event loop."""
+    # The context manager closes the file handle, the copy keeps the pixels alive past close()
+    with Image.open(path) as src:
+        src.load()
+        return src.copy()
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _peek_size(path: Path) -> Optional[Tuple[int, int]]:
+    """Width and height of a cached bitmap read from its header alone, None if the header is invalid."""
+    with open(path, 'rb') as f:
+        if path.suffix == ".npy":
+            try:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape = np.lib.format.read_array_header_1_0(f)[0]
+                else:
+                    shape = np.lib.format.read_array_header_2_0(f)[0]
+            except ValueError:
+                return None
+            return (shape[1], shape[0]) if len(shape) >= 2 else None
+        header = f.read(24)
+    # Signature, then the IHDR chunk with big-endian width and height
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+class CachedBitmap:
+    """A base map on disk whose pixels are only loaded when they are needed."""
+    
+    __slots__ = ("path", "width", "height")
+    
+    def __init__(self, path: Path, width: int, height: int):
+        self.path = path
+        self.width = width
+        self.height = height
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+    
+    async def to_image(self) -> Image.Image:
+        """Decode the bitmap off the event loop."""
+        loader = _load_raw if self.path.suffix == ".npy" else _load_png
+        return await asyncio.to_thread(loader, self.path)
+
+
+def _read_json(path: Path):
+    """Parse a JSON file, with orjson when it is installed."""
+    data = path.read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dump_json(data) -> bytes:
+    """Serialize to indented UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _unlink_all(paths: list):
+    """Delete files, ignoring ones that are already gone."""
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_raw(image: Image.Image, path: Path):
+    """Write the image pixels as a .npy bitmap, replacing any older file atomically."""
+    # A concurrent reader must never see a half-written file
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.asarray(image), allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _load_raw(path: Path) -> Image.Image:
+    """Read a cached .npy bitmap as an image, no decoding involved.
+    
+    The pixels are read into memory rather than memory-mapped, so the image stays valid when the
+    file is replaced or evicted. Raw bitmaps take several times the disk space of the PNG they
+    replace, which is the price for skipping the decode on every cache hit.
+    """
+    return Image.fromarray(np.load(path, allow_pickle=False))
+
 
 class UnifiedCacheManager:
     """Unified cache management system for all map types."""
     
+    CACHE_SUFFIXES = (".png", ".npy", ".webp")
+    # Close-ups are encoded as WebP, everything else that is cached encoded is PNG
+    CLOSEUP_SUFFIX = ".webp"
+    # Modes that survive a round trip through a plain pixel array
+    RAW_IMAGE_MODES = ("L", "RGB", "RGBA")
+    CLOSEUP_BYTES_CACHE_SIZE = 32
+    
     def __init__(self, data_dir: Path, cache_dir: Path, logger):
         self.data_dir = data_dir
         self.cache_dir = cache_dir
@@ -25,11 +155,148 @@ class UnifiedCacheManager:
         
         # Use global managed cache
         self.memory_cache = cache_manager.memory_cache
+        
+        # Settings and pin hashes keyed by (guild_id, id(source dict), kind). The dict is kept in the
+        # value so its id cannot be reused; entries are dropped whenever a guild's data is saved.
+        self._settings_hash_cache: Dict[Tuple[str, int, str], Tuple[Dict, str]] = {}
+        
+        # File names per cache directory, scanned once and then kept in sync by our own writes and deletes
+        self._dir_index: Dict[Path, set] = {}
+        
+        # Per-key write locks with their user counts, so concurrent renders write an item only once
+        self._write_locks: Dict[str, list] = {}
+        
+        # Guild cache directories already created, so lookups skip the mkdir syscall
+        self._guild_cache_dirs: Dict[str, Path] = {}
+        
+        # Encoded closeup PNGs by cache key, shared read-only between requests
+        self._bytes_cache: OrderedDict[str, bytes] = OrderedDict()
+        
+        # Cache key builders per cache type
+        self._key_handlers = {
+            "base_map": self._key_base_map,
+            "closeup_base_map": self._key_closeup_base_map,
+            "final_map": self._key_final_map,
+            "closeup": self._key_closeup,
+        }
+    
+    def _memoized_settings_hash(self, guild_id: str, settings: Dict, kind: str, compute) -> str:
+        """Return a cached settings hash, computing it on first use."""
+        if not settings:
+            # Missing settings come in as a fresh {} on every call, memoizing those would only pile up entries
+            return compute(settings)
+        key = (guild_id, id(settings), kind)
+        cached = self._settings_hash_cache.get(key)
+        if cached is not None and cached[0] is settings:
+            return cached[1]
+        settings_hash = compute(settings)
+        self._settings_hash_cache[key] = (settings, settings_hash)
+        return settings_hash
+    
+    def forget_settings_hashes(self, guild_id: str):
+        """Drop memoized settings and pin hashes of a guild after its data changed."""
+        for key in [k for k in self._settings_hash_cache if k[0] == guild_id]:
+            del self._settings_hash_cache[key]
+    
+    def _index(self, directory: Path) -> set:
+        """File names in a cache directory, read with a single scandir on first use."""
+        names = self._dir_index.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as entries:
+                    names = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                names = set()
+            self._dir_index[directory] = names
+        return names
+    
+    async def _purge(self, directory: Path, prefix: str = "", label: str = "cache") -> int:
+        """Delete indexed cache files starting with prefix in one worker thread, return the count."""
+        names = self._index(directory)
+        victims = [name for name in names if name.startswith(prefix) and name.endswith(self.CACHE_SUFFIXES)]
+        if not victims:
+            return 0
+        names.difference_update(victims)
+        await asyncio.to_thread(_unlink_all, [directory / name for name in victims])
+        # Callers log one summary per invalidation, the file names are only worth formatting at DEBUG
+        self.log.debug("Removed %d %s file(s) from %s: %s", len(victims), label, directory, victims)
+        return len(victims)
+    
+    async def _evict_memory(self, directory: Path, prefixes: Tuple[str, ...]) -> int:
+        """Drop in-memory base maps whose files in directory start with one of prefixes."""
+        keys = {name.rsplit(".", 1)[0] for name in self._index(directory)
+                if name.startswith(prefixes) and name.endswith(self.CACHE_SUFFIXES)}
+        evicted = 0
+        for key in keys:
+            if await self.memory_cache.remove(key):
+                evicted += 1
+        return evicted
+    
+    def _remember_bytes(self, cache_key: str, data: bytes):
+        """Keep encoded bytes in the small LRU, evicting the least recently used entry."""
+        self._bytes_cache[cache_key] = data
+        self._bytes_cache.move_to_end(cache_key)
+        while len(self._bytes_cache) > self.CLOSEUP_BYTES_CACHE_SIZE:
+            self._bytes_cache.popitem(last=False)
+    
+    def _encoded_suffix(self, cache_type: str) -> str:
+        """File suffix of an encoded cache entry."""
+        return self.CLOSEUP_SUFFIX if cache_type == "closeup" else ".png"
+    
+    def _base_map_file(self, cache_dir: Path, cache_key: str) -> Optional[Path]:
+        """Cached bitmap for a base map key, preferring the raw .npy over a legacy PNG."""
+        names = self._index(cache_dir)
+        for suffix in (".npy", ".png"):
+            if f"{cache_key}{suffix}" in names:
+                return cache_dir / f"{cache_key}{suffix}"
+        return None
+    
+    async def _load_base_map(self, cache_file: Path) -> Image.Image:
+        """Load a cached base map bitmap off the event loop."""
+        loader = _load_raw if cache_file.suffix == ".npy" else _load_png
+        try:
+            return await asyncio.to_thread(loader, cache_file)
+        except FileNotFoundError:
+            # Removed behind our back, forget it
+            self._index(cache_file.parent).discard(cache_file.name)
+            raise
+    
+    @contextlib.asynccontextmanager
+    async def _write_lock(self, cache_key: str):
+        """Serialize writes of one cache key, dropping the lock once nobody holds or awaits it."""
+        entry = self._write_locks.get(cache_key)
+        if entry is None:
+            entry = self._write_locks[cache_key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._write_locks[cache_key]
+    
+    async def _store_base_map(self, cache_dir: Path, cache_key: str, image: Image.Image):
+        """Write a base map to disk, as a raw bitmap when its mode allows it."""
+        async with self._write_lock(cache_key):
+            # Keys are derived from the content, an existing file already holds this base map
+            if self._base_map_file(cache_dir, cache_key) is not None:
+                return
+            if image.mode in self.RAW_IMAGE_MODES:
+                cache_file = cache_dir / f"{cache_key}.npy"
+                await asyncio.to_thread(_save_raw, image, cache_file)
+            else:
+                cache_file = cache_dir / f"{cache_key}.png"
+                await asyncio.to_thread(image.save, cache_file, 'PNG', compress_level=1)
+            self._index(cache_dir).add(cache_file.name)
     
     def _get_guild_cache_dir(self, guild_id: str) -> Path:
         """Get guild-specific cache directory."""
-        guild_dir = self.data_dir / guild_id
-        guild_dir.mkdir(exist_ok=True)
+        guild_dir = self._guild_cache_dirs.get(guild_id)
+        if guild_dir is None:
+            guild_dir = self.data_dir / guild_id
+            guild_dir.mkdir(exist_ok=True)
+            self._guild_cache_dirs[guild_id] = guild_dir
         return guild_dir
     
     def _has_custom_settings(self, guild_id: str, maps: Dict) -> bool:
@@ -46,41 +313,47 @@ class UnifiedCacheManager:
     
     def generate_base_map_cache_key(self, guild_id: str, maps: Dict, region: str, width: int, height: int) -> str:
         """Generate cache key specifically for base maps (excludes pin data)."""
-        base_parts = ["base_map", region, str(width), str(height)]
-        
         # Only include visual settings that affect the BASE MAP (not pins)
-        map_data = maps.get(guild_id, {})
-        settings = map_data.get('settings', {})
+        return f"base_map_{region}_{width}_{height}_{self._base_settings_hash(guild_id, maps)}"
+
+    def _base_settings_hash(self, guild_id: str, maps: Dict) -> str:
+        """Memoized hash of the settings of a guild that affect its base maps."""
+        settings = maps.get(guild_id, {}).get('settings', {})
+        return self._memoized_settings_hash(guild_id, settings, "base_map", self._base_map_settings_hash)
+
+    def _base_map_settings_hash(self, settings: Dict) -> str:
+        """Hash only the settings that affect base map rendering, or "default" if there are none."""
+        if not settings:
+            return "default"
         
-        if settings:
-            # Create hash only for settings that affect base map rendering
-            base_map_settings = {}
-            
-            # Colors affect base map
-            if 'colors' in settings:
-                base_map_settings['colors'] = settings['colors']
-            
-            # Borders affect base map  
-            if 'borders' in settings:
-                borders = settings['borders'].copy()
-                # Remove pin-specific settings that don't affect base map
-                borders.pop('pin', None)  # Remove any pin-related border settings
-                if borders:  # Only include if there are actual border settings
-                    base_map_settings['borders'] = borders
-            
-            # Pins settings do NOT affect base map, so exclude them
-            # This allows base map reuse when only pin color/size changes
-            
-            if base_map_settings:
-                settings_str = json.dumps(base_map_settings, sort_keys=True)
-                settings_hash = hashlib.md5(settings_str.encode()).hexdigest()[:8]
-                base_parts.append(settings_hash)
-            else:
-                base_parts.append("default")
-        else:
-            base_parts.append("default")
+        parts = []
         
-        return "_".join(base_parts)
+        # Colors affect base map
+        if 'colors' in settings:
+            parts.append(('colors', _canonical(settings['colors'])))
+        
+        # Borders affect base map, minus any pin-related border settings
+        if 'borders' in settings:
+            borders = tuple(item for item in _canonical(settings['borders']) if item[0] != 'pin')
+            if borders:  # Only include if there are actual border settings
+                parts.append(('borders', borders))
+        
+        # Pins settings do NOT affect base map, so exclude them
+        # This allows base map reuse when only pin color/size changes
+        
+        if not parts:
+            return "default"
+        return _hash8(repr(parts).encode())
+
+    def _pins_hash(self, guild_id: str, maps: Dict) -> str:
+        """Hash the positions of all pins of a guild, memoized until the guild is saved again."""
+        pins = maps.get(guild_id, {}).get('pins', {})
+        return self._memoized_settings_hash(guild_id, pins, "pins", self._hash_pin_positions)
+
+    def _hash_pin_positions(self, pins: Dict) -> str:
+        """Hash pin positions in user id order."""
+        pin_str = repr(sorted((uid, pin['lat'], pin['lng']) for uid, pin in pins.items()))
+        return _hash8(pin_str.encode())
 
     def generate_settings_hash(self, guild_id: str, maps: Dict) -> str:
         """Generate hash for visual settings that affect rendering."""
@@ -90,82 +363,51 @@ class UnifiedCacheManager:
         if not settings:
             return "default"
         
-        # Include all visual settings
-        visual_settings = {}
-        for key in ['colors', 'borders', 'pins']:
-            if key in settings:
-                visual_settings[key] = settings[key]
+        return self._memoized_settings_hash(guild_id, settings, "visual", self._visual_settings_hash)
+
+    def _visual_settings_hash(self, settings: Dict) -> str:
+        """Hash all visual settings, or "default" if there are none."""
+        # Include all visual settings, walked in a fixed key order
+        visual_settings = [(key, _canonical(settings[key])) for key in ('colors', 'borders', 'pins') if key in settings]
         
         if not visual_settings:
             return "default"
         
-        settings_str = json.dumps(visual_settings, sort_keys=True)
-        return hashlib.md5(settings_str.encode()).hexdigest()[:8]
+        return _hash8(repr(visual_settings).encode())
     
     def generate_cache_key(self, cache_type: str, guild_id: str, maps: Dict, **params) -> str:
         """Generate unified cache key for any cache type."""
-        base_parts = [cache_type]
-        
-        # Add type-specific parameters
-        if cache_type == "base_map":
-            # Use specialized base map key generation
-            return self.generate_base_map_cache_key(guild_id, maps, params['region'], params['width'], params['height'])
-        elif cache_type == "closeup_base_map":
-            # New cache type for closeup base maps (without pins)
-            base_parts.extend([params['closeup_type'], params['closeup_name'], str(params['width']), str(params['height'])])
-            # Only include visual settings that affect the BASE MAP (not pins)
-            map_data = maps.get(guild_id, {})
-            settings = map_data.get('settings', {})
-            
-            if settings:
-                base_map_settings = {}
-                
-                # Colors affect base map
-                if 'colors' in settings:
-                    base_map_settings['colors'] = settings['colors']
-                
-                # Borders affect base map
-                if 'borders' in settings:
-                    borders = settings['borders'].copy()
-                    borders.pop('pin', None)  # Remove pin-specific settings
-                    if borders:
-                        base_map_settings['borders'] = borders
-                
-                if base_map_settings:
-                    settings_str = json.dumps(base_map_settings, sort_keys=True)
-                    settings_hash = hashlib.md5(settings_str.encode()).hexdigest()[:8]
-                    base_parts.append(settings_hash)
-                else:
-                    base_parts.append("default")
-            else:
-                base_parts.append("default")
-        elif cache_type == "final_map":
-            base_parts.append(params['region'])
-            # Add pin hash
-            pins = maps.get(guild_id, {}).get('pins', {})
-            pin_data = {uid: (pin['lat'], pin['lng']) for uid, pin in pins.items()}
-            pin_str = json.dumps(pin_data, sort_keys=True)
-            pin_hash = hashlib.md5(pin_str.encode()).hexdigest()[:8]
-            base_parts.append(pin_hash)
-        elif cache_type == "closeup":
-            base_parts.extend([params['closeup_type'], params['closeup_name']])
-            # Add pin hash for closeups too
-            pins = maps.get(guild_id, {}).get('pins', {})
-            pin_data = {uid: (pin['lat'], pin['lng']) for uid, pin in pins.items()}
-            pin_str = json.dumps(pin_data, sort_keys=True)
-            pin_hash = hashlib.md5(pin_str.encode()).hexdigest()[:8]
-            base_parts.append(pin_hash)
-        
-        # Add settings hash for non-base-map types
-        if cache_type not in ["base_map", "closeup_base_map"]:
-            settings_hash = self.generate_settings_hash(guild_id, maps)
-            base_parts.append(settings_hash)
-        
-        return "_".join(base_parts)
-    
-    async def get_cached_item(self, cache_type: str, guild_id: str, maps: Dict, **params) -> Optional[Union[Image.Image, discord.File, BytesIO]]:
-        """Get cached item of any type."""
-        cache_key = self.generate_cache_key(cache_type, guild_id, maps, **params)
+        handler = self._key_handlers.get(cache_type)
+        if handler is None:
+            return f"{cache_type}_{self.generate_settings_hash(guild_id, maps)}"
+        return handler(guild_id, maps, **params)
+    
+    def _key_base_map(self, guild_id: str, maps: Dict, region: str, width: int, height: int, **_) -> str:
+        return self.generate_base_map_cache_key(guild_id, maps, region, width, height)
+    
+    def _key_closeup_base_map(self, guild_id: str, maps: Dict, closeup_type: str, closeup_name: str, width: int, height: int, **_) -> str:
+        # Closeup base maps carry no pins, so only base map settings matter
+        return f"closeup_base_map_{closeup_type}_{closeup_name}_{width}_{height}_{self._base_settings_hash(guild_id, maps)}"
+    
+    def _key_final_map(self, guild_id: str, maps: Dict, region: str, **_) -> str:
+        return f"final_map_{region}_{self._pins_hash(guild_id, maps)}_{self.generate_settings_hash(guild_id, maps)}"
+    
+    def _key_closeup(self, guild_id: str, maps: Dict, closeup_type: str, closeup_name: str, **_) -> str:
+        return f"closeup_{closeup_type}_{closeup_name}_{self._pins_hash(guild_id, maps)}_{self.generate_settings_hash(guild_id, maps)}"
+    
+    def _resolve(self, cache_type: str, guild_id: str, maps: Dict, cache_key: Optional[str] = None, **params) -> Tuple[str, Path, str]:
+        """Cache key, directory and location label of an item, reusing a key the caller already has."""
+        if cache_key is None:
+            cache_key = self.generate_cache_key(cache_type, guild_id, maps, **params)
+        cache_dir, cache_location = self._get_cache_location(guild_id, maps)
+        return cache_key, cache_dir, cache_location
+    
+    async def get_cached_item(self, cache_type: str, guild_id: str, maps: Dict, cache_key: Optional[str] = None, lazy: bool = False, **params) -> Optional[Union[Image.Image, CachedBitmap, discord.File, BytesIO]]:
+        """Get cached item of any type. Base map images are shared with the memory cache.
+        
+        With lazy=True a base map found only on disk comes back as a CachedBitmap, validated by its header.
+        """
+        cache_key, cache_dir, cache_location = self._resolve(cache_type, guild_id, maps, cache_key, **params)
         
         # Check memory cache for base maps (including closeup base maps)
         if cache_type in ["base_map", "closeup_base_map"]:
@@ -175,50 +417,67 @@ class UnifiedCacheManager:
                 return cached_image
         
         # Check disk cache
-        cache_dir, cache_location = self._get_cache_location(guild_id, maps)
-        cache_file = cache_dir / f"{cache_key}.png"
+        cache_name = f"{cache_key}{self._encoded_suffix(cache_type)}"
+        cache_file = cache_dir / cache_name
+        if cache_type in ["base_map", "closeup_base_map"]:
+            cache_file = self._base_map_file(cache_dir, cache_key)
+        elif cache_name not in self._index(cache_dir):
+            cache_file = None
         
-        if cache_file.exists():
+        if cache_file is not None:
             try:
-                if cache_type in ["base_map", "closeup_base_map"]:
-                    image = Image.open(cache_file)
+                if cache_type in ["base_map", "closeup_base_map"] and lazy:
+                    size = await asyncio.to_thread(_peek_size, cache_file)
+                    if size is not None:
+                        return CachedBitmap(cache_file, *size)
+                    self.log.warning(f"Cached {cache_type} {cache_file.name} has an invalid header")
+                elif cache_type in ["base_map", "closeup_base_map"]:
+                    image = await self._load_base_map(cache_file)
                     # Store in memory cache too
                     await self.memory_cache.set(cache_key, image)
                     self.log.info(f"Using disk cached {cache_type} for guild {guild_id} from {cache_location}")
-                    return image.copy()
+                    return image
                 elif cache_type == "final_map":
                     filename = f"map_{cache_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
                     self.log.info(f"Using cached {cache_type} for guild {guild_id} from {cache_location}")
                     return discord.File(cache_file, filename=filename)
                 elif cache_type == "closeup":
-                    with open(cache_file, 'rb') as f:
-                        image_data = f.read()
+                    image_data = self._bytes_cache.get(cache_key)
+                    if image_data is None:
+                        image_data = await asyncio.to_thread(cache_file.read_bytes)
+                    self._remember_bytes(cache_key, image_data)
                     img_buffer = BytesIO(image_data)
                     self.log.info(f"Using cached {cache_type} for guild {guild_id} from {cache_location}")
                     return img_buffer
+            except FileNotFoundError:
+                # Removed behind our back, forget it
+                self._index(cache_dir).discard(cache_file.name)
             except Exception as e:
                 self.log.warning(f"Error loading cached {cache_type}: {e}")
         
         self.log.info(f"No cached {cache_type} found for guild {guild_id}")
         return None
     
-    async def cache_item(self, cache_type: str, guild_id: str, maps: Dict, item: Union[Image.Image, BytesIO], **params):
+    async def cache_item(self, cache_type: str, guild_id: str, maps: Dict, item: Union[Image.Image, BytesIO], cache_key: Optional[str] = None, **params):
         """Cache item of any type."""
-        cache_key = self.generate_cache_key(cache_type, guild_id, maps, **params)
-        cache_dir, cache_location = self._get_cache_location(guild_id, maps)
-        cache_file = cache_dir / f"{cache_key}.png"
+        cache_key, cache_dir, cache_location = self._resolve(cache_type, guild_id, maps, cache_key, **params)
+        cache_file = cache_dir / f"{cache_key}{self._encoded_suffix(cache_type)}"
         
         try:
             if cache_type in ["base_map", "closeup_base_map"] and isinstance(item, Image.Image):
                 # Store in memory
                 await self.memory_cache.set(cache_key, item)
                 # Store on disk
-                item.save(cache_file, 'PNG', optimize=True)
+                await self._store_base_map(cache_dir, cache_key, item)
             elif isinstance(item, BytesIO):
-                # Store on disk
-                item.seek(0)
-                with open(cache_file, 'wb') as f:
-                    f.write(item.read())
+                # Store on disk, unless a concurrent render already did
+                image_data = item.getvalue()
+                async with self._write_lock(cache_key):
+                    if cache_file.name not in self._index(cache_dir):
+                        await asyncio.to_thread(cache_file.write_bytes, image_data)
+                        self._index(cache_dir).add(cache_file.name)
+                if cache_type == "closeup":
+                    self._remember_bytes(cache_key, image_data)
             
             self.log.info(f"Cached {cache_type} for guild {guild_id} in {cache_location}")
         except Exception as e:
@@ -226,86 +485,39 @@ class UnifiedCacheManager:
     
     async def invalidate_cache(self, guild_id: str, cache_types: Optional[list] = None):
         """Invalidate specific cache types for a guild - PRESERVES default base maps."""
+        self.forget_settings_hashes(guild_id)
         if cache_types is None:
             cache_types = ["base_map", "final_map", "closeup", "closeup_base_map"]
         
+        guild_cache_dir = self.data_dir / guild_id
         deleted_count = 0
         
-        # Only remove CUSTOM base maps from guild cache, NOT shared default cache
+        # Only remove CUSTOM base maps from guild cache, NOT shared default cache.
+        # Their in-memory copies go first, while the index still knows their keys
+        base_prefixes = tuple(f"{cache_type}_" for cache_type in ("base_map", "closeup_base_map") if cache_type in cache_types)
+        if base_prefixes:
+            evicted = await self._evict_memory(guild_cache_dir, base_prefixes)
+            self.log.debug("Evicted %d custom base map(s) of guild %s from memory cache", evicted, guild_id)
         if "base_map" in cache_types:
-            # Remove from guild cache only (custom base maps)
-            guild_cache_dir = self.data_dir / guild_id
-            if guild_cache_dir.exists():
-                for cache_file in guild_cache_dir.glob("base_map_*.png"):
-                    cache_file.unlink()
-                    deleted_count += 1
-                    self.log.info(f"Removed custom base map cache file: {cache_file.name}")
-            
-            # Clear memory cache for base maps (affects both custom and default)
-            await self.memory_cache.clear()
-            self.log.info("Cleared base map memory cache")
-
-        # Remove closeup base maps when requested (preserve default ones)
+            deleted_count += await self._purge(guild_cache_dir, "base_map_", "custom base map")
         if "closeup_base_map" in cache_types:
-            # Remove from guild cache only (custom closeup base maps)
-            guild_cache_dir = self.data_dir / guild_id
-            if guild_cache_dir.exists():
-                for cache_file in guild_cache_dir.glob("closeup_base_map_*.png"):
-                    cache_file.unlink()
-                    deleted_count += 1
-                    self.log.info(f"Removed custom closeup base map cache file: {cache_file.name}")
-            
-            # Clear memory cache for closeup base maps too
-            await self.memory_cache.clear()
-            self.log.info("Cleared closeup base map memory cache")
-        
-        # Remove final maps from both shared and guild cache
-        if "final_map" in cache_types:
-            for cache_file in self.cache_dir.glob("final_map_*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed shared final map cache file: {cache_file.name}")
-            
-            guild_cache_dir = self.data_dir / guild_id
-            if guild_cache_dir.exists():
-                for cache_file in guild_cache_dir.glob("final_map_*.png"):
-                    cache_file.unlink()
-                    deleted_count += 1
-                    self.log.info(f"Removed guild final map cache file: {cache_file.name}")
-        
-        # Remove closeups from both shared and guild cache
-        if "closeup" in cache_types:
-            for cache_file in self.cache_dir.glob("closeup_*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed shared closeup cache file: {cache_file.name}")
-            
-            guild_cache_dir = self.data_dir / guild_id
-            if guild_cache_dir.exists():
-                for cache_file in guild_cache_dir.glob("closeup_*.png"):
-                    cache_file.unlink()
-                    deleted_count += 1
-                    self.log.info(f"Removed guild closeup cache file: {cache_file.name}")
+            deleted_count += await self._purge(guild_cache_dir, "closeup_base_map_", "custom closeup base map")
+        
+        # Remove final maps and closeups from both shared and guild cache
+        for cache_type in ("final_map", "closeup"):
+            if cache_type in cache_types:
+                deleted_count += await self._purge(self.cache_dir, f"{cache_type}_", f"shared {cache_type}")
+                deleted_count += await self._purge(guild_cache_dir, f"{cache_type}_", f"guild {cache_type}")
         
         self.log.info(f"Invalidated {cache_types} cache for guild {guild_id} ({deleted_count} files removed) - PRESERVED default base maps")
         
     async def invalidate_all_cache_for_guild_deletion(self, guild_id: str):
         """Complete cache invalidation when a guild map is deleted - removes everything."""
-        deleted_count = 0
+        self.forget_settings_hashes(guild_id)
         
-        # Remove ALL base maps (both shared and guild)
-        for cache_file in self.cache_dir.glob("base_map_*.png"):
-            cache_file.unlink()
-            deleted_count += 1
-            self.log.info(f"Removed shared base map cache file: {cache_file.name}")
-        
-        # Remove from guild cache completely
-        guild_cache_dir = self.data_dir / guild_id
-        if guild_cache_dir.exists():
-            for cache_file in guild_cache_dir.glob("*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed guild cache file: {cache_file.name}")
+        # Remove ALL base maps from the shared cache and everything from the guild cache
+        deleted_count = await self._purge(self.cache_dir, "base_map_", "shared base map")
+        deleted_count += await self._purge(self.data_dir / guild_id, label="guild cache")
         
         # Clear memory cache
         await self.memory_cache.clear()
@@ -315,40 +527,28 @@ class UnifiedCacheManager:
     
     async def invalidate_all_png_files_for_settings_change(self, guild_id: str):
         """Radical cleanup: remove ALL PNG files for a guild when settings are saved."""
-        deleted_count = 0
-        
-        # Remove ALL PNG files from guild cache
+        self.forget_settings_hashes(guild_id)
         guild_cache_dir = self.data_dir / guild_id
-        if guild_cache_dir.exists():
-            for cache_file in guild_cache_dir.glob("*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed guild PNG file: {cache_file.name}")
         
-        # Clear memory cache to ensure no stale references
-        await self.memory_cache.clear()
-        self.log.info("Cleared all in-memory cache")
+        # Drop this guild's base maps from memory so no stale references remain
+        evicted = await self._evict_memory(guild_cache_dir, ("base_map_", "closeup_base_map_"))
+        self.log.debug("Evicted %d custom base map(s) of guild %s from memory cache", evicted, guild_id)
+        
+        deleted_count = await self._purge(guild_cache_dir, label="guild cache")
         
         self.log.info(f"Complete PNG cleanup for guild {guild_id} settings change ({deleted_count} files removed)")
     
     async def clear_all_cache(self) -> int:
         """Clear all cached items."""
         await self.memory_cache.clear()
-        deleted_count = 0
         
         # Clear shared cache
-        cache_files = list(self.cache_dir.glob("*.png"))
-        for cache_file in cache_files:
-            cache_file.unlink()
-            deleted_count += 1
+        deleted_count = await self._purge(self.cache_dir, label="shared cache")
         
         # Clear guild-specific caches
         for guild_dir in self.data_dir.iterdir():
             if guild_dir.is_dir() and guild_dir.name.isdigit():
-                guild_cache_files = list(guild_dir.glob("*.png"))
-                for cache_file in guild_cache_files:
-                    cache_file.unlink()
-                    deleted_count += 1
+                deleted_count += await self._purge(guild_dir, label="guild cache")
         
         return deleted_count
 
@@ -356,6 +556,11 @@ class UnifiedCacheManager:
 class MapStorage:
     """Handles data persistence and caching for maps."""
     
+    LOAD_WORKERS = 8
+    
+    # Suffix counter for temporary map.json files, unique within this process
+    _tmp_counter = itertools.count()
+    
     def __init__(self, data_dir: Path, cache_dir: Path, logger):
         self.data_dir = data_dir
         self.cache_dir = cache_dir
@@ -368,6 +573,12 @@ class MapStorage:
         # Global overview config file
         self.global_config_file = self.data_dir / "map_global_config.json"
         
+        # Digest of the last map.json written per guild, to skip rewriting unchanged data
+        self._last_saved_hash: Dict[str, bytes] = {}
+        
+        # One lock per guild, so its saves and deletes hit the disk in call order
+        self._save_locks: Dict[str, asyncio.Lock] = {}
+        
         # Unified cache manager
         self.cache = UnifiedCacheManager(data_dir, cache_dir, logger)
         
@@ -378,52 +589,82 @@ class MapStorage:
         """Load all guild map data from individual files."""
         maps = {}
         try:
-            for guild_dir in self.data_dir.iterdir():
-                if guild_dir.is_dir() and guild_dir.name.isdigit():
-                    guild_id = guild_dir.name
-                    map_file = guild_dir / "map.json"
-                    if map_file.exists():
-                        try:
-                            with map_file.open('r', encoding='utf-8') as f:
-                                maps[guild_id] = json.load(f)
-                                # Log loaded settings for debugging
-                                if 'settings' in maps[guild_id]:
-                                    self.log.info(f"Loaded custom settings for guild {guild_id}: {maps[guild_id]['settings']}")
-                        except Exception as e:
-                            self.log.error(f"Failed to load map data for guild {guild_id}: {e}")
+            with os.scandir(self.data_dir) as entries:
+                guild_ids = [entry.name for entry in entries if entry.is_dir() and entry.name.isdigit()]
+            
+            # Guild files are independent, so read and parse them in parallel
+            with ThreadPoolExecutor(max_workers=self.LOAD_WORKERS) as executor:
+                results = executor.map(self._load_guild_file, guild_ids)
+                for guild_id, data in zip(guild_ids, results):
+                    if data is None:
+                        continue
+                    maps[guild_id] = data
+                    # Log loaded settings for debugging
+                    if 'settings' in data:
+                        self.log.info(f"Loaded custom settings for guild {guild_id}: {data['settings']}")
         except Exception as e:
             self.log.error(f"Failed to load map data: {e}")
         
         return maps
 
+    def _load_guild_file(self, guild_id: str) -> Optional[Dict]:
+        """Read the map.json of a guild, None if it has none or it is unreadable."""
+        try:
+            return _read_json(self.data_dir / guild_id / "map.json")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.log.error(f"Failed to load map data for guild {guild_id}: {e}")
+            return None
+
     async def save_data(self, guild_id: str, maps: Dict):
         """Save map data for specific guild."""
+        # Settings may have been edited in place, so hashes derived from them are stale
+        self.cache.forget_settings_hashes(guild_id)
+        lock = self._save_locks.setdefault(guild_id, asyncio.Lock())
         try:
-            guild_dir = self.data_dir / guild_id
-            guild_dir.mkdir(exist_ok=True)
-            
-            map_file = guild_dir / "map.json"
-            
-            if guild_id in maps:
-                # Create backup if exists
-                if map_file.exists():
-                    backup_file = guild_dir / "map.json.bak"
-                    map_file.replace(backup_file)
+            async with lock:
+                guild_dir = self.data_dir / guild_id
+                guild_dir.mkdir(exist_ok=True)
+                
+                map_file = guild_dir / "map.json"
                 
-                with map_file.open('w', encoding='utf-8') as f:
-                    json.dump(maps[guild_id], f, indent=2, ensure_ascii=False)
+                # Serialize under the lock, so the last save to run writes the newest state
+                if guild_id in maps:
+                    data = _dump_json(maps[guild_id])
+                    digest = hashlib.blake2b(data, digest_size=16).digest()
+                    if self._last_saved_hash.get(guild_id) == digest:
+                        return
                     
-                # Log saved settings for debugging
-                if 'settings' in maps[guild_id]:
-                    self.log.info(f"Saved custom settings for guild {guild_id}: {maps[guild_id]['settings']}")
-            else:
-                # Remove file if guild data was deleted
-                if map_file.exists():
-                    map_file.unlink()
+                    await asyncio.to_thread(self._write_guild_file, map_file, data)
+                    self._last_saved_hash[guild_id] = digest
+                        
+                    # Log saved settings for debugging
+                    if 'settings' in maps[guild_id]:
+                        self.log.info(f"Saved custom settings for guild {guild_id}: {maps[guild_id]['settings']}")
+                else:
+                    # Remove file if guild data was deleted
+                    self._last_saved_hash.pop(guild_id, None)
+                    if map_file.exists():
+                        map_file.unlink()
                     
         except Exception as e:
             self.log.error(f"Failed to save map data for guild {guild_id}: {e}")
 
+    @classmethod
+    def _write_guild_file(cls, map_file: Path, data: bytes):
+        """Back up the current map.json, then swap in the new content atomically."""
+        if map_file.exists():
+            shutil.copyfile(map_file, map_file.with_name("map.json.bak"))
+        
+        tmp_file = map_file.with_name(f"map.json.{os.getpid()}.{next(cls._tmp_counter)}.tmp")
+        try:
+            tmp_file.write_bytes(data)
+            os.replace(tmp_file, map_file)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
     def load_global_config(self) -> Dict:
         """Load global overview configuration."""
         try:
@@ -443,13 +684,18 @@ class MapStorage:
             self.log.error(f"Failed to save global config: {e}")
 
     # OPTIMIZED cache interface methods
-    async def get_cached_base_map(self, region: str, width: int, height: int, guild_id: str = None, maps: Dict = None) -> Optional[Image.Image]:
-        """Get cached base map with improved key generation."""
+    def base_map_cache_key(self, region: str, width: int, height: int, guild_id: str, maps: Dict) -> str:
+        """Cache key of a base map, to look it up and store it without hashing the settings twice."""
+        return self.cache.generate_base_map_cache_key(guild_id, maps, region, width, height)
+
+    async def get_cached_base_map(self, region: str, width: int, height: int, guild_id: str = None, maps: Dict = None, cache_key: Optional[str] = None) -> Optional[Image.Image]:
+        """Get cached base map with improved key generation. The image is shared, copy it before drawing."""
         if not guild_id or not maps:
             return None
         
         # Use specialized base map cache key
-        cache_key = self.cache.generate_base_map_cache_key(guild_id, maps, region, width, height)
+        if cache_key is None:
+            cache_key = self.base_map_cache_key(region, width, height, guild_id, maps)
         
         # Check memory cache
         cached_image = await self.cache.memory_cache.get(cache_key)
@@ -459,33 +705,35 @@ class MapStorage:
         
         # Check disk cache
         cache_dir, cache_location = self.cache._get_cache_location(guild_id, maps)
-        cache_file = cache_dir / f"{cache_key}.png"
+        cache_file = self.cache._base_map_file(cache_dir, cache_key)
         
-        if cache_file.exists():
+        if cache_file is not None:
             try:
-                image = Image.open(cache_file)
+                image = await self.cache._load_base_map(cache_file)
                 # Store in memory cache too
                 await self.cache.memory_cache.set(cache_key, image)
                 self.log.info(f"Using disk cached base map for guild {guild_id} from {cache_location}")
-                return image.copy()
+                return image
+            except FileNotFoundError:
+                pass
             except Exception as e:
                 self.log.warning(f"Error loading cached base map: {e}")
         
         self.log.info(f"No cached base map found for guild {guild_id}")
         return None
 
-    async def cache_base_map(self, region: str, width: int, height: int, image: Image.Image, guild_id: str = None, maps: Dict = None):
+    async def cache_base_map(self, region: str, width: int, height: int, image: Image.Image, guild_id: str = None, maps: Dict = None, cache_key: Optional[str] = None):
         """Cache base map with improved key generation."""
         if guild_id and maps:
-            cache_key = self.cache.generate_base_map_cache_key(guild_id, maps, region, width, height)
+            if cache_key is None:
+                cache_key = self.base_map_cache_key(region, width, height, guild_id, maps)
             cache_dir, cache_location = self.cache._get_cache_location(guild_id, maps)
-            cache_file = cache_dir / f"{cache_key}.png"
             
             try:
                 # Store in memory
                 await self.cache.memory_cache.set(cache_key, image)
                 # Store on disk
-                image.save(cache_file, 'PNG', optimize=True)
+                await self.cache._store_base_map(cache_dir, cache_key, image)
                 self.log.info(f"Cached base map for guild {guild_id} in {cache_location}")
             except Exception as e:
                 self.log.warning(f"Error caching base map: {e}")
@@ -502,6 +750,10 @@ class MapStorage:
         region = map_data.get('region', 'world')
         await self.cache.cache_item("final_map", str(guild_id), maps, image_buffer, region=region)
 
+    def closeup_cache_key(self, guild_id: int, maps: Dict, closeup_type: str, closeup_name: str) -> str:
+        """Cache key of a closeup, it changes whenever the guild's pins or settings do."""
+        return self.cache.generate_cache_key("closeup", str(guild_id), maps, closeup_type=closeup_type, closeup_name=closeup_name)
+
     async def get_cached_closeup(self, guild_id: int, maps: Dict, closeup_type: str, closeup_name: str) -> Optional[BytesIO]:
         """Get cached closeup map if available."""
         return await self.cache.get_cached_item("closeup", str(guild_id), maps, closeup_type=closeup_type, closeup_name=closeup_name)
@@ -510,9 +762,9 @@ class MapStorage:
         """Cache closeup map image."""
         await self.cache.cache_item("closeup", str(guild_id), maps, image_buffer, closeup_type=closeup_type, closeup_name=closeup_name)
 
-    async def get_cached_closeup_base_map(self, guild_id: int, maps: Dict, closeup_type: str, closeup_name: str, width: int, height: int) -> Optional[Image.Image]:
-        """Get cached closeup base map if available."""
-        return await self.cache.get_cached_item("closeup_base_map", str(guild_id), maps, 
+    async def get_cached_closeup_base_map(self, guild_id: int, maps: Dict, closeup_type: str, closeup_name: str, width: int, height: int, lazy: bool = False) -> Optional[Union[Image.Image, CachedBitmap]]:
+        """Get cached closeup base map if available. The image is shared, copy it before drawing."""
+        return await self.cache.get_cached_item("closeup_base_map", str(guild_id), maps, lazy=lazy,
                                                closeup_type=closeup_type, closeup_name=closeup_name, 
                                                width=width, height=height)
 
@@ -524,22 +776,9 @@ class MapStorage:
 
     async def invalidate_final_map_cache_only(self, guild_id: int):
         """Invalidate only final map cache, preserve base maps for efficiency - IMPROVED targeting."""
-        guild_id_str = str(guild_id)
-        deleted_count = 0
-        
-        # Remove from shared cache - target final_map files specifically
-        for cache_file in self.cache_dir.glob("final_map_*.png"):
-            cache_file.unlink()
-            deleted_count += 1
-            self.log.info(f"Removed shared final map cache file: {cache_file.name}")
-        
-        # Remove from guild cache - target final_map files specifically
-        guild_cache_dir = self.data_dir / guild_id_str
-        if guild_cache_dir.exists():
-            for cache_file in guild_cache_dir.glob("final_map_*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed guild final map cache file: {cache_file.name}")
+        # Target final_map files specifically in both shared and guild cache
+        deleted_count = await self.cache._purge(self.cache_dir, "final_map_", "shared final map")
+        deleted_count += await self.cache._purge(self.data_dir / str(guild_id), "final_map_", "guild final map")
         
         # Do NOT clear memory cache - preserve base maps
         self.log.info(f"Invalidated final map cache for guild {guild_id} ({deleted_count} files removed) - preserved base maps")
@@ -547,25 +786,15 @@ class MapStorage:
     async def invalidate_base_map_cache_only(self, guild_id: int):
         """Invalidate base map cache when visual settings change - ONLY custom base maps and closeup base maps."""
         guild_id_str = str(guild_id)
-        deleted_count = 0
+        self.cache.forget_settings_hashes(guild_id_str)
         
-        # Only remove CUSTOM base maps from guild cache, preserve shared default cache
+        # Only remove CUSTOM base maps from guild cache, preserve shared default cache.
+        # Closeup base maps go too since they are affected by color changes
         guild_cache_dir = self.data_dir / guild_id_str
-        if guild_cache_dir.exists():
-            for cache_file in guild_cache_dir.glob("base_map_*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed custom base map cache file: {cache_file.name}")
-            
-            # Also remove closeup base maps since they are affected by color changes
-            for cache_file in guild_cache_dir.glob("closeup_base_map_*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Removed custom closeup base map cache file: {cache_file.name}")
-        
-        # Clear memory cache for base maps (affects both custom and default)
-        await self.cache.memory_cache.clear()
-        self.log.info("Cleared base map memory cache")
+        evicted = await self.cache._evict_memory(guild_cache_dir, ("base_map_", "closeup_base_map_"))
+        self.log.debug("Evicted %d custom base map(s) of guild %s from memory cache", evicted, guild_id)
+        deleted_count = await self.cache._purge(guild_cache_dir, "base_map_", "custom base map")
+        deleted_count += await self.cache._purge(guild_cache_dir, "closeup_base_map_", "custom closeup base map")
         
         self.log.info(f"Invalidated custom base map cache for guild {guild_id} ({deleted_count} files removed) - PRESERVED shared default base maps")
     
@@ -576,27 +805,12 @@ class MapStorage:
         
     async def admin_clear_cache(self, guild_id: int):
         """Admin-triggered cache clear - removes CUSTOM base maps only, preserves defaults.""" 
-        guild_id_str = str(guild_id)
-        deleted_count = 0
-        
         # Remove ALL cache from guild directory (custom base maps, closeup base maps, final maps, closeups)
-        guild_cache_dir = self.data_dir / guild_id_str
-        if guild_cache_dir.exists():
-            for cache_file in guild_cache_dir.glob("*.png"):
-                cache_file.unlink()
-                deleted_count += 1
-                self.log.info(f"Admin cleared guild cache file: {cache_file.name}")
+        deleted_count = await self.cache._purge(self.data_dir / str(guild_id), label="guild cache")
         
         # Remove final maps and closeups from shared cache (but NOT default base maps)
-        for cache_file in self.cache_dir.glob("final_map_*.png"):
-            cache_file.unlink()
-            deleted_count += 1
-            self.log.info(f"Admin cleared shared final map: {cache_file.name}")
-            
-        for cache_file in self.cache_dir.glob("closeup_*.png"):
-            cache_file.unlink()
-            deleted_count += 1
-            self.log.info(f"Admin cleared shared closeup: {cache_file.name}")
+        deleted_count += await self.cache._purge(self.cache_dir, "final_map_", "shared final map")
+        deleted_count += await self.cache._purge(self.cache_dir, "closeup_", "shared closeup")
         
         # Clear memory cache (affects all base maps including default and closeup base maps)
         await self.cache.memory_cache.clear()
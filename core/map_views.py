@@ -1,16 +1,219 @@
 """User Views for Discord Map Bot."""
 
+import time
+import functools
 import discord
-from datetime import datetime
-from typing import TYPE_CHECKING, Dict, Optional
+from typing import TYPE_CHECKING, Dict, Literal, Optional, Tuple
 from io import BytesIO
 
 if TYPE_CHECKING:
     from cogs.map import MapV2Cog
+    from .map_views_admin import AdminToolsView
+    from .map_improved_modals import ProximityModal
+
+from .map_progress_handler import create_closeup_progress_callback, finish_progress
+
+# Static embeds, never mutated after creation so every callback can send the same object
+_ERR_NO_MAP = discord.Embed(title="⛔ Error", description="No map exists for this server.", color=0xff4444)
+_ERR_CLOSEUP_NOT_AVAILABLE = discord.Embed(title="⛔ Not Available", description="Region close-up is not available for this map type.", color=0xff4444)
+_ERR_PROXIMITY_DISABLED = discord.Embed(title="⛔ Not Available", description="Proximity search is disabled for this map.", color=0xff4444)
+_ERR_NO_PIN_FOR_PROXIMITY = discord.Embed(title="⛔ No Pin Found", description="You need to pin your location first to search for nearby members!", color=0xff4444)
+_ERR_NO_MAP_FOR_PIN = discord.Embed(title="⛔ Error", description="No map for this server.", color=0xff4444)
+_ERR_NO_PIN_TO_REMOVE = discord.Embed(title="⛔ Error", description="You don't have a pin on the map.", color=0xff4444)
+_REMOVING_PIN_EMBED = discord.Embed(title="🗺️ Updating Map", description="Removing pin and rendering updated map...", color=0x7289da)
+_ADMIN_TOOLS_EMBED = discord.Embed(title="⚙️ Admin Tools", description="Administrative tools for managing this server's map.", color=0x7289da)
+
+# European countries ordered by population (25 most populous)
+_EU_COUNTRIES = (
+    ("🇷🇺", "Russia", "russia"),  # 144M
+    ("🇩🇪", "Germany", "germany"),  # 84M  
+    ("🇬🇧", "United Kingdom", "unitedkingdom"),  # 67M
+    ("🇫🇷", "France", "france"),  # 68M
+    ("🇮🇹", "Italy", "italy"),  # 60M
+    ("🇪🇸", "Spain", "spain"),  # 47M
+    ("🇺🇦", "Ukraine", "ukraine"),  # 44M
+    ("🇵🇱", "Poland", "poland"),  # 38M
+    ("🇷🇴", "Romania", "romania"),  # 19M
+    ("🇳🇱", "Netherlands", "netherlands"),  # 17M
+    ("🇧🇪", "Belgium", "belgium"),  # 11M
+    ("🇬🇷", "Greece", "greece"),  # 11M
+    ("🇨🇿", "Czech Republic", "czech"),  # 11M
+    ("🇵🇹", "Portugal", "portugal"),  # 10M
+    ("🇸🇪", "Sweden", "sweden"),  # 10M
+    ("🇭🇺", "Hungary", "hungary"),  # 10M
+    ("🇦🇹", "Austria", "austria"),  # 9M
+    ("🇧🇬", "Bulgaria", "bulgaria"),  # 7M
+    ("🇨🇭", "Switzerland", "switzerland"),  # 9M
+    ("🇸🇰", "Slovakia", "slovakia"),  # 5M
+    ("🇳🇴", "Norway", "norway"),  # 5M
+    ("🇫🇮", "Finland", "finland"),  # 5M
+    ("🇮🇪", "Ireland", "ireland"),  # 5M
+    ("🇭🇷", "Croatia", "croatia"),  # 4M
+    ("🇸🇮", "Slovenia", "slovenia"),  # 2M
+)
+
+# Asian countries we have configs for so far
+_ASIAN_COUNTRIES = (
+    ("🇯🇵", "Japan", "japan"), 
+    ("🇰🇷", "South Korea", "southkorea"),
+    ("🇷🇺", "Russia", "russia"),
+    ("🇹🇷", "Turkey", "turkey"),
+)
+
+# North American countries with their flags (by population)
+_NA_COUNTRIES = (
+    ("🇺🇸", "United States", "usmainland"), 
+    ("🇲🇽", "Mexico", "mexico"),
+    ("🇨🇦", "Canada", "canada"),
+)
+
+# South American countries with their flags (by population)  
+_SA_COUNTRIES = (
+    ("🇧🇷", "Brazil", "brazil"),
+    # Add more South American countries here when we have configs for them
+)
+
+# Map regions that offer the close-up button
+_SUPPORTED_REGIONS = frozenset({
+    "world", "germany", "europe", "asia", "northamerica", "southamerica", "france", "spain",
+    "italy", "poland", "netherlands", "belgium", "austria", "czech", "hungary", "portugal",
+    "greece", "sweden", "norway", "denmark", "finland", "romania", "bulgaria", "croatia",
+    "slovenia", "slovakia", "ireland", "lithuania", "latvia", "estonia", "luxembourg", "malta",
+    "cyprus", "switzerland", "ukraine", "russia", "turkey", "japan", "southkorea", "brazil",
+    "canada", "mexico"
+})
+
+# Map regions grouped by the country picker their close-up button opens
+_EUROPEAN_COUNTRY_REGIONS = frozenset({
+    "france", "spain", "italy", "poland", "netherlands", "belgium", "austria", "czech", "hungary",
+    "portugal", "greece", "sweden", "norway", "denmark", "finland", "romania", "bulgaria", "croatia",
+    "slovenia", "slovakia", "ireland", "lithuania", "latvia", "estonia", "luxembourg", "malta",
+    "cyprus", "switzerland", "ukraine"
+})
+_ASIAN_REGIONS = frozenset({"asia", "japan", "southkorea", "russia", "turkey"})
+_NORTH_AMERICAN_REGIONS = frozenset({"northamerica", "canada", "mexico", "usmainland"})
+_SOUTH_AMERICAN_REGIONS = frozenset({"southamerica", "brazil"})
+
+
+def __getattr__(name: str):
+    """Load the admin views and the proximity modal on first use, the selection flow never needs them."""
+    if name == "AdminToolsView":
+        from .map_views_admin import AdminToolsView
+        globals()[name] = AdminToolsView
+        return AdminToolsView
+    if name == "ProximityModal":
+        from .map_improved_modals import ProximityModal
+        globals()[name] = ProximityModal
+        return ProximityModal
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def _get_region_closeup(cog: 'MapV2Cog', guild_id: int, closeup_type: str, region: str,
+                              progress_callback) -> Optional[BytesIO]:
+    """Continent or country close-up from the closeup cache, rendered and cached on a miss."""
+    # Closeup cache keys include the pin and settings hashes, so pin changes never hit a stale image
+    cached_closeup = await cog.storage.get_cached_closeup(guild_id, cog.maps, closeup_type, region)
+    if cached_closeup:
+        return cached_closeup
+    
+    async def render():
+        async with cog._render_slot(progress_callback):
+            image = await cog._generate_continent_closeup(guild_id, region, progress_callback)
+        if image:
+            await cog.storage.cache_closeup(guild_id, cog.maps, closeup_type, region, image)
+            image.seek(0)
+        return image
+    
+    # A second click on the same close-up while it renders waits for that render instead of starting another
+    key = (guild_id, cog.storage.closeup_cache_key(guild_id, cog.maps, closeup_type, region))
+    return await cog._coalesced_render(key, render)
+
+
+# Loading title, what is being generated, and the caption of the finished image, per close-up kind
+_CLOSEUP_TEXTS = {
+    "continent": ("Generating Close-up", "the continent close-up view", "Close-up view of {name}"),
+    "country": ("Generating Country Map", "the {name} map", "{name} Map"),
+    "state": ("Generating Close-up", "the {name} close-up view", "Close-up view of {name}"),
+}
+
 
-# Import admin views and proximity modal
-from .map_views_admin import AdminToolsView
-from .map_improved_modals import ProximityModal
+async def _render_region(cog: 'MapV2Cog', interaction: discord.Interaction, guild_id: int,
+                         region: str, display_name: str, kind: Literal["continent", "country", "state"], icon: str):
+    """Show a loading message, then replace it with the close-up or an error."""
+    title, subject, caption = _CLOSEUP_TEXTS[kind]
+    subject = subject.format(name=display_name)
+    content = f"{icon} **{caption.format(name=display_name)}**"
+    
+    # Acknowledge first, the cache lookup hashes the settings and may read from disk
+    await interaction.response.defer()
+    
+    # A cached close-up replaces the picker in a single edit, without a loading message
+    cached_closeup = await cog.storage.get_cached_closeup(guild_id, cog.maps, kind, region)
+    if cached_closeup:
+        await interaction.edit_original_response(
+            content=content,
+            embed=None,
+            attachments=[discord.File(cached_closeup, filename=f"{kind}_{region}_{time.time_ns()}.webp")],
+            view=None
+        )
+        return
+    
+    # Show a loading message while rendering, replace both content and embed, clear view
+    loading_embed = discord.Embed(
+        title=f"{icon} {title}",
+        description=f"Just a moment, I'm generating {subject}...",
+        color=0x7289da
+    )
+    await interaction.edit_original_response(
+        content=None,  # Clear the selection text
+        embed=loading_embed,
+        view=None
+    )
+    
+    try:
+        progress_callback = await create_closeup_progress_callback(interaction, display_name, cog.log)
+        try:
+            if kind == "state":
+                image = await cog._generate_state_closeup(guild_id, region, progress_callback)
+            else:
+                image = await _get_region_closeup(cog, guild_id, kind, region, progress_callback)
+        finally:
+            # Every edit below is final, a trailing progress edit must not overwrite it
+            await finish_progress(progress_callback)
+        
+        if image:
+            filename = f"{kind}_{region}_{time.time_ns()}.webp"
+            
+            # Replace loading message with the actual image
+            await interaction.edit_original_response(
+                content=content,
+                embed=None,  # Clear the loading embed
+                attachments=[discord.File(image, filename=filename)],
+                view=None
+            )
+        else:
+            error_embed = discord.Embed(
+                title="⛔ Generation Error",
+                description=f"Could not generate map for {display_name}",
+                color=0xff4444
+            )
+            await interaction.edit_original_response(
+                content=None,  # Clear any content
+                embed=error_embed,
+                view=None
+            )
+    except Exception as e:
+        cog.log.error(f"Error generating {kind} map: {e}")
+        error_embed = discord.Embed(
+            title="⛔ Generation Error",
+            description=f"An error occurred while generating {subject}.",
+            color=0xff4444
+        )
+        await interaction.edit_original_response(
+            content=None,  # Clear any content
+            embed=error_embed,
+            view=None
+        )
 
 
 class LocationModal(discord.ui.Modal, title='Pin Location'):
@@ -32,598 +235,247 @@ class LocationModal(discord.ui.Modal, title='Pin Location'):
 
 
 class ContinentSelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
-        super().__init__(timeout=300)
+    """Persistent continent picker, the cog registers one instance that serves every guild.
+    Picker messages carry a stopped instance, so only the registered one dispatches clicks."""
+    
+    def __init__(self, cog: 'MapV2Cog'):
+        super().__init__(timeout=None)
         self.cog = cog
-        self.guild_id = guild_id
-        self.original_interaction = original_interaction
 
-    @discord.ui.button(label="N. America", style=discord.ButtonStyle.secondary, row=0)
+    @discord.ui.button(
+        label="N. America",
+        style=discord.ButtonStyle.secondary,
+        row=0,
+        custom_id="map_continent_north_america"
+    )
     async def north_america(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "northamerica", "North America")
 
-    @discord.ui.button(label="S. America", style=discord.ButtonStyle.secondary, row=0)
+    @discord.ui.button(
+        label="S. America",
+        style=discord.ButtonStyle.secondary,
+        row=0,
+        custom_id="map_continent_south_america"
+    )
     async def south_america(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "southamerica", "South America")
     
-    @discord.ui.button(label="🌎 N. American Countries", style=discord.ButtonStyle.primary, row=3)
+    @discord.ui.button(
+        label="🌎 N. American Countries",
+        style=discord.ButtonStyle.primary,
+        row=3,
+        custom_id="map_continent_north_american_countries"
+    )
     async def north_american_countries(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = NorthAmericanCountrySelectionView(self.cog, self.guild_id, self.original_interaction)
-        await interaction.response.edit_message(
+        view = NorthAmericanCountrySelectionView(self.cog, interaction.guild.id)
+        await interaction.response.defer()
+        await interaction.edit_original_response(
             content="**🌎 Select a North American country for close-up view:**", 
             view=view
         )
     
-    @discord.ui.button(label="🌎 S. American Countries", style=discord.ButtonStyle.primary, row=4)
+    @discord.ui.button(
+        label="🌎 S. American Countries",
+        style=discord.ButtonStyle.primary,
+        row=4,
+        custom_id="map_continent_south_american_countries"
+    )
     async def south_american_countries(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = SouthAmericanCountrySelectionView(self.cog, self.guild_id, self.original_interaction)
-        await interaction.response.edit_message(
+        view = SouthAmericanCountrySelectionView(self.cog, interaction.guild.id)
+        await interaction.response.defer()
+        await interaction.edit_original_response(
             content="**🌎 Select a South American country for close-up view:**", 
             view=view
         )
 
-    @discord.ui.button(label="Europe", style=discord.ButtonStyle.secondary, row=0)
+    @discord.ui.button(
+        label="Europe",
+        style=discord.ButtonStyle.secondary,
+        row=0,
+        custom_id="map_continent_europe"
+    )
     async def europe(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "europe", "Europe")
     
-    @discord.ui.button(label="🇪🇺 EU Countries", style=discord.ButtonStyle.primary, row=2)
+    @discord.ui.button(
+        label="🇪🇺 EU Countries",
+        style=discord.ButtonStyle.primary,
+        row=2,
+        custom_id="map_continent_european_countries"
+    )
     async def european_countries(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = EuropeanCountrySelectionView(self.cog, self.guild_id, self.original_interaction)
-        await interaction.response.edit_message(
+        view = EuropeanCountrySelectionView(self.cog, interaction.guild.id)
+        await interaction.response.defer()
+        await interaction.edit_original_response(
             content="**🇪🇺 Select a European country for close-up view:**", 
             view=view
         )
 
-    @discord.ui.button(label="Africa", style=discord.ButtonStyle.secondary, row=1)
+    @discord.ui.button(
+        label="Africa",
+        style=discord.ButtonStyle.secondary,
+        row=1,
+        custom_id="map_continent_africa"
+    )
     async def africa(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "africa", "Africa")
 
-    @discord.ui.button(label="Asia", style=discord.ButtonStyle.secondary, row=1)
+    @discord.ui.button(
+        label="Asia",
+        style=discord.ButtonStyle.secondary,
+        row=1,
+        custom_id="map_continent_asia"
+    )
     async def asia(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "asia", "Asia")
     
-    @discord.ui.button(label="🌏 Asian Countries", style=discord.ButtonStyle.primary, row=2)
+    @discord.ui.button(
+        label="🌏 Asian Countries",
+        style=discord.ButtonStyle.primary,
+        row=2,
+        custom_id="map_continent_asian_countries"
+    )
     async def asian_countries(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = AsianCountrySelectionView(self.cog, self.guild_id, self.original_interaction)
-        await interaction.response.edit_message(
+        view = AsianCountrySelectionView(self.cog, interaction.guild.id)
+        await interaction.response.defer()
+        await interaction.edit_original_response(
             content="**🌏 Select an Asian country for close-up view:**", 
             view=view
         )
 
-    @discord.ui.button(label="Australia", style=discord.ButtonStyle.secondary, row=1)
+    @discord.ui.button(
+        label="Australia",
+        style=discord.ButtonStyle.secondary,
+        row=1,
+        custom_id="map_continent_australia"
+    )
     async def australia(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._generate_continent(interaction, "australia", "Australia")
 
     async def _generate_continent(self, interaction: discord.Interaction, continent: str, display_name: str):
-        # Show loading message immediately and clear previous content
-        loading_embed = discord.Embed(
-            title="🌍 Generating Close-up",
-            description="Just a moment, I'm generating the continent close-up view...",
-            color=0x7289da
-        )
-        # Replace both content and embed, clear view
-        await interaction.response.edit_message(
-            content=None,  # Clear the selection text
-            embed=loading_embed,
-            view=None
-        )
-        
-        try:
-            # Use centralized progress handler
-            from core.map_progress_handler import create_closeup_progress_callback
-            progress_callback = await create_closeup_progress_callback(interaction, display_name, self.cog.log)
-            
-            continent_image = await self.cog._generate_continent_closeup(self.guild_id, continent, progress_callback)
-            if continent_image:
-                filename = f"continent_{continent}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                # Replace loading message with the actual image
-                await self.original_interaction.edit_original_response(
-                    content=f"🌍 **Close-up view of {display_name}**",
-                    embed=None,  # Clear the loading embed
-                    attachments=[discord.File(continent_image, filename=filename)],
-                    view=None
-                )
-            else:
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description=f"Could not generate map for {display_name}",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,  # Clear any content
-                    embed=error_embed,
-                    view=None
-                )
-        except Exception as e:
-            self.cog.log.error(f"Error generating continent map: {e}")
-            error_embed = discord.Embed(
-                title="⛔ Generation Error",
-                description="An error occurred while generating the continent close-up view.",
-                color=0xff4444
-            )
-            await self.original_interaction.edit_original_response(
-                content=None,  # Clear any content
-                embed=error_embed,
-                view=None
-            )
+        await _render_region(self.cog, interaction, interaction.guild.id,
+                             continent, display_name, "continent", "🌍")
 
 
-class EuropeanCountrySelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
+class _CountrySelectionView(discord.ui.View):
+    """Flag buttons for the countries of one continent, built from a module-level country tuple."""
+    
+    COUNTRIES = ()
+    ROW_WIDTH = 5
+    
+    def __init__(self, cog: 'MapV2Cog', guild_id: int):
         super().__init__(timeout=300)
         self.cog = cog
         self.guild_id = guild_id
-        self.original_interaction = original_interaction
-        
-        # European countries ordered by population (25 most populous)
-        # Using only flag emojis as labels, removing country names
-        countries = [
-            ("🇷🇺", "Russia", "russia"),  # 144M
-            ("🇩🇪", "Germany", "germany"),  # 84M  
-            ("🇬🇧", "United Kingdom", "unitedkingdom"),  # 67M
-            ("🇫🇷", "France", "france"),  # 68M
-            ("🇮🇹", "Italy", "italy"),  # 60M
-            ("🇪🇸", "Spain", "spain"),  # 47M
-            ("🇺🇦", "Ukraine", "ukraine"),  # 44M
-            ("🇵🇱", "Poland", "poland"),  # 38M
-            ("🇷🇴", "Romania", "romania"),  # 19M
-            ("🇳🇱", "Netherlands", "netherlands"),  # 17M
-            ("🇧🇪", "Belgium", "belgium"),  # 11M
-            ("🇬🇷", "Greece", "greece"),  # 11M
-            ("🇨🇿", "Czech Republic", "czech"),  # 11M
-            ("🇵🇹", "Portugal", "portugal"),  # 10M
-            ("🇸🇪", "Sweden", "sweden"),  # 10M
-            ("🇭🇺", "Hungary", "hungary"),  # 10M
-            ("🇦🇹", "Austria", "austria"),  # 9M
-            ("🇧🇬", "Bulgaria", "bulgaria"),  # 7M
-            ("🇨🇭", "Switzerland", "switzerland"),  # 9M
-            ("🇸🇰", "Slovakia", "slovakia"),  # 5M
-            ("🇳🇴", "Norway", "norway"),  # 5M
-            ("🇫🇮", "Finland", "finland"),  # 5M
-            ("🇮🇪", "Ireland", "ireland"),  # 5M
-            ("🇭🇷", "Croatia", "croatia"),  # 4M
-            ("🇸🇮", "Slovenia", "slovenia"),  # 2M
-        ]
         
         # Add buttons (max 25 components per view) - only using flag emojis, no text labels
-        for i, (flag, name, value) in enumerate(countries):
-            if i >= 25:  # Discord limit
-                break
-            row = i // 5  # 5 buttons per row
-            
+        for i, (flag, name, value) in enumerate(self.COUNTRIES[:25]):
             button = discord.ui.Button(
                 label="",  # Empty label, only flag emoji
                 style=discord.ButtonStyle.secondary,
                 emoji=flag,
-                row=row
+                row=i // self.ROW_WIDTH,
+                custom_id=f"country:{value}:{name}"
             )
-            button.callback = self._create_country_callback(value, name)
+            button.callback = self._on_country_click
             self.add_item(button)
 
-    def _create_country_callback(self, country_code: str, country_name: str):
-        async def country_callback(interaction: discord.Interaction):
-            await self._generate_country(interaction, country_code, country_name)
-        return country_callback
+    async def _on_country_click(self, interaction: discord.Interaction):
+        """Shared callback of all flag buttons, the country comes from the button's custom_id."""
+        _, country, display_name = interaction.data["custom_id"].split(":", 2)
+        await self._generate_country(interaction, country, display_name)
 
     async def _generate_country(self, interaction: discord.Interaction, country: str, display_name: str):
-        # Show loading message immediately and clear previous content
-        loading_embed = discord.Embed(
-            title="🗺️ Generating Country Map",
-            description=f"Just a moment, I'm generating the {display_name} map...",
-            color=0x7289da
-        )
-        await interaction.response.edit_message(
-            content=None,
-            embed=loading_embed,
-            view=None
-        )
-        
-        try:
-            # Use centralized progress handler
-            from core.map_progress_handler import create_closeup_progress_callback
-            progress_callback = await create_closeup_progress_callback(interaction, display_name, self.cog.log)
-            
-            country_image = await self.cog._generate_continent_closeup(self.guild_id, country, progress_callback)
-            if country_image:
-                filename = f"country_{country}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                # Replace loading message with the actual image
-                await self.original_interaction.edit_original_response(
-                    content=f"🗺️ **{display_name} Map**",
-                    embed=None,
-                    attachments=[discord.File(country_image, filename=filename)],
-                    view=None
-                )
-            else:
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description=f"Could not generate map for {display_name}",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,
-                    embed=error_embed,
-                    view=None
-                )
-        except Exception as e:
-            self.cog.log.error(f"Error generating country map: {e}")
-            error_embed = discord.Embed(
-                title="⛔ Generation Error",
-                description="An error occurred while generating the country map.",
-                color=0xff4444
-            )
-            await self.original_interaction.edit_original_response(
-                content=None,
-                embed=error_embed,
-                view=None
-            )
+        await _render_region(self.cog, interaction, self.guild_id,
+                             country, display_name, "country", "🗺️")
 
 
-class AsianCountrySelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
-        super().__init__(timeout=300)
-        self.cog = cog
-        self.guild_id = guild_id
-        self.original_interaction = original_interaction
-        
-        # Asian countries ordered by population (most populous in Asia/partial Asia)
-        # Using only flag emojis as labels, removing country names  
-        countries = [
-            ("🇨🇳", "China", "china"),  # 1.4B - need to add
-            ("🇮🇳", "India", "india"),  # 1.4B - need to add  
-            ("🇮🇩", "Indonesia", "indonesia"),  # 275M - need to add
-            ("🇵🇰", "Pakistan", "pakistan"),  # 240M - need to add
-            ("🇧🇩", "Bangladesh", "bangladesh"),  # 170M - need to add
-            ("🇯🇵", "Japan", "japan"),  # 125M
-            ("🇵🇭", "Philippines", "philippines"),  # 115M - need to add
-            ("🇻🇳", "Vietnam", "vietnam"),  # 98M - need to add  
-            ("🇹🇷", "Turkey", "turkey"),  # 85M
-            ("🇮🇷", "Iran", "iran"),  # 85M - need to add
-            ("🇩🇪", "Germany", "germany"),  # 84M (partial coverage in Russia)
-            ("🇹🇭", "Thailand", "thailand"),  # 70M - need to add
-            ("🇰🇷", "South Korea", "southkorea"),  # 52M
-            ("🇲🇾", "Malaysia", "malaysia"),  # 35M - need to add
-            ("🇺🇿", "Uzbekistan", "uzbekistan"),  # 35M - need to add
-            ("🇸🇦", "Saudi Arabia", "saudiarabia"),  # 35M - need to add
-            ("🇮🇶", "Iraq", "iraq"),  # 45M - need to add
-            ("🇦🇫", "Afghanistan", "afghanistan"),  # 40M - need to add
-            ("🇰🇿", "Kazakhstan", "kazakhstan"),  # 20M - need to add
-            ("🇲🇲", "Myanmar", "myanmar"),  # 55M - need to add
-            ("🇱🇰", "Sri Lanka", "srilanka"),  # 22M - need to add
-            ("🇰🇭", "Cambodia", "cambodia"),  # 17M - need to add
-            ("🇯🇴", "Jordan", "jordan"),  # 11M - need to add
-            ("🇦🇿", "Azerbaijan", "azerbaijan"),  # 10M - need to add
-            ("🇹🇯", "Tajikistan", "tajikistan"),  # 10M - need to add
-        ]
-        
-        # For now, only include countries we have configs for
-        available_countries = [
-            ("🇯🇵", "Japan", "japan"), 
-            ("🇰🇷", "South Korea", "southkorea"),
-            ("🇷🇺", "Russia", "russia"),
-            ("🇹🇷", "Turkey", "turkey"),
-        ]
-        
-        for i, (flag, name, value) in enumerate(available_countries):
-            button = discord.ui.Button(
-                label="",  # Empty label, only flag emoji
-                style=discord.ButtonStyle.secondary,
-                emoji=flag,
-                row=0
-            )
-            button.callback = self._create_country_callback(value, name)
-            self.add_item(button)
+class EuropeanCountrySelectionView(_CountrySelectionView):
+    COUNTRIES = _EU_COUNTRIES
 
-    def _create_country_callback(self, country_code: str, country_name: str):
-        async def country_callback(interaction: discord.Interaction):
-            await self._generate_country(interaction, country_code, country_name)
-        return country_callback
 
-    async def _generate_country(self, interaction: discord.Interaction, country: str, display_name: str):
-        loading_embed = discord.Embed(
-            title="🗺️ Generating Country Map",
-            description=f"Just a moment, I'm generating the {display_name} map...",
-            color=0x7289da
-        )
-        await interaction.response.edit_message(
-            content=None,
-            embed=loading_embed,
-            view=None
-        )
-        
-        try:
-            from core.map_progress_handler import create_closeup_progress_callback
-            progress_callback = await create_closeup_progress_callback(interaction, display_name, self.cog.log)
-            
-            country_image = await self.cog._generate_continent_closeup(self.guild_id, country, progress_callback)
-            if country_image:
-                filename = f"country_{country}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                await self.original_interaction.edit_original_response(
-                    content=f"🗺️ **{display_name} Map**",
-                    embed=None,
-                    attachments=[discord.File(country_image, filename=filename)],
-                    view=None
-                )
-            else:
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description=f"Could not generate map for {display_name}",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,
-                    embed=error_embed,
-                    view=None
-                )
-        except Exception as e:
-            self.cog.log.error(f"Error generating country map: {e}")
-            error_embed = discord.Embed(
-                title="⛔ Generation Error",
-                description="An error occurred while generating the country map.",
-                color=0xff4444
-            )
-            await self.original_interaction.edit_original_response(
-                content=None,
-                embed=error_embed,
-                view=None
-            )
+class AsianCountrySelectionView(_CountrySelectionView):
+    COUNTRIES = _ASIAN_COUNTRIES
 
 
-class NorthAmericanCountrySelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
-        super().__init__(timeout=300)
-        self.cog = cog
-        self.guild_id = guild_id
-        self.original_interaction = original_interaction
-        
-        # North American countries with their flags (by population)
-        # Using only flag emojis as labels, removing country names
-        countries = [
-            ("🇺🇸", "United States", "usmainland"), 
-            ("🇲🇽", "Mexico", "mexico"),
-            ("🇨🇦", "Canada", "canada"),
-        ]
-        
-        for i, (flag, name, value) in enumerate(countries):
-            button = discord.ui.Button(
-                label="",  # Empty label, only flag emoji
-                style=discord.ButtonStyle.secondary,
-                emoji=flag,
-                row=0
-            )
-            button.callback = self._create_country_callback(value, name)
-            self.add_item(button)
+class NorthAmericanCountrySelectionView(_CountrySelectionView):
+    COUNTRIES = _NA_COUNTRIES
 
-    def _create_country_callback(self, country_code: str, country_name: str):
-        async def country_callback(interaction: discord.Interaction):
-            await self._generate_country(interaction, country_code, country_name)
-        return country_callback
 
-    async def _generate_country(self, interaction: discord.Interaction, country: str, display_name: str):
-        loading_embed = discord.Embed(
-            title="🗺️ Generating Country Map",
-            description=f"Just a moment, I'm generating the {display_name} map...",
-            color=0x7289da
-        )
-        await interaction.response.edit_message(
-            content=None,
-            embed=loading_embed,
-            view=None
-        )
-        
-        try:
-            from core.map_progress_handler import create_closeup_progress_callback
-            progress_callback = await create_closeup_progress_callback(interaction, display_name, self.cog.log)
-            
-            country_image = await self.cog._generate_continent_closeup(self.guild_id, country, progress_callback)
-            if country_image:
-                filename = f"country_{country}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                await self.original_interaction.edit_original_response(
-                    content=f"🗺️ **{display_name} Map**",
-                    embed=None,
-                    attachments=[discord.File(country_image, filename=filename)],
-                    view=None
-                )
-            else:
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description=f"Could not generate map for {display_name}",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,
-                    embed=error_embed,
-                    view=None
-                )
-        except Exception as e:
-            self.cog.log.error(f"Error generating country map: {e}")
-            error_embed = discord.Embed(
-                title="⛔ Generation Error",
-                description="An error occurred while generating the country map.",
-                color=0xff4444
-            )
-            await self.original_interaction.edit_original_response(
-                content=None,
-                embed=error_embed,
-                view=None
-            )
-
-
-class SouthAmericanCountrySelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
-        super().__init__(timeout=300)
-        self.cog = cog
-        self.guild_id = guild_id
-        self.original_interaction = original_interaction
-        
-        # South American countries with their flags (by population)  
-        # Using only flag emojis as labels, removing country names
-        countries = [
-            ("🇧🇷", "Brazil", "brazil"),
-            # Add more South American countries here when we have configs for them
-        ]
-        
-        for i, (flag, name, value) in enumerate(countries):
-            button = discord.ui.Button(
-                label="",  # Empty label, only flag emoji
-                style=discord.ButtonStyle.secondary,
-                emoji=flag,
-                row=0
-            )
-            button.callback = self._create_country_callback(value, name)
-            self.add_item(button)
-
-    def _create_country_callback(self, country_code: str, country_name: str):
-        async def country_callback(interaction: discord.Interaction):
-            await self._generate_country(interaction, country_code, country_name)
-        return country_callback
-
-    async def _generate_country(self, interaction: discord.Interaction, country: str, display_name: str):
-        loading_embed = discord.Embed(
-            title="🗺️ Generating Country Map",
-            description=f"Just a moment, I'm generating the {display_name} map...",
-            color=0x7289da
-        )
-        await interaction.response.edit_message(
-            content=None,
-            embed=loading_embed,
-            view=None
-        )
-        
-        try:
-            from core.map_progress_handler import create_closeup_progress_callback
-            progress_callback = await create_closeup_progress_callback(interaction, display_name, self.cog.log)
-            
-            country_image = await self.cog._generate_continent_closeup(self.guild_id, country, progress_callback)
-            if country_image:
-                filename = f"country_{country}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                await self.original_interaction.edit_original_response(
-                    content=f"🗺️ **{display_name} Map**",
-                    embed=None,
-                    attachments=[discord.File(country_image, filename=filename)],
-                    view=None
-                )
-            else:
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description=f"Could not generate map for {display_name}",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,
-                    embed=error_embed,
-                    view=None
-                )
-        except Exception as e:
-            self.cog.log.error(f"Error generating country map: {e}")
-            error_embed = discord.Embed(
-                title="⛔ Generation Error",
-                description="An error occurred while generating the country map.",
-                color=0xff4444
-            )
-            await self.original_interaction.edit_original_response(
-                content=None,
-                embed=error_embed,
-                view=None
-            )
+class SouthAmericanCountrySelectionView(_CountrySelectionView):
+    COUNTRIES = _SA_COUNTRIES
 
 
 class StateSelectionView(discord.ui.View):
-    def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
+    def __init__(self, cog: 'MapV2Cog', guild_id: int):
         super().__init__(timeout=300)
         self.cog = cog
         self.guild_id = guild_id
-        self.original_interaction = original_interaction
-        
-        # Get German states from config with actual emojis
-        states_config = self.cog.map_generator.map_config.GERMAN_STATES
         
-        # Add buttons dynamically (5 per row, max 5 rows)
-        for i, (full_name, state_data) in enumerate(states_config.items()):
+        # Add buttons dynamically (4 per row, max 4 rows), labels and emojis are prebuilt on the cog
+        for i, (full_name, (short, emoji)) in enumerate(self.cog._german_state_buttons.items()):
             row = i // 4
             if row >= 4:  # Discord limit
                 break
             
-            # Create button with actual emoji from config
-            emoji_id = state_data.get('emoji_id')
-            # Use the actual emoji format if available
-            emoji = f"<:coat_{state_data['short'].lower()}:{emoji_id}>" if emoji_id else None
-            
             button = discord.ui.Button(
-                label=state_data['short'],
+                label=short,
                 style=discord.ButtonStyle.secondary,
                 emoji=emoji,
-                row=row
+                row=row,
+                custom_id=f"state:{full_name}"
             )
-            button.callback = self._create_state_callback(full_name)
+            button.callback = self._dispatch
             self.add_item(button)
 
-    def _create_state_callback(self, state_name: str):
-        async def state_callback(interaction: discord.Interaction):
-            # Get emoji for the loading message
-            states_config = self.cog.map_generator.map_config.GERMAN_STATES
-            state_data = states_config.get(state_name, {})
-            emoji_id = state_data.get('emoji_id')
-            emoji_str = f"<:coat_{state_data.get('short', 'state').lower()}:{emoji_id}>" if emoji_id else "🏛️"
-            
-            # Show loading message with state emoji and clear previous content
-            loading_embed = discord.Embed(
-                title=f"{emoji_str} Generating Close-up",
-                description=f"Just a moment, I'm generating the {state_name} close-up view...",
-                color=0x7289da
-            )
-            # Replace both content and embed, clear view
-            await interaction.response.edit_message(
-                content=None,  # Clear the selection text
-                embed=loading_embed, 
-                view=None
-            )
-            
-            try:
-                # Use centralized progress handler
-                from core.map_progress_handler import create_closeup_progress_callback
-                update_progress = await create_closeup_progress_callback(interaction, state_name, self.cog.log)
-                
-                state_image = await self.cog._generate_state_closeup(self.guild_id, state_name, update_progress)
-                if state_image:
-                    filename = f"state_{state_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                    
-                    # Replace loading message with the actual image
-                    await self.original_interaction.edit_original_response(
-                        content=f"{emoji_str} **Close-up view of {state_name}**",
-                        embed=None,  # Clear the loading embed
-                        attachments=[discord.File(state_image, filename=filename)],
-                        view=None
-                    )
-                else:
-                    error_embed = discord.Embed(
-                        title="⛔ Generation Error",
-                        description=f"Could not generate map for {state_name}",
-                        color=0xff4444
-                    )
-                    await self.original_interaction.edit_original_response(
-                        content=None,  # Clear any content
-                        embed=error_embed, 
-                        view=None
-                    )
-            except Exception as e:
-                self.cog.log.error(f"Error generating state map: {e}")
-                error_embed = discord.Embed(
-                    title="⛔ Generation Error",
-                    description="An error occurred while generating the close-up view.",
-                    color=0xff4444
-                )
-                await self.original_interaction.edit_original_response(
-                    content=None,  # Clear any content
-                    embed=error_embed, 
-                    view=None
-                )
-        
-        return state_callback
+    async def _dispatch(self, interaction: discord.Interaction):
+        """Shared callback of all state buttons, the state comes from the button's custom_id."""
+        await self._generate_state(interaction, interaction.data["custom_id"].split(":", 1)[1])
+
+    async def _generate_state(self, interaction: discord.Interaction, state_name: str):
+        # Coat of arms emoji of the state for the loading message and caption
+        _, emoji = self.cog._german_state_buttons.get(state_name, (None, None))
+        await _render_region(self.cog, interaction, self.guild_id,
+                             state_name, state_name, "state", emoji or "🏛️")
+
+
+# Close-up picker per map region, as (view factory, prompt)
+_CLOSEUP_PICKERS = {
+    "world": (lambda cog, guild_id: cog.continent_picker, "**🌍 Select a continent for close-up view:**"),
+    "germany": (StateSelectionView, "**🏛️ Select a German state for close-up view:**"),
+    "europe": (EuropeanCountrySelectionView, "**🇪🇺 Select a European country for close-up view:**"),
+    **dict.fromkeys(_ASIAN_REGIONS, (AsianCountrySelectionView, "**🌏 Select an Asian country for close-up view:**")),
+    **dict.fromkeys(_NORTH_AMERICAN_REGIONS,
+                    (NorthAmericanCountrySelectionView, "**🌎 Select a North American country for close-up view:**")),
+    **dict.fromkeys(_SOUTH_AMERICAN_REGIONS,
+                    (SouthAmericanCountrySelectionView, "**🌎 Select a South American country for close-up view:**")),
+    # For individual European countries, show other European countries
+    **dict.fromkeys(_EUROPEAN_COUNTRY_REGIONS,
+                    (EuropeanCountrySelectionView, "**🇪🇺 Select another European country for close-up view:**")),
+}
+
+
+# Menu buttons as (Button keyword arguments, callback name)
+_MENU_BUTTON_SPECS = {
+    "proximity": (dict(label="Nearby", style=discord.ButtonStyle.secondary, emoji="🔍"), "nearby_members"),
+    "closeup": (dict(label="Close-up", style=discord.ButtonStyle.secondary, emoji="🔎"), "region_closeup"),
+    "info": (dict(label="Info", style=discord.ButtonStyle.secondary, emoji="ℹ️"), "map_info"),
+    "admin": (dict(label="Admin Tools", style=discord.ButtonStyle.danger, emoji="⚙️"), "admin_tools"),
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _menu_button_keys(allow_proximity: bool, has_closeup: bool, is_admin: bool) -> Tuple[str, ...]:
+    """Ordered menu buttons for a map: proximity if enabled, close-up for supported regions, info, admin tools."""
+    keys = []
+    if allow_proximity:
+        keys.append("proximity")
+    if has_closeup:
+        keys.append("closeup")
+    keys.append("info")
+    if is_admin:
+        keys.append("admin")
+    return tuple(keys)
 
 
 class MapMenuView(discord.ui.View):
@@ -631,229 +483,108 @@ class MapMenuView(discord.ui.View):
         super().__init__(timeout=300)
         self.cog = cog
         self.guild_id = guild_id
+        self.guild_id_str = str(guild_id)  # Key of this guild in cog.maps
         self.user = user
         
         # Get current map data to determine button visibility
-        map_data = self.cog.maps.get(str(guild_id), {})
+        map_data = self.cog.maps.get(self.guild_id_str, {})
         region = map_data.get('region', 'world')
         allow_proximity = map_data.get('allow_proximity', False)
         
-        # Only add proximity button if enabled
-        if allow_proximity:
-            self._add_proximity_button()
-        
-        # Only add close-up button for supported regions
-        supported_regions = ["world", "germany", "europe", "asia", "northamerica", "southamerica", 
-                           "france", "spain", "italy", "poland", "netherlands", "belgium", "austria", 
-                           "czech", "hungary", "portugal", "greece", "sweden", "norway", "denmark",
-                           "finland", "romania", "bulgaria", "croatia", "slovenia", "slovakia", 
-                           "ireland", "lithuania", "latvia", "estonia", "luxembourg", "malta", 
-                           "cyprus", "switzerland", "ukraine", "russia", "turkey", "japan", 
-                           "southkorea", "brazil", "canada", "mexico"]
-        if region in supported_regions:
-            self._add_closeup_button()
-            
-        # Always add info button
-        self._add_info_button()
-        
-        # Add admin tools button if user has admin permissions
-        if user.guild_permissions.administrator:
-            self._add_admin_tools_button()
-
-    def _add_proximity_button(self):
-        proximity_button = discord.ui.Button(
-            label="Nearby",
-            style=discord.ButtonStyle.secondary,
-            emoji="🔍"
-        )
-        proximity_button.callback = self.nearby_members
-        self.add_item(proximity_button)
-
-    def _add_closeup_button(self):
-        closeup_button = discord.ui.Button(
-            label="Close-up",
-            style=discord.ButtonStyle.secondary,
-            emoji="🔎"
-        )
-        closeup_button.callback = self.region_closeup
-        self.add_item(closeup_button)
-        
-    def _add_info_button(self):
-        info_button = discord.ui.Button(
-            label="Info",
-            style=discord.ButtonStyle.secondary,
-            emoji="ℹ️"
-        )
-        info_button.callback = self.map_info
-        self.add_item(info_button)
-    
-    def _add_admin_tools_button(self):
-        admin_tools_button = discord.ui.Button(
-            label="Admin Tools",
-            style=discord.ButtonStyle.danger,
-            emoji="⚙️"
-        )
-        admin_tools_button.callback = self.admin_tools
-        self.add_item(admin_tools_button)
+        # Button set only depends on these three flags, its layout is computed once per combination
+        for key in _menu_button_keys(bool(allow_proximity), region in _SUPPORTED_REGIONS, user.guild_permissions.administrator):
+            button_kwargs, callback_name = _MENU_BUTTON_SPECS[key]
+            self._add_button(button_kwargs, getattr(self, callback_name))
+
+    def _add_button(self, button_kwargs: Dict, callback):
+        button = discord.ui.Button(**button_kwargs)
+        button.callback = callback
+        self.add_item(button)
 
     async def admin_tools(self, interaction: discord.Interaction):
-        embed = discord.Embed(
-            title="⚙️ Admin Tools",
-            description="Administrative tools for managing this server's map.",
-            color=0x7289da
-        )
+        # Acknowledge first, the admin views are imported on first use
+        await interaction.response.defer()
         
+        from .map_views_admin import AdminToolsView
         view = AdminToolsView(self.cog, self.guild_id)
-        await interaction.response.edit_message(embed=embed, view=view)
+        await interaction.edit_original_response(embed=_ADMIN_TOOLS_EMBED, view=view)
 
     async def map_info(self, interaction: discord.Interaction):
         """Show map information (same functionality as /map_info command)."""
         await interaction.response.defer()
 
-        guild_id = str(self.guild_id)
+        guild_id = self.guild_id_str
         
         if guild_id not in self.cog.maps:
-            embed = discord.Embed(
-                title="⛔ Error",
-                description="No map exists for this server.",
-                color=0xff4444
-            )
-            await interaction.edit_original_response(embed=embed, view=None)
+            await interaction.edit_original_response(embed=_ERR_NO_MAP, view=None)
             return
 
-        map_data = self.cog.maps[guild_id]
-        pins = map_data.get('pins', {})
-        region = map_data['region']
-        channel_id = map_data['channel_id']
-        created_at = map_data.get('created_at', 'Unknown')
-        
-        embed = discord.Embed(
-            title="🗺️ Server Map Information",
-            color=0x7289da,
-            timestamp=datetime.now()
-        )
-        
-        embed.add_field(name="📊 Statistics", value=f"📍 **{len(pins)}** pinned locations", inline=True)
-        embed.add_field(name="🌍 Region", value=region.title(), inline=True)
-        embed.add_field(name="📺 Channel", value=f"<#{channel_id}>", inline=True)
+        info = self.cog._get_map_info(guild_id)
         
-        if created_at != 'Unknown':
-            try:
-                created_date = datetime.fromisoformat(created_at).strftime('%Y-%m-%d')
-                embed.add_field(name="📅 Created", value=created_date, inline=True)
-            except:
-                pass
-
-        user_id = str(interaction.user.id)
-        if user_id in pins:
-            user_pin = pins[user_id]
-            embed.add_field(
-                name="📍 Your Pin", 
-                value=f"**Location:** {user_pin.get('display_name', 'Unknown')}\n"
-                      f"**Added:** {user_pin.get('timestamp', 'Unknown')}", 
-                inline=False
-            )
+        fields = [
+            {"name": "📊 Statistics", "value": f"📍 **{info['pin_count']}** pinned locations", "inline": True},
+            {"name": "🌍 Region", "value": info['region'], "inline": True},
+            {"name": "📺 Channel", "value": info['channel'], "inline": True},
+        ]
+        if info['created_date']:
+            fields.append({"name": "📅 Created", "value": info['created_date'], "inline": True})
+
+        user_pin = self.cog.maps[guild_id].get('pins', {}).get(str(interaction.user.id))
+        if user_pin is not None:
+            fields.append({
+                "name": "📍 Your Pin",
+                "value": f"**Location:** {user_pin.get('display_name', 'Unknown')}\n"
+                         f"**Added:** {user_pin.get('timestamp', 'Unknown')}",
+                "inline": False
+            })
         else:
-            embed.add_field(
-                name="📍 Your Pin", 
-                value="You haven't pinned a location yet.\nUse the 'My Pin' button to add one!", 
-                inline=False
-            )
+            fields.append({
+                "name": "📍 Your Pin",
+                "value": "You haven't pinned a location yet.\nUse the 'My Pin' button to add one!",
+                "inline": False
+            })
+        
+        # Built in its dict form, the same shape discord.py sends
+        embed = discord.Embed.from_dict({
+            "title": "🗺️ Server Map Information",
+            "color": 0x7289da,
+            "timestamp": discord.utils.utcnow().isoformat(),
+            "fields": fields
+        })
 
         await interaction.edit_original_response(embed=embed, view=None)
 
     async def region_closeup(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        
         # Get current map data dynamically
-        map_data = self.cog.maps.get(str(self.guild_id), {})
+        map_data = self.cog.maps.get(self.guild_id_str, {})
         region = map_data.get('region', 'world')
         
-        if region == "world":
-            # Show continent selection buttons
-            view = ContinentSelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🌍 Select a continent for close-up view:**", 
-                view=view
-            )
-        elif region == "germany":
-            # Show state selection buttons
-            view = StateSelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🏛️ Select a German state for close-up view:**", 
-                view=view
-            )
-        elif region == "europe":
-            # Show European country selection buttons
-            view = EuropeanCountrySelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🇪🇺 Select a European country for close-up view:**", 
-                view=view
-            )
-        elif region in ["asia", "japan", "southkorea", "russia", "turkey"]:
-            # Show Asian country selection buttons
-            view = AsianCountrySelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🌏 Select an Asian country for close-up view:**", 
-                view=view
-            )
-        elif region in ["northamerica", "canada", "mexico", "usmainland"]:
-            # Show North American country selection buttons
-            view = NorthAmericanCountrySelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🌎 Select a North American country for close-up view:**", 
-                view=view
-            )
-        elif region in ["southamerica", "brazil"]:
-            # Show South American country selection buttons
-            view = SouthAmericanCountrySelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🌎 Select a South American country for close-up view:**", 
-                view=view
-            )
-        elif region in ["france", "spain", "italy", "poland", "netherlands", "belgium", "austria", 
-                        "czech", "hungary", "portugal", "greece", "sweden", "norway", "denmark",
-                        "finland", "romania", "bulgaria", "croatia", "slovenia", "slovakia", 
-                        "ireland", "lithuania", "latvia", "estonia", "luxembourg", "malta", 
-                        "cyprus", "switzerland", "ukraine"]:
-            # For individual European countries, show other European countries
-            view = EuropeanCountrySelectionView(self.cog, self.guild_id, interaction)
-            await interaction.response.edit_message(
-                content="**🇪🇺 Select another European country for close-up view:**", 
-                view=view
-            )
+        picker = _CLOSEUP_PICKERS.get(region)
+        if picker:
+            make_view, content = picker
+            await interaction.edit_original_response(content=content, view=make_view(self.cog, self.guild_id))
         else:
-            embed = discord.Embed(
-                title="⛔ Not Available",
-                description="Region close-up is not available for this map type.",
-                color=0xff4444
-            )
-            await interaction.response.edit_message(embed=embed, view=None)
+            await interaction.edit_original_response(embed=_ERR_CLOSEUP_NOT_AVAILABLE, view=None)
 
     async def nearby_members(self, interaction: discord.Interaction):
-        # Get current map data dynamically
-        map_data = self.cog.maps.get(str(self.guild_id), {})
+        # Looked up per click, the map may have been replaced or removed since the menu was opened
+        map_data = self.cog.maps.get(self.guild_id_str, {})
         
         # Double-check if proximity is enabled (shouldn't be needed but safety first)
         if not map_data.get('allow_proximity', False):
-            embed = discord.Embed(
-                title="⛔ Not Available",
-                description="Proximity search is disabled for this map.",
-                color=0xff4444
-            )
-            await interaction.response.edit_message(embed=embed, view=None)
+            await interaction.response.edit_message(embed=_ERR_PROXIMITY_DISABLED, view=None)
             return
         
         # Check if user has a pin
-        user_id = str(interaction.user.id)
-        if user_id not in map_data.get('pins', {}):
-            embed = discord.Embed(
-                title="⛔ No Pin Found",
-                description="You need to pin your location first to search for nearby members!",
-                color=0xff4444
-            )
-            await interaction.response.edit_message(embed=embed, view=None)
+        pins = map_data.get('pins')
+        if not pins or str(interaction.user.id) not in pins:
+            await interaction.response.edit_message(embed=_ERR_NO_PIN_FOR_PROXIMITY, view=None)
             return
         
         # Show proximity modal
+        from .map_improved_modals import ProximityModal
         modal = ProximityModal(self.cog, self.guild_id, interaction)
         await interaction.response.send_modal(modal)
 
@@ -878,11 +609,11 @@ class MapPinButtonView(discord.ui.View):
     async def pin_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check if user already has a pin
         guild_id = str(interaction.guild.id)
-        user_id = str(interaction.user.id)
+        guild_map = self.cog.maps.get(guild_id)
+        user_pin = guild_map.get('pins', {}).get(str(interaction.user.id)) if guild_map else None
         
-        if guild_id in self.cog.maps and user_id in self.cog.maps[guild_id].get('pins', {}):
+        if user_pin is not None:
             # User has a pin - show current location and options
-            user_pin = self.cog.maps[guild_id]['pins'][user_id]
             current_location = user_pin.get('display_name', 'Unknown')
             
             embed = discord.Embed(
@@ -915,6 +646,7 @@ class UserPinOptionsView(discord.ui.View):
         super().__init__(timeout=300)
         self.cog = cog
         self.guild_id = guild_id
+        self.guild_id_str = str(guild_id)  # Key of this guild in cog.maps
 
     @discord.ui.button(
         label="Change",
@@ -933,46 +665,31 @@ class UserPinOptionsView(discord.ui.View):
     async def remove_location(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
     
-        guild_id = str(interaction.guild.id)
+        guild_id = self.guild_id_str
         user_id = str(interaction.user.id)
     
         if guild_id not in self.cog.maps:
-            embed = discord.Embed(
-                title="⛔ Error",
-                description="No map for this server.",
-                color=0xff4444
-            )
-            await interaction.edit_original_response(embed=embed, view=None)
+            await interaction.edit_original_response(embed=_ERR_NO_MAP_FOR_PIN, view=None)
             return
 
         if user_id not in self.cog.maps[guild_id]['pins']:
-            embed = discord.Embed(
-                title="⛔ Error",
-                description="You don't have a pin on the map.",
-                color=0xff4444
-            )
-            await interaction.edit_original_response(embed=embed, view=None)
+            await interaction.edit_original_response(embed=_ERR_NO_PIN_TO_REMOVE, view=None)
             return
 
-        # Show loading message
-        loading_embed = discord.Embed(
-            title="🗺️ Updating Map",
-            description="Removing pin and rendering updated map...",
-            color=0x7289da
-        )
-        await interaction.edit_original_response(embed=loading_embed, view=None)
-
-        old_location = self.cog.maps[guild_id]['pins'][user_id].get('location', 'Unknown')  # Use original location
-        del self.cog.maps[guild_id]['pins'][user_id]
+        # A deferred component update shows nothing, so tell the user the map is re-rendering
+        await interaction.edit_original_response(embed=_REMOVING_PIN_EMBED, view=None)
+        
+        guild_map = self.cog.maps[guild_id]
+        user_pin = guild_map['pins'].pop(user_id)
+        old_location = user_pin.get('location', 'Unknown')  # Use original location
         await self.cog._save_data(guild_id)
         
         # OPTIMIZATION: Only Final Map Cache invalidieren, Base Map beibehalten
         await self.cog.storage.invalidate_final_map_cache_only(int(guild_id))
         self.cog.log.info(f"Pin removal for guild {guild_id}: preserved base map cache for efficiency")
         
-        channel_id = self.cog.maps[guild_id]['channel_id']
-        await self.cog._update_map(int(guild_id), channel_id)
-        await self.cog._update_global_overview()
+        channel_id = guild_map['channel_id']
+        await self.cog._refresh_maps(int(guild_id), channel_id)
 
         # Create embed for removal confirmation
         embed = discord.Embed(
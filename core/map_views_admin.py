@@ -1,14 +1,71 @@
 """Admin Views for Discord Map Bot with separate modals."""
 
+import functools
 import discord
+from collections import deque
 from datetime import datetime
 from typing import TYPE_CHECKING, Dict, Optional
 from io import BytesIO
 
+from .map_progress_handler import _get_map_config, create_preview_progress_callback, finish_progress
+
 if TYPE_CHECKING:
     from cogs.map import MapV2Cog
 
 
+# Preview buffers shared by the color and pin previews; released buffers keep their capacity
+_BYTESIO_POOL: deque = deque(maxlen=8)
+
+
+def _acquire_bio() -> BytesIO:
+    """Take a preview buffer from the pool, or a fresh one when it is empty."""
+    return _BYTESIO_POOL.pop() if _BYTESIO_POOL else BytesIO()
+
+
+def _release_bio(bio: Optional[BytesIO]):
+    """Return a preview buffer to the pool once nothing reads from it anymore."""
+    if bio is None or bio in _BYTESIO_POOL:
+        return
+    bio.seek(0)
+    _BYTESIO_POOL.append(bio)
+
+
+def _format_color_for_display(color_value) -> str:
+    """Convert color value to display format for text input."""
+    if not color_value:
+        return ""
+    elif isinstance(color_value, tuple) and len(color_value) == 3:
+        return f"{color_value[0]},{color_value[1]},{color_value[2]}"
+    elif isinstance(color_value, str):
+        return color_value
+    else:
+        return ""
+
+
+def _format_color_display(color_value, input_value: Optional[str], config) -> str:
+    """Describe a previewed color, by name when the user typed a known one."""
+    if input_value and input_value.lower() in config.COLOR_DICTIONARY:
+        return input_value.title()
+    elif isinstance(color_value, tuple):
+        return f"RGB({color_value[0]}, {color_value[1]}, {color_value[2]})"
+    else:
+        return str(color_value)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_color_cached(text: str, default):
+    """Memoized parse_color of the shared MapConfig; parse_color is pure and returns immutable values."""
+    return _get_map_config().parse_color(text, default)
+
+
+def _parse_color_input(value: Optional[str], default):
+    """Parse a modal color input, falling back to default when empty."""
+    text = (value or "").strip()
+    if not text:
+        return default
+    return _parse_color_cached(text, default)
+
+
 class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
     def __init__(self, cog: 'MapV2Cog', guild_id: int, original_interaction: discord.Interaction):
         super().__init__()
@@ -23,20 +80,9 @@ class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
         borders = existing_settings.get('borders', {})
         
         # Set current values as defaults
-        self.land_color.default = self._format_color_for_display(colors.get('land', ''))
-        self.water_color.default = self._format_color_for_display(colors.get('water', ''))
-        self.border_color.default = self._format_color_for_display(borders.get('country', ''))
-
-    def _format_color_for_display(self, color_value):
-        """Convert color value to display format for text input."""
-        if not color_value:
-            return ""
-        elif isinstance(color_value, tuple) and len(color_value) == 3:
-            return f"{color_value[0]},{color_value[1]},{color_value[2]}"
-        elif isinstance(color_value, str):
-            return color_value
-        else:
-            return ""
+        self.land_color.default = _format_color_for_display(colors.get('land', ''))
+        self.water_color.default = _format_color_for_display(colors.get('water', ''))
+        self.border_color.default = _format_color_for_display(borders.get('country', ''))
 
     land_color = discord.ui.TextInput(
         label='Land Color (name/RGB/hex)',
@@ -69,9 +115,9 @@ class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
         current_settings = map_data.get('settings', {})
         
         # Parse colors with defaults
-        land_color = config.parse_color(self.land_color.value, config.DEFAULT_LAND_COLOR) if self.land_color.value else config.DEFAULT_LAND_COLOR
-        water_color = config.parse_color(self.water_color.value, config.DEFAULT_WATER_COLOR) if self.water_color.value else config.DEFAULT_WATER_COLOR
-        border_color = config.parse_color(self.border_color.value, config.DEFAULT_COUNTRY_BORDER_COLOR) if self.border_color.value else config.DEFAULT_COUNTRY_BORDER_COLOR
+        land_color = _parse_color_input(self.land_color.value, config.DEFAULT_LAND_COLOR)
+        water_color = _parse_color_input(self.water_color.value, config.DEFAULT_WATER_COLOR)
+        border_color = _parse_color_input(self.border_color.value, config.DEFAULT_COUNTRY_BORDER_COLOR)
         river_color = water_color
         
         # Prepare updated settings
@@ -97,15 +143,20 @@ class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
             description="Just a moment, I'm rendering the preview...",
             color=0x7289da
         )
-        await interaction.response.edit_message(embed=loading_embed, attachments=[], view=None)
+        # Acknowledge first so a slow render cannot outlive the interaction window
+        await interaction.response.defer()
+        await interaction.edit_original_response(embed=loading_embed, attachments=[], view=None)
         
         try:
-            # Use centralized progress handler
-            from core.map_progress_handler import create_preview_progress_callback
             progress_callback = await create_preview_progress_callback(interaction, self.cog.log)
             
-            # Generate preview
-            result = await self.cog._generate_preview_map(int(self.guild_id), settings, progress_callback)
+            # Generate preview into a pooled buffer, the preview view returns it once it is done
+            preview_buffer = _acquire_bio()
+            try:
+                result = await self.cog._generate_preview_map(int(self.guild_id), settings, progress_callback, preview_buffer)
+            finally:
+                # Every edit below is final, a trailing progress edit must not overwrite it
+                await finish_progress(progress_callback)
             
             if not result or result[0] is None:
                 preview_image, base_map = None, None
@@ -113,6 +164,7 @@ class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
                 preview_image, base_map = result
             
             if not preview_image:
+                _release_bio(preview_buffer)
                 error_embed = discord.Embed(
                     title="⛔ Preview Error",
                     description="Failed to generate preview. Please try again.",
@@ -132,37 +184,29 @@ class ColorSettingsModal(discord.ui.Modal, title='Map Color Settings'):
             colors = settings['colors']
             borders = settings['borders']
             
-            def format_color_display(color_value, input_value):
-                config = self.cog.map_generator.map_config
-                if input_value and input_value.lower() in config.COLOR_DICTIONARY:
-                    return f"{input_value.title()}"
-                elif isinstance(color_value, tuple):
-                    return f"RGB({color_value[0]}, {color_value[1]}, {color_value[2]})"
-                else:
-                    return str(color_value)
+            config = self.cog.map_generator.map_config
             
             embed.add_field(
                 name="Land Color", 
-                value=format_color_display(colors['land'], self.land_color.value),
+                value=_format_color_display(colors['land'], self.land_color.value, config),
                 inline=True
             )
             embed.add_field(
                 name="Water Color", 
-                value=format_color_display(colors['water'], self.water_color.value),
+                value=_format_color_display(colors['water'], self.water_color.value, config),
                 inline=True
             )
             embed.add_field(
                 name="Borders", 
-                value=format_color_display(borders['country'], self.border_color.value),
+                value=_format_color_display(borders['country'], self.border_color.value, config),
                 inline=True
             )
             
-            # Send preview with confirmation buttons
-            # Create a copy of the preview image for caching
-            preview_image_copy = BytesIO(preview_image.getvalue())
-            view = ColorSettingsPreviewView(self.cog, self.guild_id, settings, self.original_interaction, preview_image_copy, base_map)
+            # Send preview with confirmation buttons; the view shares the buffer and rewinds it on apply
+            view = ColorSettingsPreviewView(self.cog, self.guild_id, settings, self.original_interaction, preview_image, base_map)
             
             filename = f"color_preview_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            preview_image.seek(0)
             await interaction.edit_original_response(
                 content=None,
                 embed=embed,
@@ -193,20 +237,9 @@ class PinSettingsModal(discord.ui.Modal, title='Pin Settings'):
         pins = existing_settings.get('pins', {})
         
         # Set current values as defaults
-        self.pin_color.default = self._format_color_for_display(pins.get('color', ''))
+        self.pin_color.default = _format_color_for_display(pins.get('color', ''))
         self.pin_size.default = str(pins.get('size', '')) if pins.get('size') else ''
 
-    def _format_color_for_display(self, color_value):
-        """Convert color value to display format for text input."""
-        if not color_value:
-            return ""
-        elif isinstance(color_value, tuple) and len(color_value) == 3:
-            return f"{color_value[0]},{color_value[1]},{color_value[2]}"
-        elif isinstance(color_value, str):
-            return color_value
-        else:
-            return ""
-
     pin_color = discord.ui.TextInput(
         label='Pin Color (name/hex)',
         placeholder='red or #FF4444 (leave empty for default)',
@@ -231,7 +264,7 @@ class PinSettingsModal(discord.ui.Modal, title='Pin Settings'):
         current_settings = map_data.get('settings', {})
         
         # Parse pin settings
-        pin_color = config.parse_color(self.pin_color.value, config.DEFAULT_PIN_COLOR) if self.pin_color.value else config.DEFAULT_PIN_COLOR
+        pin_color = _parse_color_input(self.pin_color.value, config.DEFAULT_PIN_COLOR)
         
         try:
             pin_size = int(self.pin_size.value) if self.pin_size.value else config.DEFAULT_PIN_SIZE
@@ -259,11 +292,14 @@ class PinSettingsModal(discord.ui.Modal, title='Pin Settings'):
             description="Just a moment, I'm rendering the preview...",
             color=0x7289da
         )
-        await interaction.response.edit_message(embed=loading_embed, attachments=[], view=None)
+        # Acknowledge first so a slow render cannot outlive the interaction window
+        await interaction.response.defer()
+        await interaction.edit_original_response(embed=loading_embed, attachments=[], view=None)
         
+        preview_buffer = _acquire_bio()
         try:
             # Generate fast pin preview (reuses base map cache)
-            preview_image = await self.cog._generate_fast_pin_preview(int(self.guild_id), settings)
+            preview_image = await self.cog._generate_fast_pin_preview(int(self.guild_id), settings, preview_buffer)
             
             if not preview_image:
                 error_embed = discord.Embed(
@@ -284,18 +320,11 @@ class PinSettingsModal(discord.ui.Modal, title='Pin Settings'):
             # Show pin values
             pins = settings['pins']
             
-            def format_color_display(color_value, input_value):
-                config = self.cog.map_generator.map_config
-                if input_value and input_value.lower() in config.COLOR_DICTIONARY:
-                    return f"{input_value.title()}"
-                elif isinstance(color_value, tuple):
-                    return f"RGB({color_value[0]}, {color_value[1]}, {color_value[2]})"
-                else:
-                    return str(color_value)
+            config = self.cog.map_generator.map_config
             
             embed.add_field(
                 name="Pin Color", 
-                value=format_color_display(pins['color'], self.pin_color.value),
+                value=_format_color_display(pins['color'], self.pin_color.value, config),
                 inline=True
             )
             embed.add_field(
@@ -322,6 +351,9 @@ class PinSettingsModal(discord.ui.Modal, title='Pin Settings'):
                 color=0xff4444
             )
             await interaction.edit_original_response(content=None, embed=error_embed, attachments=[], view=None)
+        finally:
+            # The edit has finished uploading the preview, so the buffer can be reused
+            _release_bio(preview_buffer)
 
 
 class ColorSettingsPreviewView(discord.ui.View):
@@ -336,6 +368,15 @@ class ColorSettingsPreviewView(discord.ui.View):
         self.preview_image = preview_image  # Cache the preview image to reuse
         self.base_map = base_map  # Cache the base map for saving when approved
 
+    def _release_preview(self):
+        """Hand the preview buffer back to the pool and stop listening."""
+        _release_bio(self.preview_image)
+        self.preview_image = None
+        self.stop()
+
+    async def on_timeout(self):
+        self._release_preview()
+
     @discord.ui.button(label="Apply Colors", style=discord.ButtonStyle.success, emoji="✅")
     async def apply_settings(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self._apply_settings(interaction)
@@ -353,6 +394,7 @@ class ColorSettingsPreviewView(discord.ui.View):
             color=0xff4444
         )
         await interaction.response.edit_message(embed=embed, attachments=[], view=None)
+        self._release_preview()
 
     async def _apply_settings(self, interaction: discord.Interaction):
         """Apply the color settings."""
@@ -384,6 +426,7 @@ class ColorSettingsPreviewView(discord.ui.View):
             # Use cached preview image if available, otherwise regenerate
             if self.preview_image and self.base_map:
                 # Use the cached preview image to avoid regeneration
+                self.preview_image.seek(0)
                 success = await self.cog._apply_cached_preview_as_map(int(guild_id), self.preview_image)
                 
                 if success:
@@ -432,6 +475,8 @@ class ColorSettingsPreviewView(discord.ui.View):
                 color=0xff4444
             )
             await interaction.edit_original_response(content=None, embed=error_embed, attachments=[], view=None)
+        finally:
+            self._release_preview()
 
 
 class PinSettingsPreviewView(discord.ui.View):
@@ -494,8 +539,7 @@ class PinSettingsPreviewView(discord.ui.View):
             
             # Update main map
             channel_id = self.cog.maps[guild_id]['channel_id']
-            await self.cog._update_map(int(guild_id), channel_id)
-            await self.cog._update_global_overview()
+            await self.cog._refresh_maps(int(guild_id), channel_id)
             
             success_embed = discord.Embed(
                 title="✅ Pins Applied Successfully",